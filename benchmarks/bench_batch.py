@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# bench_batch.py - Extracting from many images: one ghostwire run per image vs --extract-batch
+
+import sys
+import os
+import io
+import time
+import argparse
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+from PIL import Image
+
+from ghostwire_steganography import GhostwireSteganography, run_batch, batch_jobs
+
+LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ghostwire')
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch steganography benchmark')
+    parser.add_argument('--images', type=int, default=200, help='Images in the batch (default: 200)')
+    parser.add_argument('--size', type=int, default=800, help='Width and height of each image (default: 800)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per core)')
+    parser.add_argument('--sample', type=int, default=10, help='Images timed one run at a time (default: 10)')
+    args = parser.parse_args()
+
+    keys = ("bench1", "bench2", "bench3")
+    stego = GhostwireSteganography(*keys)
+    with tempfile.TemporaryDirectory() as directory:
+        sources = os.path.join(directory, 'sources')
+        hidden = os.path.join(directory, 'hidden')
+        os.makedirs(sources)
+        os.makedirs(hidden)
+        rng = np.random.default_rng(1)
+        for i in range(args.images):
+            source = os.path.join(sources, f'photo{i}.png')
+            Image.fromarray(rng.integers(0, 256, (args.size, args.size, 3), dtype=np.uint8)).save(source,
+                                                                                                   compress_level=1)
+            stego.hide_message_in_image(source, f"message {i}", os.path.join(hidden, f'photo{i}.png'))
+        print(f"{args.images} images of {args.size}x{args.size}, {os.cpu_count()} cores")
+
+        started = time.perf_counter()
+        for i in range(args.sample):
+            subprocess.run([sys.executable, LAUNCHER, '--stealth-extract', os.path.join(hidden, f'photo{i}.png'),
+                            '--key1', keys[0], '--key2', keys[1], '--key3', keys[2]],
+                           check=True, stdout=subprocess.DEVNULL)
+        single = (time.perf_counter() - started) / args.sample
+        print(f"one run per image:  {1 / single:8.1f} images/sec ({single * 1000:.0f} ms each)")
+
+        images, failed, total_bytes, elapsed = run_batch('extract', batch_jobs(hidden), keys,
+                                                         workers=args.workers, out=io.StringIO())
+        print(f"--extract-batch:    {images / elapsed:8.1f} images/sec, "
+              f"{total_bytes / 1024 / 1024 / elapsed:.1f} MB/sec ({failed} failed)")
+        print(f"-> {single * images / elapsed:.0f}x faster")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
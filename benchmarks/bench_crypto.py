@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# bench_crypto.py - Per-message AES.new versus the cached contexts, plus the AEAD suites
+
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+from ghostwire_crypto import AEAD_SUITES, BLOCK_SIZE, get_context
+
+def old_encrypt(key, message):
+    """What every call site used to do"""
+    cipher = AES.new(key, AES.MODE_CBC)
+    ct_bytes = cipher.encrypt(pad(message.encode(), BLOCK_SIZE))
+    return cipher.iv + ct_bytes
+
+def old_decrypt(key, payload):
+    iv, ct = payload[:BLOCK_SIZE], payload[BLOCK_SIZE:]
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    return unpad(cipher.decrypt(ct), BLOCK_SIZE).decode('utf-8')
+
+def measure(label, func, count, repeat=3):
+    """Best of a few runs, to keep scheduler noise out of the comparison"""
+    elapsed = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = min(elapsed, time.perf_counter() - started)
+    print(f"  {label:<28} {elapsed * 1e6 / count:7.2f} us/msg  {count / elapsed:10.0f} msg/sec")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Message crypto micro-benchmark')
+    parser.add_argument('--count', type=int, default=50000, help='Messages per run (default: 50000)')
+    parser.add_argument('--size', type=int, action='append',
+                        help='Message size in bytes, repeatable (default: 40 and 1000)')
+    args = parser.parse_args()
+
+    key = pad(b"benchabenchbbenchc", BLOCK_SIZE)
+    context = get_context(key)
+
+    for size in args.size or [40, 1000]:
+        messages = ["m" * size] * args.count
+        payloads = [old_encrypt(key, message) for message in messages]
+        encoded = [message.encode() for message in messages]
+        print(f"\n{args.count} messages of {size} bytes")
+
+        old = measure("encrypt AES.new per message", lambda: [old_encrypt(key, m) for m in messages], args.count)
+        new = measure("encrypt CipherContext", lambda: [context.encrypt_text(m) for m in messages], args.count)
+        batch = measure("encrypt_batch", lambda: context.encrypt_batch(encoded), args.count)
+        print(f"  -> {old / new:.2f}x single, {old / batch:.2f}x batch")
+
+        old = measure("decrypt AES.new per message", lambda: [old_decrypt(key, p) for p in payloads], args.count)
+        new = measure("decrypt CipherContext", lambda: [context.decrypt_text(p) for p in payloads], args.count)
+        batch = measure("decrypt_batch", lambda: context.decrypt_batch(payloads), args.count)
+        print(f"  -> {old / new:.2f}x single, {old / batch:.2f}x batch")
+
+        for suite in AEAD_SUITES:
+            aead = get_context(key, suite)
+            sealed = [aead.encrypt_text(m) for m in messages]
+            measure(f"seal {suite}", lambda: [aead.encrypt_text(m) for m in messages], args.count)
+            measure(f"open {suite}", lambda: [aead.decrypt_text(p) for p in sealed], args.count)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# bench_log.py - History log appends (group commit vs fsync each) and seeks into a large log
+
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ghostwire_log import MessageLog
+
+def main():
+    parser = argparse.ArgumentParser(description='History log benchmark')
+    parser.add_argument('--records', type=int, default=200000, help='Records in the log (default: 200000)')
+    parser.add_argument('--size', type=int, default=200, help='Record size in bytes (default: 200)')
+    parser.add_argument('--seeks', type=int, default=2000, help='Random seeks to time (default: 2000)')
+    parser.add_argument('--fsync-each', type=int, default=500,
+                        help='Appends to time with an fsync per append (default: 500)')
+    parser.add_argument('--dir', help='Where to put the log (default: a temporary directory)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        data = os.urandom(args.size)
+
+        log = MessageLog(os.path.join(directory, 'each'), sync_interval=0)
+        started = time.perf_counter()
+        for sequence in range(1, args.fsync_each + 1):
+            log.append(sequence, data)
+        each = time.perf_counter() - started
+        log.close()
+        print(f"fsync per append:  {args.fsync_each / each:10.0f} appends/sec")
+
+        log = MessageLog(os.path.join(directory, 'group'), segment_bytes=16 * 1024 * 1024)
+        started = time.perf_counter()
+        for sequence in range(1, args.records + 1):
+            log.append(sequence, data, 1000.0 + sequence)
+        appended = time.perf_counter() - started
+        log.sync()
+        synced = time.perf_counter() - started
+        print(f"group commit:      {args.records / appended:10.0f} appends/sec "
+              f"({synced:.2f}s until on disk, {len(log.segments)} segments, "
+              f"{args.records * (args.size + 24) / 2**20:.0f} MiB)")
+
+        targets = [random.randint(1, args.records) for _ in range(args.seeks)]
+        started = time.perf_counter()
+        for target in targets:
+            next(log.read_from(target))
+        elapsed = time.perf_counter() - started
+        print(f"seek by sequence:  {elapsed * 1e6 / args.seeks:10.1f} us/seek")
+
+        started = time.perf_counter()
+        for target in targets:
+            next(log.read_since(1000.0 + target - 0.5))
+        elapsed = time.perf_counter() - started
+        print(f"seek by time:      {elapsed * 1e6 / args.seeks:10.1f} us/seek")
+
+        started = time.perf_counter()
+        count = sum(1 for _ in log.read_from(args.records - 1000 + 1))
+        print(f"replay last {count}: {(time.perf_counter() - started) * 1000:9.1f} ms")
+        log.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
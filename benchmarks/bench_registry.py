@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# bench_registry.py - Join/leave churn against a live server while it broadcasts
+
+import sys
+import os
+import io
+import socket
+import threading
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import encode_hello
+from ghostwire_simple import GhostwireServer
+
+KEY = pad(b"benchregistrybench", 16)
+
+def main():
+    parser = argparse.ArgumentParser(description='Client registry churn benchmark')
+    parser.add_argument('--rate', type=int, default=1000, help='Joins per second (default: 1000)')
+    parser.add_argument('--seconds', type=float, default=5, help='Benchmark duration (default: 5)')
+    parser.add_argument('--workers', type=int, default=8, help='Joining threads (default: 8)')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Benchmark the asyncio server')
+    args = parser.parse_args()
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    if args.use_async:
+        from ghostwire_async import AsyncGhostwireServer
+        server = AsyncGhostwireServer(port, KEY, 'bench-registry', 'bench')
+    else:
+        server = GhostwireServer(port, KEY, 'bench-registry', 'bench')
+    errors = []
+
+    def counted(method):
+        def wrapper(*a, **kw):
+            try:
+                return method(*a, **kw)
+            except Exception as e:
+                errors.append(repr(e))
+                raise
+        return wrapper
+    server.broadcast_to_all = counted(server.broadcast_to_all)
+    server.remove_one_client = counted(server.remove_one_client)
+
+    # The server logs every join and leave; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        threading.Thread(target=server.start, daemon=True).start()
+        time.sleep(0.3)
+
+        sender = socket.create_connection(('127.0.0.1', port))
+        sender.sendall(encode_hello("sender"))
+        stop = threading.Event()
+        joins = [0] * args.workers
+        interval = args.workers / args.rate
+
+        def churn(worker):
+            next_join = time.perf_counter()
+            while not stop.is_set():
+                try:
+                    sock = socket.create_connection(('127.0.0.1', port))
+                    sock.sendall(encode_hello(f"churn{worker}"))
+                    sock.close()
+                    joins[worker] += 1
+                except OSError as e:
+                    errors.append(repr(e))
+                next_join += interval
+                delay = next_join - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        threads = [threading.Thread(target=churn, args=(i,)) for i in range(args.workers)]
+        frame = server.encode_message("tick")
+        broadcasts = 0
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        while time.perf_counter() - started < args.seconds:
+            sender.sendall(frame)
+            broadcasts += 1
+            time.sleep(0.001)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        time.sleep(0.5)
+
+        members_left = len(server.clients)
+        sender.close()
+        server.stop()
+
+    total = sum(joins)
+    print(f"Joins:      {total} in {elapsed:.2f}s ({total / elapsed:.0f}/sec)")
+    print(f"Broadcasts: {broadcasts}")
+    print(f"Members:    {members_left} left registered (expected 1)")
+    print(f"Errors:     {len(errors)}")
+    for error in errors[:5]:
+        print(f"  {error}")
+    return 0 if not errors and members_left == 1 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# bench_startup.py - Wall time of one-shot `ghostwire --send` runs, through the quick path and the full client
+
+import sys
+import os
+import json
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import argparse
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def fake_agent(path):
+    """Accept agent requests forever, answering like a running --agent"""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(16)
+
+    def serve():
+        while True:
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return
+            with connection, connection.makefile('rwb') as stream:
+                for _ in stream:
+                    stream.write(b'{"ok": true}\n')
+                    stream.flush()
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+def run(code, runs):
+    """Median wall time in ms of a fresh interpreter running code"""
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description='Command line startup benchmark')
+    parser.add_argument('--runs', type=int, default=20, help='Runs of each command (default: 20)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = os.path.join(directory, 'config.json')
+        user_config = os.path.join(directory, 'user.json')
+        with open(config_file, 'w') as f:
+            json.dump({'port': 2222, 'key': 'a2V5a2V5a2V5a2V5a2V5aw==', 'alias': 'bench'}, f)
+        with open(user_config, 'w') as f:
+            json.dump({'username': 'bench', 'port': 2222, 'host': 'localhost', 'key': 'a2V5a2V5a2V5a2V5a2V5aw=='}, f)
+        agent_socket = os.path.join(directory, 'agent_{port}_{username}.sock')
+        server = fake_agent(agent_socket.format(port=2222, username='bench'))
+
+        # Point the launcher at the temporary files instead of the real ones in /tmp
+        def launcher(*argv):
+            return (f"import sys, runpy; sys.path.insert(0, {os.path.join(ROOT, 'src')!r}); "
+                    f"import ghostwire_quick, ghostwire_agent; "
+                    f"ghostwire_quick.CONFIG_FILE = {config_file!r}; ghostwire_quick.USER_CONFIG = {user_config!r}; "
+                    f"ghostwire_agent.AGENT_SOCKET = {agent_socket!r}; "
+                    f"sys.argv = ['ghostwire'] + {list(argv)!r}; "
+                    f"runpy.run_path({os.path.join(ROOT, 'ghostwire')!r}, run_name='__main__')")
+
+        baseline = run("pass", args.runs)
+        quick = run(launcher('--send', 'hi', '--all'), args.runs)
+        # --host makes the launcher take the full client path; a saved user config overrides it anyway
+        full = run(launcher('--send', 'hi', '--all', '--host', 'localhost'), args.runs)
+        server.close()
+
+    print(f"python -c pass:            {baseline:7.1f} ms")
+    print(f"--send via agent, quick:   {quick:7.1f} ms")
+    print(f"--send via agent, full:    {full:7.1f} ms")
+    print(f"-> {full / quick:.1f}x faster end to end, "
+          f"{(full - baseline) / max(quick - baseline, 0.1):.1f}x less work beyond starting Python")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# bench_stego.py - Hiding and extracting a message in a large photo: per-pixel Python loops vs the vectorized engine
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+from PIL import Image
+
+from ghostwire_steganography import GhostwireSteganography
+
+def per_pixel_hide(img, message):
+    """The embedding loop the engine replaced, minus loading and saving"""
+    binary_message = ''.join(format(ord(char), '08b') for char in message + "<<<GHOSTWIRE_END>>>")
+    binary_index = 0
+    modified_pixels = []
+    for pixel in list(img.getdata()):
+        if binary_index < len(binary_message):
+            r, g, b = pixel
+            if binary_index < len(binary_message):
+                r = (r & 0xFE) | int(binary_message[binary_index])
+                binary_index += 1
+            if binary_index < len(binary_message):
+                g = (g & 0xFE) | int(binary_message[binary_index])
+                binary_index += 1
+            if binary_index < len(binary_message):
+                b = (b & 0xFE) | int(binary_message[binary_index])
+                binary_index += 1
+            modified_pixels.append((r, g, b))
+        else:
+            modified_pixels.append(pixel)
+    new_img = Image.new('RGB', img.size)
+    new_img.putdata(modified_pixels)
+    return new_img
+
+def per_pixel_extract(img):
+    """The extraction loop the engine replaced: every LSB of the image, then the delimiter"""
+    binary_message = ""
+    for r, g, b in list(img.getdata()):
+        binary_message += str(r & 1)
+        binary_message += str(g & 1)
+        binary_message += str(b & 1)
+    message = ''.join(chr(int(binary_message[i:i + 8], 2)) for i in range(0, len(binary_message) - 7, 8))
+    return message[:message.find("<<<GHOSTWIRE_END>>>")]
+
+def main():
+    parser = argparse.ArgumentParser(description='Steganography benchmark')
+    parser.add_argument('--megapixels', type=float, default=4, help='Image size (default: 4)')
+    parser.add_argument('--message-bytes', type=int, default=10000, help='Message size (default: 10000)')
+    parser.add_argument('--format', choices=('bmp', 'png', 'tiff'), default='bmp',
+                        help='Image file format (default: bmp; png and tiff decode only the rows read)')
+    parser.add_argument('--memory-budget', type=float, default=64, help='Working memory cap in MB (default: 64)')
+    parser.add_argument('--skip-loop', action='store_true', help='Only time the vectorized engine')
+    args = parser.parse_args()
+
+    width = int((args.megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(args.megapixels * 1e6 / width)
+    pixels = np.random.default_rng(1).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    message = "m" * args.message_bytes
+    stego = GhostwireSteganography(memory_budget=int(args.memory_budget * 1024 * 1024))
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, f'photo.{args.format}')
+        output = os.path.join(directory, f'hidden.{args.format}')
+        Image.fromarray(pixels).save(source, compress_level=1)
+        img = Image.open(source).convert('RGB')
+        print(f"{width}x{height} image, {args.message_bytes} byte message")
+
+        started = time.perf_counter()
+        success, result = stego.hide_message_in_image(source, message, output, encrypt=False)
+        engine = time.perf_counter() - started
+        if not success:
+            print(result)
+            return 1
+        print(f"vectorized hide_message_in_image: {engine * 1000:9.1f} ms (load, embed, save)")
+
+        if not args.skip_loop:
+            started = time.perf_counter()
+            per_pixel_hide(img, message)
+            loop = time.perf_counter() - started
+            print(f"per-pixel loop:                   {loop * 1000:9.1f} ms (embed only)")
+            print(f"-> {loop / engine:.0f}x faster")
+
+        started = time.perf_counter()
+        success, extracted = stego.extract_message_from_image(output, decrypt=False)
+        engine = time.perf_counter() - started
+        if extracted != message:
+            print("extracted message differs")
+            return 1
+        print(f"extract_message_from_image:       {engine * 1000:9.1f} ms (load, extract)")
+        started = time.perf_counter()
+        Image.open(output).load()
+        print(f"   of which decoding the file:    {(time.perf_counter() - started) * 1000:9.1f} ms")
+        if not args.skip_loop:
+            # The string it builds makes the old loop quadratic; a whole photo takes minutes
+            hidden = Image.open(output).crop((0, 0, 400, 400))
+            started = time.perf_counter()
+            per_pixel_extract(hidden)
+            loop = time.perf_counter() - started
+            print(f"per-pixel extraction, 400x400:    {loop * 1000:9.1f} ms (extract only, "
+                  f"{loop / engine:.0f}x the engine on the whole image)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# bench_store.py - Saving and loading a large user table: JSON file rewrites vs the SQLite store
+
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ghostwire_store import UserStore
+
+def main():
+    parser = argparse.ArgumentParser(description='User store benchmark')
+    parser.add_argument('--users', type=int, default=100000, help='Users already saved (default: 100000)')
+    parser.add_argument('--joins', type=int, default=1000, help='New users to save one by one (default: 1000)')
+    args = parser.parse_args()
+
+    users = {f"user{i}": {'created': True} for i in range(args.users)}
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, 'data.json')
+
+        def save_json():
+            with open(data_file, 'w') as f:
+                json.dump({'users': users, 'creator': 'bench'}, f)
+
+        save_json()
+        started = time.perf_counter()
+        with open(data_file, 'r') as f:
+            json.load(f)
+        print(f"JSON   load {args.users} users:   {(time.perf_counter() - started) * 1000:8.1f} ms")
+        started = time.perf_counter()
+        save_json()
+        rewrite = time.perf_counter() - started
+        print(f"JSON   save after each join: {rewrite * 1000:8.1f} ms/join (whole file rewritten)")
+
+        store = UserStore(os.path.join(directory, 'users.db'))
+        store.import_json(data_file)
+        store.checkpoint()
+        started = time.perf_counter()
+        store.load()
+        print(f"SQLite load {args.users} users:   {(time.perf_counter() - started) * 1000:8.1f} ms")
+        started = time.perf_counter()
+        for i in range(args.joins):
+            store.add(f"joiner{i}", {'created': True})
+        added = time.perf_counter() - started
+        print(f"SQLite save after each join: {added * 1000 / args.joins:8.3f} ms/join "
+              f"({rewrite / (added / args.joins):.0f}x less)")
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
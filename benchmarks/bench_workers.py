@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# bench_workers.py - Broadcast throughput of one room served by 1..N worker processes
+
+import sys
+import os
+import io
+import time
+import socket
+import argparse
+import selectors
+import contextlib
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FrameDecoder, encode_hello
+from ghostwire_crypto import get_codec
+from ghostwire_ring import DEFAULT_RING_BYTES
+from ghostwire_workers import run_workers
+
+KEY = pad(b"benchworkersbench", 16)
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def serve(port, workers, ring_bytes):
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_workers(port, KEY, 'bench-workers', 'bench', workers, ring_bytes, slow_policy='drop-oldest',
+                    queue_size=4096)
+
+def listen(port, connections, seconds, results):
+    """Hold a few member connections and count the frames they receive"""
+    selector = selectors.DefaultSelector()
+    for i in range(connections):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(encode_hello(f"listener{os.getpid()}_{i}"))
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, FrameDecoder())
+    received = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        for key, _ in selector.select(0.1):
+            try:
+                data = key.fileobj.recv(65536)
+            except BlockingIOError:
+                continue
+            if data:
+                received += len(key.data.feed(data))
+    results.put(received)
+
+def send(port, size, seconds, results):
+    """Broadcast as fast as the room accepts"""
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(encode_hello(f"sender{os.getpid()}"))
+    frame = get_codec(KEY).encode("m" * size)
+    chunk = frame * 32
+    sent = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        sock.sendall(chunk)
+        sent += 32
+    sock.close()
+    results.put(sent)
+
+def run(workers, args):
+    port = free_port()
+    context = multiprocessing.get_context('fork')
+    server = context.Process(target=serve, args=(port, workers, args.ring_bytes))
+    server.start()
+    time.sleep(1.0)
+
+    results = context.Queue()
+    listeners = [context.Process(target=listen, args=(port, args.connections, args.seconds + 2, results))
+                 for _ in range(args.listeners)]
+    for process in listeners:
+        process.start()
+    time.sleep(1.0)
+    senders = [context.Process(target=send, args=(port, args.size, args.seconds, results))
+               for _ in range(args.senders)]
+    for process in senders:
+        process.start()
+    for process in senders + listeners:
+        process.join()
+    counts = [results.get() for _ in senders + listeners]
+    server.terminate()
+    server.join()
+
+    sent = sum(counts[:len(senders)])
+    delivered = sum(counts[len(senders):])
+    print(f"  workers={workers:<3} sent {sent / args.seconds:9.0f} msg/sec  "
+          f"delivered {delivered / args.seconds:10.0f} frames/sec")
+    return delivered
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-process room broadcast benchmark')
+    parser.add_argument('--workers', type=int, action='append',
+                        help='Worker counts to compare, repeatable (default: 1 and the CPU count)')
+    parser.add_argument('--listeners', type=int, default=4, help='Listener processes (default: 4)')
+    parser.add_argument('--connections', type=int, default=25, help='Members per listener (default: 25)')
+    parser.add_argument('--senders', type=int, default=2, help='Sender processes (default: 2)')
+    parser.add_argument('--size', type=int, default=100, help='Message size in bytes (default: 100)')
+    parser.add_argument('--seconds', type=float, default=5, help='Send duration (default: 5)')
+    parser.add_argument('--ring-bytes', type=int, default=DEFAULT_RING_BYTES,
+                        help='Shared-memory ring per worker, 0 for the socket bus only (default: 4 MiB)')
+    args = parser.parse_args()
+
+    counts = args.workers or sorted({1, os.cpu_count() or 1})
+    print(f"{args.listeners * args.connections} members, {args.senders} senders, "
+          f"{args.size}-byte messages, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in counts:
+        delivered = run(workers, args)
+        if baseline is None:
+            baseline = delivered
+        elif baseline:
+            print(f"  -> {delivered / baseline:.2f}x the workers={counts[0]} delivery rate")
+
+if __name__ == "__main__":
+    main()
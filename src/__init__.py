@@ -12,12 +12,35 @@ __version__ = "1.0.0"
 __author__ = "Kaiamaterasu"
 __description__ = "🔒 Encrypted P2P Communication Tool with Steganographic Capabilities"
 
-# Import main modules for easy access
-from .ghostwire_simple import GhostwireServer, send_message
-from .ghostwire_steganography import GhostwireSteganography
+import os
+import sys
+
+# The modules import each other by their flat names (the way the ghostwire
+# launcher runs them), so make the package directory importable as well
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Main classes for easy access, imported on first use: the client needs
+# pycryptodome and steganography needs PIL, which most commands never touch
+LAZY_ATTRIBUTES = {
+    "GhostwireServer": "ghostwire_simple",
+    "send_message": "ghostwire_simple",
+    "GhostwireSteganography": "ghostwire_steganography",
+}
 
 __all__ = [
     "GhostwireServer",
     "send_message", 
     "GhostwireSteganography"
 ]
+
+def __getattr__(name):
+    module = LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(LAZY_ATTRIBUTES))
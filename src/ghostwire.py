@@ -7,9 +7,10 @@ import argparse
 import json
 import sys
 import os
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from Crypto.Util.Padding import pad
 import base64
+from ghostwire_protocol import FRAME_HELLO, FRAME_DATA, FrameReader, encode_frame, encode_hello, parse_hello
+from ghostwire_crypto import get_context
 
 BLOCK_SIZE = 16
 DATA_FILE = "/tmp/ghostwire_data.json"
@@ -45,22 +46,10 @@ class GhostwireServer:
             pass
     
     def encrypt_message(self, message):
-        cipher = AES.new(self.key, AES.MODE_CBC)
-        ct_bytes = cipher.encrypt(pad(message.encode(), BLOCK_SIZE))
-        iv = base64.b64encode(cipher.iv).decode('utf-8')
-        ct = base64.b64encode(ct_bytes).decode('utf-8')
-        return iv + " " + ct
+        return encode_frame(FRAME_DATA, get_context(self.key).encrypt_text(message))
     
-    def decrypt_message(self, encrypted_message):
-        try:
-            iv, ct = encrypted_message.split(" ", 1)
-            iv = base64.b64decode(iv)
-            ct = base64.b64decode(ct)
-            cipher = AES.new(self.key, AES.MODE_CBC, iv)
-            pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-            return pt.decode('utf-8')
-        except:
-            return None
+    def decrypt_message(self, payload):
+        return get_context(self.key).decrypt_text(payload)
     
     def broadcast_to_all(self, message, exclude_socket=None):
         """Send message to all connected clients"""
@@ -70,7 +59,7 @@ class GhostwireServer:
         for client_socket in self.clients:
             if client_socket != exclude_socket:
                 try:
-                    client_socket.send(encrypted_msg.encode('utf-8'))
+                    client_socket.sendall(encrypted_msg)
                 except:
                     dead_clients.append(client_socket)
         
@@ -84,7 +73,7 @@ class GhostwireServer:
         for client_socket, user_info in self.clients.items():
             if user_info['username'] == target_user:
                 try:
-                    client_socket.send(encrypted_msg.encode('utf-8'))
+                    client_socket.sendall(encrypted_msg)
                     return True
                 except:
                     self.remove_client(client_socket)
@@ -107,16 +96,15 @@ class GhostwireServer:
     def handle_client(self, client_socket, address):
         """Handle individual client"""
         # Wait for client to send username first
+        reader = FrameReader(client_socket)
         try:
-            data = client_socket.recv(1024)
-            if not data:
+            frame = reader.read_frame()
+            if not frame:
                 client_socket.close()
                 return
             
-            username_data = data.decode('utf-8')
-            if username_data.startswith('USERNAME:'):
-                username = username_data.split(':', 1)[1].strip()
-                
+            username = parse_hello(frame[1]) if frame[0] == FRAME_HELLO else None
+            if username:
                 # Handle special commands
                 if username == "LIST_CMD":
                     self.send_user_list(client_socket)
@@ -135,13 +123,13 @@ class GhostwireServer:
             return
         
         try:
-            while self.running:
-                data = client_socket.recv(1024)
-                if not data:
+            for frame_type, payload in reader:
+                if not self.running:
                     break
+                if frame_type != FRAME_DATA:
+                    continue
                 
-                encrypted_message = data.decode('utf-8')
-                decrypted_message = self.decrypt_message(encrypted_message)
+                decrypted_message = self.decrypt_message(payload)
                 
                 if decrypted_message:
                     print(f"[{username}]: {decrypted_message}")
@@ -208,7 +196,7 @@ class GhostwireServer:
         encrypted_response = self.encrypt_message(user_list)
         
         try:
-            client_socket.send(encrypted_response.encode('utf-8'))
+            client_socket.sendall(encrypted_response)
         except:
             pass
     
@@ -233,40 +221,28 @@ class GhostwireClient:
         self.running = False
     
     def encrypt_message(self, message):
-        cipher = AES.new(self.key, AES.MODE_CBC)
-        ct_bytes = cipher.encrypt(pad(message.encode(), BLOCK_SIZE))
-        iv = base64.b64encode(cipher.iv).decode('utf-8')
-        ct = base64.b64encode(ct_bytes).decode('utf-8')
-        return iv + " " + ct
+        return encode_frame(FRAME_DATA, get_context(self.key).encrypt_text(message))
     
-    def decrypt_message(self, encrypted_message):
-        try:
-            iv, ct = encrypted_message.split(" ", 1)
-            iv = base64.b64decode(iv)
-            ct = base64.b64decode(ct)
-            cipher = AES.new(self.key, AES.MODE_CBC, iv)
-            pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-            return pt.decode('utf-8')
-        except:
-            return None
+    def decrypt_message(self, payload):
+        return get_context(self.key).decrypt_text(payload)
     
     def receive_messages(self):
         """Receive messages from server"""
-        while self.running:
-            try:
-                data = self.socket.recv(1024)
-                if not data:
+        try:
+            for frame_type, payload in FrameReader(self.socket):
+                if not self.running:
                     break
+                if frame_type != FRAME_DATA:
+                    continue
                 
-                encrypted_message = data.decode('utf-8')
-                decrypted_message = self.decrypt_message(encrypted_message)
+                decrypted_message = self.decrypt_message(payload)
                 
                 if decrypted_message:
                     print(f"\\r{decrypted_message}")
                     print(f"{self.alias}: ", end="", flush=True)
-            
-            except:
-                break
+        
+        except:
+            pass
     
     def connect(self):
         """Connect to server"""
@@ -276,7 +252,7 @@ class GhostwireClient:
             self.running = True
             
             # Send username to server
-            self.socket.send(f"USERNAME:{self.alias}".encode('utf-8'))
+            self.socket.sendall(encode_hello(self.alias))
             
             print(f"[CLIENT] Connected to Ghostwire server at {self.host}:{self.port}")
             print(f"[CLIENT] Your username: {self.alias}")
@@ -296,7 +272,7 @@ class GhostwireClient:
                 
                 if message.strip():
                     encrypted_message = self.encrypt_message(message)
-                    self.socket.send(encrypted_message.encode('utf-8'))
+                    self.socket.sendall(encrypted_message)
         
         except Exception as e:
             print(f"[ERROR] Connection error: {e}")
@@ -310,7 +286,7 @@ class GhostwireClient:
             self.socket.connect((self.host, self.port))
             
             encrypted_message = self.encrypt_message(message)
-            self.socket.send(encrypted_message.encode('utf-8'))
+            self.socket.sendall(encrypted_message)
             
             print(f"[INFO] Message sent: {message}")
             
@@ -408,17 +384,17 @@ def main():
             client.socket.connect(('localhost', args.port))
             
             # Send username first
-            client.socket.send(f"USERNAME:{username}".encode('utf-8'))
+            client.socket.sendall(encode_hello(username))
             
             if args.all:
                 print(f"[INFO] Sending to all users: {args.send}")
                 encrypted_message = client.encrypt_message(args.send)
-                client.socket.send(encrypted_message.encode('utf-8'))
+                client.socket.sendall(encrypted_message)
                 print(f"[INFO] Message sent: [{username}]: {args.send}")
             elif args.to:
                 print(f"[INFO] Sending private message to {args.to}: {args.send}")
                 encrypted_message = client.encrypt_message(f"@{args.to} {args.send}")
-                client.socket.send(encrypted_message.encode('utf-8'))
+                client.socket.sendall(encrypted_message)
                 print(f"[INFO] Private message sent to {args.to}")
             else:
                 print("[ERROR] Please specify --all or --to username")
@@ -435,12 +411,12 @@ def main():
             client.socket.connect(('localhost', args.port))
             
             # Send special command to list users
-            client.socket.send("USERNAME:LIST_USERS_CMD".encode('utf-8'))
+            client.socket.sendall(encode_hello("LIST_USERS_CMD"))
             
             # Wait for response
-            response = client.socket.recv(1024).decode('utf-8')
-            if response:
-                decrypted = client.decrypt_message(response)
+            frame = FrameReader(client.socket).read_frame()
+            if frame and frame[0] == FRAME_DATA:
+                decrypted = client.decrypt_message(frame[1])
                 if decrypted:
                     print(f"[INFO] {decrypted}")
                 else:
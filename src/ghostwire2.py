@@ -8,9 +8,9 @@ import json
 import sys
 import os
 import time
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from Crypto.Util.Padding import pad
 import base64
+from ghostwire_crypto import get_context
 
 BLOCK_SIZE = 16
 DATA_FILE = "/tmp/ghostwire_data.json"
@@ -28,10 +28,9 @@ class GhostwireDaemon:
         self.daemon_socket = None
         
     def encrypt_message(self, message):
-        cipher = AES.new(self.key, AES.MODE_CBC)
-        ct_bytes = cipher.encrypt(pad(message.encode(), BLOCK_SIZE))
-        iv = base64.b64encode(cipher.iv).decode('utf-8')
-        ct = base64.b64encode(ct_bytes).decode('utf-8')
+        payload = get_context(self.key).encrypt_text(message)
+        iv = base64.b64encode(payload[:BLOCK_SIZE]).decode('utf-8')
+        ct = base64.b64encode(payload[BLOCK_SIZE:]).decode('utf-8')
         return iv + " " + ct
     
     def decrypt_message(self, encrypted_message):
@@ -39,9 +38,7 @@ class GhostwireDaemon:
             iv, ct = encrypted_message.split(" ", 1)
             iv = base64.b64decode(iv)
             ct = base64.b64decode(ct)
-            cipher = AES.new(self.key, AES.MODE_CBC, iv)
-            pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-            return pt.decode('utf-8')
+            return get_context(self.key).decrypt(iv + ct).decode('utf-8')
         except:
             return None
     
@@ -257,10 +254,9 @@ class GhostwireClient:
         self.running = False
     
     def encrypt_message(self, message):
-        cipher = AES.new(self.key, AES.MODE_CBC)
-        ct_bytes = cipher.encrypt(pad(message.encode(), BLOCK_SIZE))
-        iv = base64.b64encode(cipher.iv).decode('utf-8')
-        ct = base64.b64encode(ct_bytes).decode('utf-8')
+        payload = get_context(self.key).encrypt_text(message)
+        iv = base64.b64encode(payload[:BLOCK_SIZE]).decode('utf-8')
+        ct = base64.b64encode(payload[BLOCK_SIZE:]).decode('utf-8')
         return iv + " " + ct
     
     def decrypt_message(self, encrypted_message):
@@ -268,9 +264,7 @@ class GhostwireClient:
             iv, ct = encrypted_message.split(" ", 1)
             iv = base64.b64decode(iv)
             ct = base64.b64decode(ct)
-            cipher = AES.new(self.key, AES.MODE_CBC, iv)
-            pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-            return pt.decode('utf-8')
+            return get_context(self.key).decrypt(iv + ct).decode('utf-8')
         except:
             return None
     
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# ghostwire_agent.py - Local agent that keeps one room connection open for --send
+
+import socket
+import threading
+import json
+import os
+from collections import deque
+from ghostwire_protocol import PRIVATE_SENT, USER_NOT_FOUND
+
+AGENT_DIR = "/tmp/ghostwire-{uid}"  # Used when XDG_RUNTIME_DIR is not set
+AGENT_SOCKET = "ghostwire_agent_{port}_{username}.sock"
+ROOM_AGENT_SOCKET = "ghostwire_agent_{port}_{room}_{username}.sock"
+REPLY_TIMEOUT = 5  # Seconds to wait for the room's answer to a private send
+
+class PendingReply:
+    """The room's answer to one private send, filled in by drain_room"""
+
+    def __init__(self, target_user):
+        self.target_user = target_user
+        self.text = None
+        self.done = threading.Event()
+
+    def matches(self, text):
+        return text in (PRIVATE_SENT.format(target=self.target_user),
+                        USER_NOT_FOUND.format(target=self.target_user))
+
+    def settle(self, text=None):
+        self.text = text
+        self.done.set()
+
+def agent_dir():
+    """Per-user directory the agent sockets live in"""
+    return os.environ.get('XDG_RUNTIME_DIR') or AGENT_DIR.format(uid=os.getuid())
+
+def agent_socket_path(port, username, room=None):
+    """Unix socket the agent for this room and user listens on"""
+    if room:
+        name = ROOM_AGENT_SOCKET.format(port=port, room=room, username=username)
+    else:
+        name = AGENT_SOCKET.format(port=port, username=username)
+    return os.path.join(agent_dir(), name)
+
+def check_owner(path, private=False):
+    """Raise PermissionError unless we own path (and, if private, nobody else can use it)"""
+    info = os.stat(path)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} belongs to another user")
+    if private and info.st_mode & 0o077:
+        raise PermissionError(f"{path} is accessible to other users")
+
+class GhostwireAgent:
+    """Holds one authenticated room connection and relays local sends.
+
+    Scripts talk to the agent over a Unix socket using JSON lines:
+    {"message": "...", "to": "user"} ("to" is optional) answered by
+    {"ok": true} or {"ok": false, "error": "..."}. A private send waits
+    for the room's answer, so an unknown user comes back as an error
+    carrying the server's "[SYSTEM] User ... not found". Every request goes out
+    over the same TCP connection, so the room sees a single join instead
+    of a join/leave pair per message.
+    """
+
+    def __init__(self, host, port, key, username, room=None):
+        self.host = host
+        self.port = port
+        self.key = key
+        self.codec = None  # Cipher suite agreed with the room, set on connect
+        self.username = username
+        self.room = room
+        self.path = agent_socket_path(port, username, room)
+        self.room_socket = None
+        self.room_lock = threading.Lock()  # Serializes writes and reconnects
+        self.pending = deque()  # PendingReply per private send, in the order they went out
+        self.local_socket = None
+        self.running = False
+        self.sent = 0
+
+    def connect(self):
+        """Open the room connection and start draining what the room sends us"""
+        from ghostwire_simple import connect_room  # Not needed by send_via_agent's callers
+        room_socket, reader, self.codec = connect_room(self.host, self.port, self.key, self.username,
+                                                      room=self.room)
+        self.room_socket = room_socket
+        self.pending = deque()
+        threading.Thread(target=self.drain_room, args=(room_socket, reader, self.codec, self.pending),
+                         daemon=True).start()
+
+    def drain_room(self, room_socket, reader, codec, pending):
+        """Read the room so the server never sees us as a slow client.
+
+        Broadcasts are discarded; the server's answer to a private send is
+        handed to the send waiting for it. Replies come back in the order
+        the sends went out, so only the oldest pending send can match.
+        """
+        try:
+            for frame_type, payload in reader:
+                if not pending:
+                    continue
+                text = codec.decode(frame_type, payload)
+                if text is not None and pending[0].matches(text):
+                    pending.popleft().settle(text)
+        except (OSError, ValueError):
+            pass
+        with self.room_lock:
+            if self.room_socket is room_socket:
+                self.room_socket = None
+        while pending:
+            pending.popleft().settle()
+        if self.running:
+            print("[AGENT] Room connection lost, reconnecting on next send")
+
+    def send(self, message, target_user=None):
+        """Encrypt and forward one message over the shared room connection.
+
+        Returns the room's answer to a private send (None for a broadcast,
+        or if the room did not answer within REPLY_TIMEOUT).
+        """
+        reply = None
+        if target_user:
+            message = f"@{target_user} {message}"
+            reply = PendingReply(target_user)
+        with self.room_lock:
+            if self.room_socket is None:
+                self.connect()
+            try:
+                if reply:
+                    self.pending.append(reply)
+                self.room_socket.sendall(self.codec.encode(message))
+            except OSError:
+                # One retry on a fresh connection
+                self.room_socket.close()
+                self.connect()
+                if reply:
+                    reply = PendingReply(target_user)  # The old one was settled with the lost connection
+                    self.pending.append(reply)
+                self.room_socket.sendall(self.codec.encode(message))
+            self.sent += 1
+        if reply is None:
+            return None
+        reply.done.wait(REPLY_TIMEOUT)
+        return reply.text
+
+    def handle_local(self, conn):
+        """Serve JSON-line send requests from one local client"""
+        try:
+            with conn, conn.makefile('rwb') as stream:
+                for line in stream:
+                    try:
+                        request = json.loads(line)
+                        answer = self.send(request['message'], request.get('to'))
+                        if answer == USER_NOT_FOUND.format(target=request.get('to')):
+                            reply = {'ok': False, 'error': answer}
+                        else:
+                            reply = {'ok': True}
+                    except (ValueError, KeyError, TypeError) as e:
+                        reply = {'ok': False, 'error': f"bad request: {e}"}
+                    except OSError as e:
+                        reply = {'ok': False, 'error': str(e)}
+                    stream.write(json.dumps(reply).encode() + b"\n")
+                    stream.flush()
+        except OSError:
+            pass
+
+    def start(self):
+        """Connect to the room and serve the local socket until stopped"""
+        # Everyone can create names in /tmp, so the socket goes in a 0700
+        # directory of our own; refuse one somebody else set up for us
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            check_owner(directory, private=True)
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except PermissionError as e:
+            print(f"[ERROR] Cannot create agent socket: {e}")
+            return
+
+        self.connect()
+        self.local_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Create the socket 0600 from the start; a chmod after bind() leaves
+        # a window in which any local user could connect and send as us
+        previous_umask = os.umask(0o177)
+        try:
+            self.local_socket.bind(self.path)
+        finally:
+            os.umask(previous_umask)
+        self.local_socket.listen(64)
+        self.running = True
+
+        print(f"[AGENT] Connected to {self.host}:{self.port} as {self.username}")
+        print(f"[AGENT] Accepting sends on {self.path}")
+
+        try:
+            while self.running:
+                conn, _ = self.local_socket.accept()
+                threading.Thread(target=self.handle_local, args=(conn,), daemon=True).start()
+        except (KeyboardInterrupt, OSError):
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Close the local socket and leave the room"""
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.local_socket.close()
+            os.unlink(self.path)
+        except OSError:
+            pass
+        with self.room_lock:
+            if self.room_socket is not None:
+                self.room_socket.close()
+                self.room_socket = None
+        print(f"[AGENT] Stopped after relaying {self.sent} messages")
+
+class AgentConnection:
+    """Client side of the agent socket; reuse one for many sends"""
+
+    def __init__(self, port, username, timeout=5, room=None):
+        path = agent_socket_path(port, username, room)
+        check_owner(path)  # Anyone else's socket could be listening for our messages
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.stream = self.sock.makefile('rwb')
+
+    def send(self, message, target_user=None):
+        """Relay one message; raises ConnectionError if the agent refuses it"""
+        request = {'message': message}
+        if target_user:
+            request['to'] = target_user
+        self.stream.write(json.dumps(request).encode() + b"\n")
+        self.stream.flush()
+        reply = self.stream.readline()
+        if not reply:
+            raise ConnectionError("agent closed the connection")
+        reply = json.loads(reply)
+        if not reply.get('ok'):
+            raise ConnectionError(reply.get('error', 'agent refused message'))
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+def send_via_agent(port, username, message, target_user=None, room=None):
+    """Send through a running agent; returns False if there is none"""
+    try:
+        agent = AgentConnection(port, username, room=room)
+    except PermissionError as e:
+        print(f"[WARN] Not using agent socket: {e}")
+        return False
+    except OSError:
+        return False
+    try:
+        agent.send(message, target_user)
+    finally:
+        agent.close()
+    return True
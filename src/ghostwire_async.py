@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# ghostwire_async.py - Single event loop room server for large rooms
+
+import asyncio
+import signal
+import threading
+
+from ghostwire_protocol import (FRAME_HELLO, PROBE, RECV_SIZE, FrameDecoder, is_probe, parse_hello,
+                                parse_hello_fields)
+from ghostwire_fanout import DEFAULT_QUEUE_FRAMES, DEFAULT_QUEUE_BYTES, POLICY_DISCONNECT
+from ghostwire_history import DEFAULT_HISTORY_MESSAGES, DEFAULT_HISTORY_BYTES
+from ghostwire_simple import GhostwireServer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+LISTEN_BACKLOG = 1024
+
+class AsyncGhostwireServer(GhostwireServer):
+    """GhostwireServer variant that serves every client from one asyncio loop.
+
+    Idle members cost a StreamReader/StreamWriter pair instead of a thread
+    and its stack, so a single process can hold tens of thousands of
+    connections. Handshake, private messages and LIST_USERS_CMD behave
+    exactly like the threaded server because routing is shared with it.
+    """
+
+    def __init__(self, port, key, alias, creator_username, queue_size=DEFAULT_QUEUE_FRAMES,
+                 queue_bytes=DEFAULT_QUEUE_BYTES, slow_policy=POLICY_DISCONNECT, opaque=False,
+                 history=DEFAULT_HISTORY_MESSAGES, history_bytes=DEFAULT_HISTORY_BYTES, log_dir=None):
+        super().__init__(port, key, alias, creator_username, queue_size, queue_bytes, slow_policy, opaque,
+                         history, history_bytes, log_dir)
+        self.loop = None
+        self.loop_thread = None
+        self.server = None
+        self.shutdown_event = None
+
+    def write_direct(self, writer, data):
+        """Queue bytes on the client's transport without blocking the loop"""
+        if writer.is_closing():
+            raise ConnectionError("connection closed")
+        writer.write(data)
+
+    def start_writer(self, writer):
+        """Create the outbound queue and writer task for a new member"""
+        wakeup = asyncio.Event()
+        outbox = self.create_outbox(notify=lambda: self.wake(wakeup))
+        task = self.loop.create_task(self.write_loop(writer, outbox, wakeup))
+        return {'outbox': outbox, 'writer': task}
+
+    def wake(self, event):
+        """Set an asyncio.Event from the loop thread or from any other thread"""
+        if threading.get_ident() == self.loop_thread:
+            event.set()
+        else:
+            self.loop.call_soon_threadsafe(event.set)
+
+    async def write_loop(self, writer, outbox, wakeup):
+        """Drain one client's outbound queue into its transport"""
+        try:
+            while True:
+                frames = outbox.take_nowait()
+                if frames is None:
+                    return
+                if frames:
+                    writer.write(b"".join(frames))
+                    await writer.drain()
+                    outbox.mark_sent(frames)
+                    continue
+                await wakeup.wait()
+                wakeup.clear()
+        except (ConnectionError, OSError):
+            outbox.close(discard=True)
+            self.remove_client(writer)
+
+    async def read_frames(self, reader, decoder):
+        """Wait for the next batch of complete frames, [] on EOF"""
+        while True:
+            data = await reader.read(RECV_SIZE)
+            if not data:
+                return []
+            frames = decoder.feed(data)
+            if frames:
+                return frames
+
+    async def handle_connection(self, reader, writer):
+        """Handle individual client on the event loop"""
+        address = writer.get_extra_info('peername')
+        username = None
+        decoder = FrameDecoder()
+        try:
+            # Wait for client to send username first
+            frames = await self.read_frames(reader, decoder)
+            if frames and is_probe(frames[0]):
+                writer.write(PROBE)
+                frames = frames[1:] or await self.read_frames(reader, decoder)
+            if not frames or frames[0][0] != FRAME_HELLO:
+                writer.close()
+                return
+
+            username = parse_hello(frames[0][1])
+            if not username:
+                writer.close()
+                return
+
+            # Handle special commands
+            if self.handle_command(writer, username):
+                await writer.drain()
+                writer.close()
+                return
+
+            fields = parse_hello_fields(frames[0][1])
+            codec = self.negotiate(writer, fields)
+
+            # Ensure user exists in users list
+            self.remember_user(username)
+
+            self.join_member(writer, username, address, codec, fields)
+
+            print(f"[INFO] {username} connected from {address}")
+            self.broadcast_to_all(f"[SYSTEM] {username} joined the room", exclude_socket=writer)
+        except Exception:
+            writer.close()
+            return
+
+        try:
+            # Frames that arrived together with the handshake come first
+            frames = frames[1:]
+            while self.running:
+                for frame_type, payload in frames:
+                    self.handle_frame(writer, username, codec, frame_type, payload)
+
+                frames = await self.read_frames(reader, decoder)
+                if not frames:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"[ERROR] Client {username} error: {e}")
+        finally:
+            self.remove_client(writer)
+
+    def raise_fd_limit(self):
+        """Lift the soft open-file limit to the hard limit for big rooms"""
+        if resource is None:
+            return
+        try:
+            soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+            if hard == resource.RLIM_INFINITY or soft < hard:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+    async def serve(self):
+        """Accept clients until stop() is requested"""
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.shutdown_event = asyncio.Event()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self.shutdown_event.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass
+
+        self.server = await asyncio.start_server(
+            self.handle_connection, '0.0.0.0', self.port,
+            reuse_address=True, backlog=LISTEN_BACKLOG
+        )
+        self.running = True
+
+        print(f"[SERVER] Ghostwire '{self.alias}' started on port {self.port} (asyncio)")
+        print(f"[SERVER] Room created by: {self.creator}")
+        print(f"[SERVER] Waiting for connections...")
+
+        try:
+            await self.shutdown_event.wait()
+            print("\n[SERVER] Shutting down...")
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        """Notify members, flush their transports and close everything"""
+        self.running = False
+        self.server.close()
+
+        termination_message = f"[SYSTEM]: The room port {self.port} has been terminated"
+        print(f"[SERVER] Broadcasting termination message to {len(self.clients)} users")
+
+        writers = list(self.clients.keys())
+        frames = {}
+        for writer in writers:
+            try:
+                self.send_text(writer, termination_message, frames)
+            except Exception:
+                pass
+
+        # Give the writer tasks a moment to flush what is still queued
+        tasks = []
+        for user_info in list(self.clients.values()):
+            user_info['outbox'].close()
+            tasks.append(user_info['writer'])
+        if tasks:
+            await asyncio.wait(tasks, timeout=1.0)
+
+        # Now disconnect all clients
+        for writer in writers:
+            self.remove_client(writer)
+
+        await self.server.wait_closed()
+        self.history.close()
+        self.save_data()
+        stats = self.get_stats()
+        print(f"[SERVER] Fan-out: {stats['sent_frames']} frames sent, {stats['dropped']} dropped, "
+              f"{stats['evicted']} slow clients evicted")
+        print(f"[SERVER] Server on port {self.port} stopped")
+
+    def start(self):
+        """Start the server"""
+        self.raise_fd_limit()
+        asyncio.run(self.serve())
+
+    def stop(self):
+        """Stop the server (safe to call from any thread)"""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.shutdown_event.set)
@@ -3,27 +3,24 @@
 
 import socket
 import threading
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from Crypto.Util.Padding import pad
 import base64
+from ghostwire_crypto import get_context
 
 BLOCK_SIZE = 16
 clients = []  # List to store all connected clients
 
 def encrypt_message(message, key):
-    cipher = AES.new(key, AES.MODE_CBC)
-    ct_bytes = cipher.encrypt(pad(message.encode(), BLOCK_SIZE))
-    iv = base64.b64encode(cipher.iv).decode('utf-8')
-    ct = base64.b64encode(ct_bytes).decode('utf-8')
+    payload = get_context(key).encrypt_text(message)
+    iv = base64.b64encode(payload[:BLOCK_SIZE]).decode('utf-8')
+    ct = base64.b64encode(payload[BLOCK_SIZE:]).decode('utf-8')
     return iv + " " + ct
 
 def decrypt_message(encrypted_message, key):
     iv, ct = encrypted_message.split()
     iv = base64.b64decode(iv)
     ct = base64.b64decode(ct)
-    cipher = AES.new(key, AES.MODE_CBC, iv)
-    pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-    return pt.decode('utf-8')
+    return get_context(key).decrypt(iv + ct).decode('utf-8')
 
 def broadcast_message(message, sender_socket, key):
     """Broadcast message to all connected clients except sender"""
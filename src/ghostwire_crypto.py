@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# ghostwire_crypto.py - Shared message encryption with cached key contexts
+
+import os
+import hashlib
+import threading
+from Crypto.Cipher import AES, ChaCha20_Poly1305
+from ghostwire_protocol import (FRAME_DATA, FRAME_SEALED, FRAME_RELAY, FRAME_SEQ, encode_frame,
+                                encode_relay_header, parse_relay_header, parse_sequenced)
+
+BLOCK_SIZE = 16
+IV_SIZE = 16
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# Cipher suites a connection can negotiate in its handshake
+SUITE_CBC = 'aes-cbc'                     # Legacy: IV + padded AES-CBC, no integrity
+SUITE_GCM = 'aes-gcm'                     # AEAD: nonce + ciphertext + tag
+SUITE_CHACHA = 'chacha20-poly1305'        # AEAD: nonce + ciphertext + tag
+AEAD_SUITES = (SUITE_CHACHA, SUITE_GCM)
+CIPHER_SUITES = AEAD_SUITES + (SUITE_CBC,)
+PREFERRED_SUITES = CIPHER_SUITES          # What clients offer, best first
+
+# Messages up to this many blocks are chained in Python on top of the cached
+# key schedule; longer ones are faster through a fresh CBC cipher object
+SHORT_MESSAGE_BLOCKS = 4
+
+# Ciphertext handled per ECB call in decrypt_batch; bigger batches are split
+# because the XOR over one huge integer stops paying off
+BATCH_BYTES = 64 * 1024
+
+class CipherContext:
+    """AES-CBC encryption for one key, set up once and reused for every message.
+
+    Payloads are the raw IV followed by the PKCS#7 padded ciphertext, the
+    same bytes the framed protocol carries. CBC decryption of a message is
+    one ECB pass over the ciphertext XORed with the previous blocks, so
+    decrypt() does exactly that against the cached key schedule; batches
+    of messages are handled with a single ECB call per chained block.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.ecb = AES.new(key, AES.MODE_ECB)
+
+    @staticmethod
+    def pad(data):
+        count = BLOCK_SIZE - len(data) % BLOCK_SIZE
+        return data + bytes([count]) * count
+
+    @staticmethod
+    def unpad(data):
+        if not data:
+            raise ValueError("Empty plaintext")
+        count = data[-1]
+        if not 1 <= count <= BLOCK_SIZE or data[-count:] != bytes([count]) * count:
+            raise ValueError("Padding is incorrect.")
+        return data[:-count]
+
+    @staticmethod
+    def xor(a, b):
+        size = len(a)
+        return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(size, 'big')
+
+    @staticmethod
+    def check_payload(payload):
+        if len(payload) < IV_SIZE + BLOCK_SIZE or len(payload) % BLOCK_SIZE:
+            raise ValueError("Ciphertext is not a whole number of blocks")
+
+    def encrypt(self, data):
+        """Encrypt bytes into IV + ciphertext"""
+        iv = os.urandom(IV_SIZE)
+        padded = self.pad(data)
+        if len(padded) > SHORT_MESSAGE_BLOCKS * BLOCK_SIZE:
+            return iv + AES.new(self.key, AES.MODE_CBC, iv).encrypt(padded)
+
+        blocks = [iv]
+        encrypt_block = self.ecb.encrypt
+        previous = int.from_bytes(iv, 'big')
+        for offset in range(0, len(padded), BLOCK_SIZE):
+            block = encrypt_block((int.from_bytes(padded[offset:offset + BLOCK_SIZE], 'big') ^ previous)
+                                  .to_bytes(BLOCK_SIZE, 'big'))
+            blocks.append(block)
+            previous = int.from_bytes(block, 'big')
+        return b"".join(blocks)
+
+    def decrypt(self, payload):
+        """Decrypt IV + ciphertext back into bytes; raises ValueError if invalid"""
+        self.check_payload(payload)
+        payload = bytes(payload)
+        return self.unpad(self.xor(self.ecb.decrypt(payload[IV_SIZE:]), payload[:-BLOCK_SIZE]))
+
+    def encrypt_text(self, message):
+        return self.encrypt(message.encode('utf-8'))
+
+    def decrypt_text(self, payload):
+        """Decrypt to a string; None if the payload is not valid for this key"""
+        try:
+            return self.decrypt(payload).decode('utf-8')
+        except ValueError:
+            return None
+
+    def encrypt_batch(self, messages):
+        """Encrypt many byte strings, chaining the short ones in lockstep.
+
+        Round n encrypts block n of every short message that is that long
+        in one ECB call, so the per-call overhead is paid per round instead
+        of per message. Long messages go through encrypt() one by one.
+        """
+        padded = [self.pad(data) for data in messages]
+        previous = [os.urandom(IV_SIZE) for _ in padded]
+        outputs = [[iv] for iv in previous]
+        active = []
+        for i, data in enumerate(padded):
+            if len(data) > SHORT_MESSAGE_BLOCKS * BLOCK_SIZE:
+                outputs[i] = [previous[i], AES.new(self.key, AES.MODE_CBC, previous[i]).encrypt(data)]
+            else:
+                active.append(i)
+        offset = 0
+        while active:
+            plain = b"".join(padded[i][offset:offset + BLOCK_SIZE] for i in active)
+            chained = self.ecb.encrypt(self.xor(plain, b"".join(previous[i] for i in active)))
+            for position, i in enumerate(active):
+                block = chained[position * BLOCK_SIZE:(position + 1) * BLOCK_SIZE]
+                previous[i] = block
+                outputs[i].append(block)
+            offset += BLOCK_SIZE
+            active = [i for i in active if len(padded[i]) > offset]
+        return [b"".join(blocks) for blocks in outputs]
+
+    def decrypt_batch(self, payloads):
+        """Decrypt many payloads with one ECB pass per chunk; invalid ones come back as None"""
+        results = [None] * len(payloads)
+        chunk = []
+        chunk_bytes = 0
+        for index, payload in enumerate(payloads):
+            try:
+                self.check_payload(payload)
+            except ValueError:
+                continue
+            chunk.append((index, bytes(payload)))
+            chunk_bytes += len(payload)
+            if chunk_bytes >= BATCH_BYTES:
+                self._decrypt_chunk(chunk, results)
+                chunk = []
+                chunk_bytes = 0
+        if chunk:
+            self._decrypt_chunk(chunk, results)
+        return results
+
+    def _decrypt_chunk(self, chunk, results):
+        plain = self.xor(self.ecb.decrypt(b"".join(p[IV_SIZE:] for _, p in chunk)),
+                         b"".join(p[:-BLOCK_SIZE] for _, p in chunk))
+        offset = 0
+        for index, payload in chunk:
+            size = len(payload) - IV_SIZE
+            try:
+                results[index] = self.unpad(plain[offset:offset + size])
+            except ValueError:
+                pass
+            offset += size
+
+class AeadContext:
+    """Authenticated encryption (AES-GCM or ChaCha20-Poly1305) for one key.
+
+    Payloads are nonce || ciphertext || tag in a single buffer: no padding,
+    no separate IV field, and decrypt() verifies the tag before anything
+    is decoded, so tampered or foreign frames are rejected up front. The
+    AEAD key is derived from the room key with SHA-256, separately per
+    suite, so the same key material is never used by two algorithms.
+    """
+
+    def __init__(self, key, suite):
+        if suite not in AEAD_SUITES:
+            raise ValueError(f"Unknown AEAD suite: {suite}")
+        self.suite = suite
+        self.key = hashlib.sha256(b"ghostwire:" + suite.encode() + b":" + key).digest()
+
+    def cipher(self, nonce, aad=None):
+        if self.suite == SUITE_GCM:
+            cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce, mac_len=TAG_SIZE)
+        else:
+            cipher = ChaCha20_Poly1305.new(key=self.key, nonce=nonce)
+        if aad:
+            cipher.update(aad)
+        return cipher
+
+    def encrypt(self, data, aad=None):
+        """Seal bytes into nonce + ciphertext + tag, authenticating aad as well"""
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext, tag = self.cipher(nonce, aad).encrypt_and_digest(data)
+        return nonce + ciphertext + tag
+
+    def decrypt(self, payload, aad=None):
+        """Verify and open a sealed payload; raises ValueError if it was tampered with"""
+        if len(payload) < NONCE_SIZE + TAG_SIZE:
+            raise ValueError("Sealed payload too short")
+        payload = bytes(payload)
+        return self.cipher(payload[:NONCE_SIZE], aad).decrypt_and_verify(
+            payload[NONCE_SIZE:-TAG_SIZE], payload[-TAG_SIZE:])
+
+    def encrypt_text(self, message):
+        return self.encrypt(message.encode('utf-8'))
+
+    def decrypt_text(self, payload):
+        """Open to a string; None if authentication fails"""
+        try:
+            return self.decrypt(payload).decode('utf-8')
+        except ValueError:
+            return None
+
+    def encrypt_batch(self, messages):
+        return [self.encrypt(data) for data in messages]
+
+    def decrypt_batch(self, payloads):
+        results = []
+        for payload in payloads:
+            try:
+                results.append(self.decrypt(payload))
+            except ValueError:
+                results.append(None)
+        return results
+
+class MessageCodec:
+    """Turns text into wire frames and back for one negotiated cipher suite.
+
+    relay is set for connections that also agreed on opaque relaying: they
+    accept FRAME_RELAY frames, whose sender/target header is bound to the
+    sealed message as associated data. FRAME_SEQ frames (room messages
+    numbered for history catch-up) are unwrapped and decoded like the
+    frame inside them.
+    """
+
+    def __init__(self, context, frame_type, relay=False):
+        self.context = context
+        self.frame_type = frame_type
+        self.relay = relay
+        self.frame_types = (frame_type, FRAME_RELAY, FRAME_SEQ) if relay else (frame_type, FRAME_SEQ)
+        self.suite = getattr(context, 'suite', SUITE_CBC)
+
+    @staticmethod
+    def format_relay(sender, target, message):
+        """The line a member sees for a relayed message"""
+        if target:
+            return f"[PRIVATE from {sender}]: {message}"
+        return f"[{sender}]: {message}"
+
+    def encode(self, message):
+        """Encrypt text into a complete frame"""
+        return encode_frame(self.frame_type, self.context.encrypt_text(message))
+
+    def encode_batch(self, messages):
+        """Encrypt many texts into frames with the context's batch API"""
+        payloads = self.context.encrypt_batch([message.encode('utf-8') for message in messages])
+        return [encode_frame(self.frame_type, payload) for payload in payloads]
+
+    def open_relay(self, payload):
+        """(sender, target, text) of a relay payload; None if malformed or tampered with"""
+        header = parse_relay_header(payload)
+        if header is None:
+            return None
+        sender, target, size = header
+        payload = bytes(payload)
+        try:
+            return sender, target, self.context.decrypt(payload[size:], payload[:size]).decode('utf-8')
+        except ValueError:
+            return None
+
+    def decode(self, frame_type, payload):
+        """Text of a received frame; None if it is the wrong type or fails to decrypt"""
+        if frame_type == FRAME_SEQ:
+            sequenced = parse_sequenced(payload)
+            if sequenced is None:
+                return None
+            _, frame_type, payload = sequenced
+        if frame_type == FRAME_RELAY and self.relay:
+            opened = self.open_relay(payload)
+            return self.format_relay(*opened) if opened else None
+        if frame_type != self.frame_type:
+            return None
+        return self.context.decrypt_text(payload)
+
+class RelayCodec(MessageCodec):
+    """Client side of opaque relaying: messages leave as FRAME_RELAY frames.
+
+    The server only reads the header, checks the sender against the
+    connection's username and forwards the frame bytes unchanged, so it
+    never has to decrypt or re-encrypt what members say to each other.
+    """
+
+    def __init__(self, context, username):
+        super().__init__(context, FRAME_SEALED, relay=True)
+        self.username = username
+
+    def encode(self, message):
+        """Seal text ("@user text" for a private message) into a relay frame"""
+        target = None
+        if message.startswith('@'):
+            parts = message.split(' ', 1)
+            if len(parts) == 2:
+                target, message = parts[0][1:], parts[1]
+        header = encode_relay_header(self.username, target)
+        return encode_frame(FRAME_RELAY, header + self.context.encrypt(message.encode('utf-8'), header))
+
+    def encode_batch(self, messages):
+        return [self.encode(message) for message in messages]
+
+contexts = {}
+contexts_lock = threading.Lock()
+
+def get_context(key, suite=SUITE_CBC):
+    """Shared context for a key and cipher suite (created on first use)"""
+    context = contexts.get((key, suite))
+    if context is None:
+        with contexts_lock:
+            context = contexts.get((key, suite))
+            if context is None:
+                context = CipherContext(key) if suite == SUITE_CBC else AeadContext(key, suite)
+                contexts[(key, suite)] = context
+    return context
+
+def get_codec(key, suite=SUITE_CBC, relay=False):
+    """MessageCodec for a key and suite, sharing the cached context"""
+    return MessageCodec(get_context(key, suite), FRAME_DATA if suite == SUITE_CBC else FRAME_SEALED,
+                        relay and suite in AEAD_SUITES)
+
+def choose_suite(offered, supported=CIPHER_SUITES):
+    """First suite of the client's offer (best first) that we support, else CBC"""
+    for suite in offered:
+        if suite in supported:
+            return suite
+    return SUITE_CBC
+
+def encrypt_message(key, message):
+    """Encrypt text with the cached context for key: IV + ciphertext"""
+    return get_context(key).encrypt_text(message)
+
+def decrypt_message(key, payload):
+    """Decrypt IV + ciphertext to text with the cached context; None if invalid"""
+    return get_context(key).decrypt_text(payload)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# ghostwire_fanout.py - Per-client outbound queues and writer threads
+
+import threading
+from collections import deque
+
+DEFAULT_QUEUE_FRAMES = 256
+DEFAULT_QUEUE_BYTES = 4 * 1024 * 1024
+
+# What to do when a client's queue reaches its high-water mark
+POLICY_DROP_OLDEST = 'drop-oldest'  # Discard the oldest queued frames to make room
+POLICY_DISCONNECT = 'disconnect'    # Evict the slow client
+POLICY_DROP_NEWEST = 'drop-newest'  # Discard new frames until the queue drains to half
+SLOW_CLIENT_POLICIES = (POLICY_DROP_OLDEST, POLICY_DISCONNECT, POLICY_DROP_NEWEST)
+# Earlier name of drop-newest. Nothing slows the sender down, so it never was a pause.
+POLICY_ALIASES = {'pause': POLICY_DROP_NEWEST}
+
+class OutboundQueue:
+    """Bounded FIFO of already encoded frames waiting for one client.
+
+    Broadcasts encode a frame once and put() the same immutable bytes
+    object into every recipient's queue, so the sender never waits on a
+    recipient's socket. A writer (thread or event-loop task) drains the
+    queue and does the actual I/O.
+
+    The queue is bounded both in frames and in bytes. What happens when a
+    bound is hit depends on the slow-client policy; put() only returns
+    False when the client should be evicted. No policy slows the sender
+    down. A stalled member must not hold up the rest of the room, so a
+    full queue costs that member frames or its connection. While
+    drop-newest is discarding, the queue counts as paused (the 'paused'
+    and 'pauses' counters).
+    """
+
+    def __init__(self, max_frames=DEFAULT_QUEUE_FRAMES, max_bytes=DEFAULT_QUEUE_BYTES,
+                 policy=POLICY_DISCONNECT, notify=None):
+        policy = POLICY_ALIASES.get(policy, policy)
+        if policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow client policy: {policy}")
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.notify = notify  # Called after every put, for event-loop writers
+        self.frames = deque()
+        self.queued_bytes = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.closed = False
+        self.paused = False
+
+        # Counters
+        self.enqueued = 0
+        self.dropped = 0
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.pauses = 0
+        self.peak_frames = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def over_high_water(self, size):
+        return (len(self.frames) >= self.max_frames or
+                self.queued_bytes + size > self.max_bytes)
+
+    def under_low_water(self):
+        return (len(self.frames) <= self.max_frames // 2 and
+                self.queued_bytes <= self.max_bytes // 2)
+
+    def put(self, frame):
+        """Queue a frame; returns False if the client should be evicted"""
+        size = len(frame)
+        with self.lock:
+            if self.closed:
+                return False
+
+            if self.paused:
+                if not self.under_low_water():
+                    self.dropped += 1
+                    return True
+                self.paused = False
+
+            if self.over_high_water(size):
+                if self.policy == POLICY_DISCONNECT:
+                    return False
+                if self.policy == POLICY_DROP_NEWEST:
+                    self.paused = True
+                    self.pauses += 1
+                    self.dropped += 1
+                    return True
+                # POLICY_DROP_OLDEST
+                while self.frames and self.over_high_water(size):
+                    self.queued_bytes -= len(self.frames.popleft())
+                    self.dropped += 1
+                if size > self.max_bytes:
+                    self.dropped += 1
+                    return True
+
+            self.frames.append(frame)
+            self.queued_bytes += size
+            self.enqueued += 1
+            if len(self.frames) > self.peak_frames:
+                self.peak_frames = len(self.frames)
+            self.ready.notify()
+        if self.notify:
+            self.notify()
+        return True
+
+    def take_all(self, timeout=None):
+        """Block until frames are queued and return all of them.
+
+        Returns None once the queue is closed and fully drained.
+        """
+        with self.lock:
+            while not self.frames and not self.closed:
+                if not self.ready.wait(timeout):
+                    return []
+            return self._drain()
+
+    def take_nowait(self):
+        """Return all queued frames without blocking (None once closed)"""
+        with self.lock:
+            return self._drain()
+
+    def _drain(self):
+        if not self.frames:
+            return None if self.closed else []
+        frames = list(self.frames)
+        self.frames.clear()
+        self.queued_bytes = 0
+        return frames
+
+    def mark_sent(self, frames):
+        """Record frames that the writer has handed to the socket"""
+        with self.lock:
+            self.sent_frames += len(frames)
+            self.sent_bytes += sum(len(frame) for frame in frames)
+
+    def close(self, discard=False):
+        """Stop accepting frames; pending ones are still delivered unless discarded"""
+        with self.lock:
+            self.closed = True
+            if discard:
+                self.dropped += len(self.frames)
+                self.frames.clear()
+                self.queued_bytes = 0
+            self.ready.notify_all()
+        if self.notify:
+            self.notify()
+
+    def stats(self):
+        """Snapshot of this queue's counters"""
+        with self.lock:
+            return {
+                'queued_frames': len(self.frames),
+                'queued_bytes': self.queued_bytes,
+                'peak_frames': self.peak_frames,
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'sent_frames': self.sent_frames,
+                'sent_bytes': self.sent_bytes,
+                'pauses': self.pauses,
+                'paused': self.paused,
+            }
+
+class ClientWriter(threading.Thread):
+    """Thread that drains one client's OutboundQueue into its socket"""
+
+    def __init__(self, client_socket, outbox, on_error=None):
+        super().__init__()
+        self.daemon = True
+        self.client_socket = client_socket
+        self.outbox = outbox
+        self.on_error = on_error
+
+    def run(self):
+        while True:
+            frames = self.outbox.take_all()
+            if frames is None:
+                return
+            if not frames:
+                continue
+            try:
+                # Coalesce everything that piled up into a single syscall
+                self.client_socket.sendall(frames[0] if len(frames) == 1 else b"".join(frames))
+                self.outbox.mark_sent(frames)
+            except OSError:
+                self.outbox.close(discard=True)
+                if self.on_error:
+                    self.on_error(self.client_socket)
+                return
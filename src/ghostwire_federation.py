@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# ghostwire_federation.py - Room servers on several nodes peering into one room (--peer)
+
+import os
+import socket
+import struct
+import threading
+import time
+
+from ghostwire_protocol import (FRAME_HELLO, FrameReader, ProtocolError, encode_hello,
+                                parse_hello_fields, parse_relay_header)
+from ghostwire_fanout import POLICY_DISCONNECT, OutboundQueue, ClientWriter
+from ghostwire_crypto import SUITE_CHACHA, get_codec, get_context
+from ghostwire_simple import GhostwireServer
+from ghostwire_history import SeenWindow
+from ghostwire_workers import BUS_MAX_FRAME, BUS_QUEUE_FRAMES, BUS_QUEUE_BYTES, bus_frame
+
+# Frames exchanged between nodes on a peer link
+MESH_AUTH = 1       # Role and both handshake challenges, sealed to prove we hold the room key
+MESH_MEMBERS = 2    # Every username connected to the origin node, one per line
+MESH_BROADCAST = 3  # Text for every member
+MESH_PRIVATE = 4    # Target username, newline, text
+MESH_RELAY = 5      # Cipher suite, newline, relay payload as the member sent it
+
+# What each end of a peer link seals in its MESH_AUTH frame, ahead of both
+# challenges, so neither answer can be replayed as the other or on another link
+AUTH_DIALER = b"dialer\n"
+AUTH_ACCEPTOR = b"acceptor\n"
+CHALLENGE_SIZE = 16
+
+# Sealed part of a mesh frame: origin length and sequence number, origin, body
+ORIGIN = struct.Struct('!BQ')
+MESH_AAD = b"ghostwire-mesh:"  # Keeps mesh frames and client frames from being swapped
+
+PEER_RETRY = 2.0      # Seconds between attempts to (re)connect to a peer
+PEER_TIMEOUT = 5.0    # Longest a peer handshake may take
+MESH_REFRESH = 30.0   # Seconds between membership refreshes; a node silent for 3 is forgotten
+
+def seal_link(context, kind, origin, sequence, body):
+    """Encode one mesh frame; the kind is authenticated along with the body"""
+    origin = origin.encode('utf-8')
+    plain = ORIGIN.pack(len(origin), sequence) + origin + body
+    return bus_frame(kind, context.encrypt(plain, MESH_AAD + bytes([kind])))
+
+def open_link(context, kind, payload):
+    """(origin, sequence, body) of a mesh frame, or None if it fails authentication"""
+    try:
+        plain = context.decrypt(payload, MESH_AAD + bytes([kind]))
+    except ValueError:
+        return None
+    if len(plain) < ORIGIN.size:
+        return None
+    size, sequence = ORIGIN.unpack_from(plain)
+    origin = plain[ORIGIN.size:ORIGIN.size + size].decode('utf-8', 'replace')
+    return origin, sequence, plain[ORIGIN.size + size:]
+
+class FederatedServer(GhostwireServer):
+    """GhostwireServer that shares its room with peer nodes.
+
+    Members connect to whichever node is closest and every node serves
+    its own members as usual. Nodes hold long-lived links to each other
+    (dialled with --peer, accepted on the room port) and flood room
+    traffic over them: each frame carries its origin node and a
+    per-origin sequence number, is delivered once, and is forwarded to
+    every other link, so any connected topology works, loops included.
+    Frames are sealed with the room key and forwarded as is.
+
+    Membership is soft state: a node sends its member list whenever it
+    changes, on every new link and every MESH_REFRESH seconds.
+    """
+
+    def __init__(self, port, key, alias, creator_username, node=None, peers=(), **options):
+        super().__init__(port, key, alias, creator_username, **options)
+        self.node = node or f"{socket.gethostname()}:{port}"
+        self.origin = f"{self.node}/{os.urandom(4).hex()}"  # New per run, so sequences can restart at 1
+        self.peer_addresses = list(peers)
+        self.mesh = get_context(key, SUITE_CHACHA)
+        self.mesh_lock = threading.Lock()
+        self.links = {}           # peer socket -> {'node', 'outbox', 'writer'}
+        self.sequence = 0
+        self.seen = {}            # origin -> SeenWindow
+        self.remote_members = {}  # node -> (origin, sequence, frozenset of usernames, time received, link)
+        self.member_frames = {}   # node -> latest MEMBERS frame, replayed to new links
+        self.mesh_stop = threading.Event()
+        self.counters.update(mesh_in=0, duplicates=0)
+
+    def seal(self, kind, body):
+        """Seal a frame originating here; call with mesh_lock held"""
+        self.sequence += 1
+        return seal_link(self.mesh, kind, self.origin, self.sequence, body)
+
+    def originate(self, kind, body):
+        """Send a frame from this node to every peer"""
+        with self.mesh_lock:
+            frame = self.seal(kind, body)
+        self.forward(frame)
+
+    def forward(self, frame, exclude=None):
+        """Queue a mesh frame on every link but the one it came in on"""
+        for link, info in list(self.links.items()):
+            if link is not exclude and not info['outbox'].put(frame):
+                self.drop_link(link)
+
+    def announce_members(self):
+        """Tell the mesh who is connected to this node"""
+        with self.mesh_lock:
+            body = "\n".join(self.clients.usernames()).encode('utf-8')
+            frame = self.member_frames[self.node] = self.seal(MESH_MEMBERS, body)
+        self.forward(frame)
+
+    def seal_auth(self, role, dialer_challenge, acceptor_challenge):
+        return seal_link(self.mesh, MESH_AUTH, self.origin, 0, role + dialer_challenge + acceptor_challenge)
+
+    def check_auth(self, reader, role, dialer_challenge, acceptor_challenge):
+        """True if the next frame seals this link's challenges for role with the room key"""
+        frame = reader.read_frame()
+        if not frame or frame[0] != MESH_AUTH:
+            return False
+        opened = open_link(self.mesh, MESH_AUTH, frame[1])
+        # A node that echoes our own answer back is not a peer
+        return (opened is not None and opened[0] != self.origin and
+                opened[2] == role + dialer_challenge + acceptor_challenge)
+
+    def serve_client(self, client_socket, address, reader, frame):
+        """Take peer links on the room port; everything else is a member"""
+        if frame and frame[0] == FRAME_HELLO:
+            fields = parse_hello_fields(frame[1])
+            if 'PEER' in fields:
+                self.accept_peer(client_socket, address, reader, fields)
+                return
+        super().serve_client(client_socket, address, reader, frame)
+
+    def accept_peer(self, link, address, reader, fields):
+        """Answer a node that dialled us, then run the link"""
+        challenge = os.urandom(CHALLENGE_SIZE)
+        reader.decoder.max_frame_size = BUS_MAX_FRAME
+        try:
+            theirs = bytes.fromhex(fields.get('CHALLENGE', ''))
+            if len(theirs) != CHALLENGE_SIZE:
+                raise ProtocolError("bad challenge")
+            link.settimeout(PEER_TIMEOUT)
+            link.sendall(encode_hello(peer=self.node, challenge=challenge.hex()) +
+                         self.seal_auth(AUTH_ACCEPTOR, theirs, challenge))
+            if not self.check_auth(reader, AUTH_DIALER, theirs, challenge):
+                raise ProtocolError("peer does not hold the room key")
+            link.settimeout(None)
+        except (OSError, ValueError, ProtocolError) as e:
+            print(f"[WARN] Refused peer link from {address}: {e}")
+            link.close()
+            return
+        self.run_link(link, reader, fields['PEER'])
+
+    def dial_peer(self, address):
+        """Keep a link to one --peer address, reconnecting whenever it drops"""
+        host, _, port = address.rpartition(':')
+        while self.running:
+            try:
+                link = socket.create_connection((host or 'localhost', int(port)), PEER_TIMEOUT)
+            except OSError:
+                time.sleep(PEER_RETRY)
+                continue
+            reader = FrameReader(link, BUS_MAX_FRAME)
+            challenge = os.urandom(CHALLENGE_SIZE)
+            try:
+                link.sendall(encode_hello(peer=self.node, challenge=challenge.hex()))
+                frame = reader.read_frame()
+                fields = parse_hello_fields(frame[1]) if frame and frame[0] == FRAME_HELLO else {}
+                theirs = bytes.fromhex(fields.get('CHALLENGE', ''))
+                if 'PEER' not in fields or len(theirs) != CHALLENGE_SIZE or \
+                        not self.check_auth(reader, AUTH_ACCEPTOR, challenge, theirs):
+                    raise ProtocolError("not a peer holding the room key")
+                link.sendall(self.seal_auth(AUTH_DIALER, challenge, theirs))
+                link.settimeout(None)
+            except (OSError, ValueError, ProtocolError) as e:
+                print(f"[WARN] Peer {address} refused the link: {e}")
+                link.close()
+                time.sleep(PEER_RETRY)
+                continue
+            self.run_link(link, reader, fields['PEER'])
+            if self.running:
+                time.sleep(PEER_RETRY)
+
+    def run_link(self, link, reader, node):
+        """Catch a new peer up on membership, then apply its frames until it goes away"""
+        outbox = OutboundQueue(BUS_QUEUE_FRAMES, BUS_QUEUE_BYTES, POLICY_DISCONNECT)
+        writer = ClientWriter(link, outbox, on_error=self.drop_link)
+        writer.start()
+        with self.mesh_lock:
+            self.links[link] = {'node': node, 'outbox': outbox, 'writer': writer}
+            replay = list(self.member_frames.values())
+        for frame in replay:
+            outbox.put(frame)
+        print(f"[MESH] Linked with node {node}")
+        try:
+            for kind, payload in reader:
+                self.handle_link_frame(link, kind, payload)
+        except (OSError, ProtocolError) as e:
+            if self.running:
+                print(f"[WARN] Link with node {node} failed: {e}")
+        finally:
+            self.drop_link(link)
+
+    def drop_link(self, link):
+        """Close a peer link and forget the members that were announced over it"""
+        with self.mesh_lock:
+            info = self.links.pop(link, None)
+            if info is None:
+                return
+            # Only what this link told us, never a node it merely names; a node
+            # still reachable another way comes back with its next refresh
+            for node, members in list(self.remote_members.items()):
+                if members[4] is link:
+                    del self.remote_members[node]
+                    self.member_frames.pop(node, None)
+        info['outbox'].close(discard=True)
+        try:
+            link.close()
+        except OSError:
+            pass
+        if self.running:
+            print(f"[MESH] Lost link with node {info['node']}")
+
+    def handle_link_frame(self, link, kind, payload):
+        """Deliver and pass on a mesh frame the first time it arrives"""
+        opened = open_link(self.mesh, kind, payload)
+        if opened is None:
+            raise ProtocolError("mesh frame failed authentication")
+        origin, sequence, body = opened
+        with self.mesh_lock:
+            fresh = origin != self.origin and self.seen.setdefault(origin, SeenWindow()).add(sequence)
+        with self.stats_lock:
+            self.counters['mesh_in' if fresh else 'duplicates'] += 1
+        if not fresh:
+            return
+        frame = bus_frame(kind, bytes(payload))
+        self.forward(frame, exclude=link)
+        self.deliver_mesh(origin, sequence, kind, body, frame, link)
+
+    def deliver_mesh(self, origin, sequence, kind, body, frame, link):
+        """Apply one mesh frame, received over link, to this node's members"""
+        if kind == MESH_MEMBERS:
+            node = origin.rpartition('/')[0]
+            usernames = frozenset(filter(None, body.decode('utf-8').split('\n')))
+            with self.mesh_lock:
+                current = self.remote_members.get(node)
+                if current is None or current[0] != origin or sequence > current[1]:
+                    self.remote_members[node] = (origin, sequence, usernames, time.time(), link)
+                    self.member_frames[node] = frame
+                for username in usernames:
+                    self.remember_user(username)
+        elif kind == MESH_BROADCAST:
+            super().broadcast_to_all(body.decode('utf-8'))
+        elif kind == MESH_PRIVATE:
+            target_user, _, message = body.decode('utf-8').partition('\n')
+            super().send_to_user(message, target_user)
+        elif kind == MESH_RELAY:
+            suite, _, payload = body.partition(b'\n')
+            codec = get_codec(self.key, suite.decode('ascii'), relay=True)
+            header = parse_relay_header(payload)
+            if header is None:
+                return
+            if header[1]:
+                super().relay_to_user(codec, payload, header[1])
+            else:
+                super().relay_to_all(codec, payload)
+
+    def refresh_members(self):
+        """Re-announce our members and forget nodes that went quiet"""
+        while not self.mesh_stop.wait(MESH_REFRESH):
+            self.announce_members()
+            self.forget_quiet_nodes(time.time() - 3 * MESH_REFRESH)
+
+    def forget_quiet_nodes(self, cutoff):
+        """Drop the members and duplicate windows of nodes not heard from since cutoff.
+
+        Every run of a node is a new origin, so without this a mesh that
+        sees restarts would keep one SeenWindow per past run forever.
+        """
+        with self.mesh_lock:
+            for node, members in list(self.remote_members.items()):
+                if members[3] < cutoff:
+                    del self.remote_members[node]
+                    self.member_frames.pop(node, None)
+            for origin, window in list(self.seen.items()):
+                if window.heard < cutoff:
+                    del self.seen[origin]
+
+    def is_remote_member(self, username):
+        with self.mesh_lock:
+            return any(username in members[2] for members in self.remote_members.values())
+
+    def register_client(self, client_socket, username, address, codec=None):
+        user_info = super().register_client(client_socket, username, address, codec)
+        self.announce_members()
+        return user_info
+
+    def unregister_client(self, client_socket):
+        user_info = super().unregister_client(client_socket)
+        if user_info is not None:
+            self.announce_members()
+        return user_info
+
+    def broadcast_to_all(self, message, exclude_socket=None, frames=None):
+        """Send message to the members of this node and of every peer"""
+        super().broadcast_to_all(message, exclude_socket, frames)
+        self.originate(MESH_BROADCAST, message.encode('utf-8'))
+
+    def send_to_user(self, message, target_user):
+        """Send message to every session of a user, on whichever nodes they are"""
+        delivered = super().send_to_user(message, target_user)
+        if self.is_remote_member(target_user):
+            self.originate(MESH_PRIVATE, f"{target_user}\n{message}".encode('utf-8'))
+            delivered = True
+        return delivered
+
+    def relay_to_all(self, codec, payload, exclude_socket=None):
+        super().relay_to_all(codec, payload, exclude_socket)
+        self.originate(MESH_RELAY, codec.suite.encode('ascii') + b'\n' + payload)
+
+    def relay_to_user(self, codec, payload, target_user):
+        delivered = super().relay_to_user(codec, payload, target_user)
+        if self.is_remote_member(target_user):
+            self.originate(MESH_RELAY, codec.suite.encode('ascii') + b'\n' + payload)
+            delivered = True
+        return delivered
+
+    def connected_users(self):
+        """Usernames with a live session on any node"""
+        usernames = super().connected_users()
+        with self.mesh_lock:
+            for members in self.remote_members.values():
+                usernames.extend(username for username in members[2] if username not in usernames)
+        return usernames
+
+    def get_stats(self):
+        """This node's counters plus the state of the mesh"""
+        stats = super().get_stats()
+        with self.mesh_lock:
+            stats.update({'node': self.node, 'peers': sorted(info['node'] for info in self.links.values()),
+                          'remote_clients': sum(len(members[2]) for members in self.remote_members.values())})
+        return stats
+
+    def start(self):
+        """Dial the configured peers, then serve like a single room server"""
+        self.running = True
+        self.announce_members()
+        for address in self.peer_addresses:
+            threading.Thread(target=self.dial_peer, args=(address,), daemon=True).start()
+        threading.Thread(target=self.refresh_members, daemon=True).start()
+        super().start()
+
+    def stop(self):
+        """Stop serving, let the peers know our members left, then close the links"""
+        super().stop()
+        self.mesh_stop.set()
+        links = list(self.links.items())
+        for _, info in links:
+            info['outbox'].close()
+        deadline = time.time() + 1.0
+        for link, info in links:
+            info['writer'].join(max(0, deadline - time.time()))
+            self.drop_link(link)
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# ghostwire_gateway.py - Edge gateway multiplexing many clients over one upstream link (--relay)
+
+import socket
+import struct
+import threading
+import itertools
+import time
+
+from ghostwire_protocol import (HEADER, MAX_FRAME_SIZE, FRAME_HELLO, FrameReader, ProtocolError,
+                                encode_hello)
+from ghostwire_fanout import (DEFAULT_QUEUE_FRAMES, DEFAULT_QUEUE_BYTES, POLICY_DISCONNECT,
+                              OutboundQueue, ClientWriter)
+
+# Frames on the link between a gateway and the room server
+GW_OPEN = 1    # Gateway -> server: channel id, then the client's handshake payload
+GW_DATA = 2    # Gateway -> server: channel id, frame type, then one frame payload from that client
+GW_CLOSE = 3   # Either way: channel id of a client that left or has to be disconnected
+GW_FANOUT = 4  # Server -> gateway: channel count and ids, then bytes to write to each of them
+
+CHANNEL = struct.Struct('!I')
+CHANNEL_DATA = struct.Struct('!IB')
+FANOUT_COUNT = struct.Struct('!H')
+MAX_FANOUT = 0xFFFF  # Channel ids per GW_FANOUT frame
+
+# A GW_FANOUT carries a whole client frame plus its recipient list
+GATEWAY_MAX_FRAME = 2 * MAX_FRAME_SIZE + MAX_FANOUT * CHANNEL.size
+GATEWAY_QUEUE_FRAMES = 65536
+GATEWAY_QUEUE_BYTES = 64 * 1024 * 1024
+UPSTREAM_RETRY = 2.0  # Seconds between attempts to reach the room server
+
+def link_frame(kind, payload):
+    return HEADER.pack(len(payload), kind) + payload
+
+class GatewayChannel:
+    """Stands in for the socket of a member that sits behind a gateway.
+
+    The server registers it like any client connection; writes and
+    close() turn into frames on the shared gateway link.
+    """
+
+    def __init__(self, link, channel_id):
+        self.link = link
+        self.channel_id = channel_id
+
+    def sendall(self, data):
+        if not self.link.queue(self.channel_id, data):
+            raise ConnectionError("gateway link is full or closed")
+
+    def close(self):
+        self.link.close_channel(self.channel_id)
+
+    def attach(self):
+        """Outbound queue and writer for the server's client registry"""
+        outbox = ChannelOutbox(self)
+        return {'outbox': outbox, 'writer': outbox}
+
+class ChannelOutbox:
+    """OutboundQueue stand-in for a gateway channel.
+
+    Nothing is queued per channel: frames go straight to the link, whose
+    single writer thread sends them, so there is nothing to join either.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.closed = False
+        self.enqueued = 0
+        self.sent_bytes = 0
+
+    def put(self, frame):
+        if self.closed or not self.channel.link.queue(self.channel.channel_id, frame):
+            return False
+        self.enqueued += 1
+        self.sent_bytes += len(frame)
+        return True
+
+    def close(self, discard=False):
+        self.closed = True
+
+    def join(self, timeout=None):
+        pass
+
+    def stats(self):
+        return {'queued_frames': 0, 'queued_bytes': 0, 'peak_frames': 0, 'enqueued': self.enqueued,
+                'dropped': 0, 'sent_frames': self.enqueued, 'sent_bytes': self.sent_bytes,
+                'pauses': 0, 'paused': False}
+
+class GatewayLink:
+    """Server end of a gateway connection: its channels and one coalescing writer.
+
+    Every channel is a room member like a direct client but has no socket
+    or thread of its own. Frames queued for channels go into one list
+    here, and consecutive puts of the very same frame object (a broadcast
+    encodes once per suite and hands that object to every member) merge
+    into one GW_FANOUT entry. A broadcast therefore crosses the link once,
+    with the ids of every channel that should get it.
+    """
+
+    def __init__(self, server, link_socket, name, max_bytes=GATEWAY_QUEUE_BYTES):
+        self.server = server
+        self.socket = link_socket
+        self.name = name
+        self.max_bytes = max_bytes
+        self.channels = {}   # channel id -> [GatewayChannel, username, codec]
+        self.pending = []    # [bytes, channel ids or None for a ready link frame], in send order
+        self.pending_bytes = 0
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.closed = False
+        self.fanouts = 0     # GW_FANOUT frames written
+        self.deliveries = 0  # Channel deliveries they carried
+
+    def queue(self, channel_id, data):
+        """Queue bytes for one channel; False if the link is closed or backed up"""
+        with self.lock:
+            if self.closed or channel_id not in self.channels:
+                return False
+            last = self.pending[-1] if self.pending else None
+            if last is not None and last[0] is data and len(last[1]) < MAX_FANOUT:
+                last[1].append(channel_id)
+                return True
+            if self.pending_bytes + len(data) > self.max_bytes:
+                return False
+            self.pending.append([data, [channel_id]])
+            self.pending_bytes += len(data)
+            self.ready.notify()
+        return True
+
+    def close_channel(self, channel_id):
+        """Forget a channel and tell the gateway to disconnect its client"""
+        with self.lock:
+            if self.channels.pop(channel_id, None) is None or self.closed:
+                return
+            self.pending.append([link_frame(GW_CLOSE, CHANNEL.pack(channel_id)), None])
+            self.ready.notify()
+
+    def write_link(self):
+        """Writer thread: send everything pending in one syscall per wakeup"""
+        while True:
+            with self.lock:
+                while not self.pending and not self.closed:
+                    self.ready.wait()
+                if not self.pending:
+                    break
+                pending, self.pending, self.pending_bytes = self.pending, [], 0
+            chunks = []
+            for data, ids in pending:
+                if ids is None:
+                    chunks.append(data)
+                    continue
+                body = FANOUT_COUNT.pack(len(ids)) + struct.pack(f'!{len(ids)}I', *ids)
+                chunks += [HEADER.pack(len(body) + len(data), GW_FANOUT), body, data]
+                self.fanouts += 1
+                self.deliveries += len(ids)
+            try:
+                self.socket.sendall(b"".join(chunks))
+            except OSError:
+                self.close()
+                break
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+
+    def open_channel(self, payload):
+        """Admit a client the gateway accepted, using its handshake"""
+        channel_id, = CHANNEL.unpack_from(payload)
+        channel = GatewayChannel(self, channel_id)
+        with self.lock:
+            self.channels[channel_id] = [channel, None, None]
+        admitted = self.server.admit_client(channel, (self.name, channel_id),
+                                            (FRAME_HELLO, payload[CHANNEL.size:]))
+        if admitted is not None:
+            with self.lock:
+                session = self.channels.get(channel_id)
+                if session is not None:
+                    session[1:] = admitted
+
+    def serve(self, reader):
+        """Apply the gateway's frames until the link drops"""
+        reader.decoder.max_frame_size = GATEWAY_MAX_FRAME
+        threading.Thread(target=self.write_link, daemon=True).start()
+        print(f"[INFO] Gateway {self.name} connected")
+        try:
+            for kind, payload in reader:
+                if not self.server.running:
+                    break
+                if kind == GW_OPEN:
+                    self.open_channel(payload)
+                elif kind == GW_DATA:
+                    channel_id, frame_type = CHANNEL_DATA.unpack_from(payload)
+                    session = self.channels.get(channel_id)
+                    if session is not None and session[1] is not None:
+                        self.server.handle_frame(session[0], session[1], session[2], frame_type,
+                                                 payload[CHANNEL_DATA.size:])
+                elif kind == GW_CLOSE:
+                    session = self.channels.get(CHANNEL.unpack_from(payload)[0])
+                    if session is not None:
+                        self.server.remove_client(session[0])
+        except (OSError, ProtocolError, struct.error) as e:
+            print(f"[ERROR] Gateway {self.name} error: {e}")
+        finally:
+            self.close()
+            print(f"[INFO] Gateway {self.name} disconnected")
+
+    def close(self):
+        """Drop the link and every member behind it"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            sessions = list(self.channels.values())
+            self.ready.notify_all()
+        for session in sessions:
+            self.server.remove_client(session[0])
+
+class ClosingWriter(ClientWriter):
+    """ClientWriter that closes its socket once the queue is drained"""
+
+    def run(self):
+        super().run()
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.client_socket.close()
+
+class GhostwireGateway:
+    """Edge gateway: accepts local clients and carries them all over one upstream link.
+
+    Clients talk to the gateway exactly as they would to the room server.
+    Their frames are passed upstream unopened, tagged with a channel id,
+    and the server sends each broadcast across the link once with the
+    list of channels to copy it to. The gateway never needs the room key.
+    """
+
+    def __init__(self, port, upstream_host, upstream_port, name=None, room=None,
+                 queue_size=DEFAULT_QUEUE_FRAMES, queue_bytes=DEFAULT_QUEUE_BYTES,
+                 slow_policy=POLICY_DISCONNECT):
+        self.port = port
+        self.upstream_address = (upstream_host, upstream_port)
+        self.name = name or f"{socket.gethostname()}:{port}"
+        self.room = room
+        self.queue_size = queue_size
+        self.queue_bytes = queue_bytes
+        self.slow_policy = slow_policy
+        self.clients = {}  # channel id -> (socket, outbound queue)
+        self.channel_ids = itertools.count(1)
+        self.upstream = None  # (socket, outbound queue) while connected
+        self.lock = threading.Lock()
+        self.running = False
+        self.fanouts = 0     # GW_FANOUT frames received from the server
+        self.deliveries = 0  # Client copies made from them
+
+    def connect_upstream(self):
+        """Open the link to the room server and start reading it"""
+        upstream = socket.create_connection(self.upstream_address)
+        upstream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        fields = {'gateway': self.name}
+        if self.room:
+            fields['room'] = self.room
+        upstream.sendall(encode_hello(**fields))
+        outbox = OutboundQueue(GATEWAY_QUEUE_FRAMES, GATEWAY_QUEUE_BYTES, POLICY_DISCONNECT)
+        ClientWriter(upstream, outbox, on_error=self.upstream_lost).start()
+        with self.lock:
+            self.upstream = (upstream, outbox)
+        threading.Thread(target=self.read_upstream, args=(upstream,), daemon=True).start()
+        print(f"[GATEWAY] Linked to room server {self.upstream_address[0]}:{self.upstream_address[1]}")
+
+    def keep_upstream(self):
+        """Reconnect to the room server whenever the link is down"""
+        while self.running:
+            time.sleep(UPSTREAM_RETRY)
+            if self.running and self.upstream is None:
+                try:
+                    self.connect_upstream()
+                except OSError as e:
+                    print(f"[WARN] Room server unreachable: {e}")
+
+    def read_upstream(self, upstream):
+        """Copy what the server sends to the clients it names"""
+        try:
+            for kind, payload in FrameReader(upstream, GATEWAY_MAX_FRAME):
+                if kind == GW_FANOUT:
+                    count, = FANOUT_COUNT.unpack_from(payload)
+                    ids = struct.unpack_from(f'!{count}I', payload, FANOUT_COUNT.size)
+                    data = bytes(payload[FANOUT_COUNT.size + count * CHANNEL.size:])
+                    self.fanouts += 1
+                    self.deliveries += count
+                    for channel_id in ids:
+                        client = self.clients.get(channel_id)
+                        if client is not None and not client[1].put(data):
+                            self.close_client(channel_id)
+                elif kind == GW_CLOSE:
+                    self.close_client(CHANNEL.unpack_from(payload)[0], notify=False)
+        except (OSError, ProtocolError, struct.error):
+            pass
+        finally:
+            self.upstream_lost(upstream)
+
+    def upstream_lost(self, upstream):
+        """Forget a dead upstream link and disconnect the clients that used it"""
+        with self.lock:
+            if self.upstream is None or self.upstream[0] is not upstream:
+                return
+            self.upstream[1].close(discard=True)
+            self.upstream = None
+            channel_ids = list(self.clients)
+        try:
+            upstream.close()
+        except OSError:
+            pass
+        for channel_id in channel_ids:
+            self.close_client(channel_id, notify=False)
+        if self.running:
+            print("[WARN] Lost the room server, reconnecting")
+
+    def send_upstream(self, frame):
+        upstream = self.upstream
+        return upstream is not None and upstream[1].put(frame)
+
+    def handle_client(self, client_socket, address):
+        """Pass one local client's frames upstream on its own channel"""
+        channel_id = next(self.channel_ids)
+        outbox = OutboundQueue(self.queue_size, self.queue_bytes, self.slow_policy)
+        with self.lock:
+            self.clients[channel_id] = (client_socket, outbox)
+        ClosingWriter(client_socket, outbox, on_error=lambda _: self.close_client(channel_id)).start()
+        try:
+            reader = FrameReader(client_socket)
+            frame = reader.read_handshake()  # Nothing is queued for the channel yet
+            if not frame or frame[0] != FRAME_HELLO:
+                return
+            if not self.send_upstream(link_frame(GW_OPEN, CHANNEL.pack(channel_id) + frame[1])):
+                return
+            for frame_type, payload in reader:
+                if not self.send_upstream(link_frame(GW_DATA, CHANNEL_DATA.pack(channel_id, frame_type) + payload)):
+                    break
+        except (OSError, ProtocolError):
+            pass
+        finally:
+            self.close_client(channel_id)
+
+    def close_client(self, channel_id, notify=True):
+        """Disconnect a local client once what is queued for it has been written"""
+        with self.lock:
+            client = self.clients.pop(channel_id, None)
+        if client is None:
+            return
+        if notify:
+            self.send_upstream(link_frame(GW_CLOSE, CHANNEL.pack(channel_id)))
+        client[1].close()
+
+    def start(self):
+        """Link to the room server and accept local clients"""
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('0.0.0.0', self.port))
+        self.server_socket.listen(128)
+        self.running = True
+        try:
+            self.connect_upstream()
+        except OSError as e:
+            print(f"[WARN] Room server unreachable: {e}")
+        threading.Thread(target=self.keep_upstream, daemon=True).start()
+
+        print(f"[GATEWAY] Relaying port {self.port} to {self.upstream_address[0]}:{self.upstream_address[1]}")
+        try:
+            while self.running:
+                client_socket, address = self.server_socket.accept()
+                client_thread = threading.Thread(target=self.handle_client, args=(client_socket, address))
+                client_thread.daemon = True
+                client_thread.start()
+        except KeyboardInterrupt:
+            print("\n[GATEWAY] Shutting down...")
+        except OSError:
+            pass  # Listener closed by stop()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Disconnect every client and the upstream link"""
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.server_socket.close()
+        except OSError:
+            pass
+        for channel_id in list(self.clients):
+            self.close_client(channel_id)
+        with self.lock:
+            upstream = self.upstream
+        if upstream is not None:
+            upstream[1].close()
+        print(f"[GATEWAY] Gateway on port {self.port} stopped")
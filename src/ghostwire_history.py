@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# ghostwire_history.py - Bounded, numbered history of recent room messages
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_HISTORY_MESSAGES = 1000
+DEFAULT_HISTORY_BYTES = 1024 * 1024
+SEEN_WINDOW = 4096  # Sequence numbers a SeenWindow remembers to drop duplicates
+
+class MessageHistory:
+    """Ring of the most recent room-wide messages, each with a sequence number.
+
+    Sequence numbers start at 1 and grow by one per message, so the ring
+    always holds a contiguous range and finding where "since N" starts is
+    a subtraction, not a search. The oldest entries go once either the
+    message or the byte limit is reached. Entries are (sequence, text,
+    None, None) for messages the server encrypts per member, or
+    (sequence, None, suite, payload) for relay frames kept as received.
+
+    lock is held while a message is numbered and its recipients are
+    picked, and while a member joins and is sent its backlog, so every
+    member gets each message exactly once: either in the backlog or
+    live. Encrypting and queueing the live copies happens after the lock
+    is released, so messages from different senders can reach a member
+    slightly out of sequence order.
+
+    With an archive (ghostwire_log.HistoryArchive) every message is also
+    written to disk: numbering and the ring carry on from the archive
+    after a restart, and a backlog the ring no longer holds is read back
+    from it, within the same limits.
+
+    epoch names the numbering: random for each history kept in memory
+    only, the archive's otherwise. A sequence number means nothing under
+    another epoch (another worker or node, or a restart without a log).
+    """
+
+    def __init__(self, max_messages=DEFAULT_HISTORY_MESSAGES, max_bytes=DEFAULT_HISTORY_BYTES, archive=None):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.archive = archive
+        self.entries = deque()
+        self.bytes = 0
+        self.sequence = 0  # Number of the newest message, kept or not
+        self.lock = threading.RLock()  # Re-entered when a broadcast uncovers a departure
+        self.epoch = os.urandom(8).hex()
+        if archive is not None:
+            self.epoch = archive.epoch
+            self.sequence = archive.last_sequence
+            if max_messages > 0:
+                for entry in archive.entries(max(1, self.sequence - max_messages + 1)):
+                    self.keep(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, message):
+        """Number a broadcast text and keep it; returns its sequence number"""
+        return self.add(message, None, None, len(message.encode('utf-8')))
+
+    def append_relay(self, suite, payload):
+        """Number a room-wide relay frame and keep its payload; returns its sequence number"""
+        return self.add(None, suite, bytes(payload), len(payload))
+
+    def add(self, message, suite, payload, size):
+        with self.lock:
+            self.sequence += 1
+            entry = (self.sequence, message, suite, payload)
+            if self.archive is not None:
+                self.archive.record(entry)
+            self.keep(entry)
+            return self.sequence
+
+    def keep(self, entry):
+        """Put an entry in the ring, dropping the oldest ones over the limits"""
+        size = self.entry_size(entry)
+        if self.max_messages <= 0 or size > self.max_bytes:
+            # Skipping a number would break the contiguous range; start over instead
+            self.entries.clear()
+            self.bytes = 0
+            return
+        self.entries.append(entry)
+        self.bytes += size
+        while len(self.entries) > self.max_messages or self.bytes > self.max_bytes:
+            self.bytes -= self.entry_size(self.entries.popleft())
+
+    @staticmethod
+    def entry_size(entry):
+        """Bytes an entry counts against max_bytes: UTF-8 text or the relay payload"""
+        return len(entry[1].encode('utf-8')) if entry[1] is not None else len(entry[3])
+
+    def since(self, sequence):
+        """Entries newer than sequence, oldest first (what is still in the ring or the archive)"""
+        with self.lock:
+            if self.entries and (self.archive is None or sequence + 1 >= self.entries[0][0]):
+                start = max(0, sequence - self.entries[0][0] + 1)
+                return list(itertools.islice(self.entries, start, None))
+            if self.archive is None or self.max_messages <= 0 or sequence >= self.sequence:
+                return []
+            # Older than the ring: read the newest entries within the limits back from disk
+            kept = deque()
+            size = 0
+            for entry in self.archive.entries(max(sequence + 1, self.sequence - self.max_messages + 1)):
+                kept.append(entry)
+                size += self.entry_size(entry)
+                while size > self.max_bytes:
+                    size -= self.entry_size(kept.popleft())
+            return list(kept)
+
+    def close(self):
+        """Flush and close the archive; later messages are only kept in memory"""
+        with self.lock:
+            if self.archive is not None:
+                self.archive.close()
+                self.archive = None
+
+    def first(self):
+        """Sequence number of the oldest kept message, or None"""
+        with self.lock:
+            return self.entries[0][0] if self.entries else None
+
+class SeenWindow:
+    """Sequence numbers recently seen from one source (a mesh origin, a room)"""
+
+    def __init__(self, size=SEEN_WINDOW):
+        self.size = size
+        self.highest = -1
+        self.seen = set()
+        self.heard = time.time()  # Last frame from the origin, duplicates included
+
+    def add(self, sequence):
+        """True the first time a sequence number shows up, False for duplicates"""
+        self.heard = time.time()
+        if sequence <= self.highest - self.size or sequence in self.seen:
+            return False
+        self.seen.add(sequence)
+        if sequence > self.highest:
+            self.highest = sequence
+            if len(self.seen) > 2 * self.size:
+                floor = self.highest - self.size
+                self.seen = {seen for seen in self.seen if seen > floor}
+        return True
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# ghostwire_log.py - Durable room history: segmented append-only log with an mmap'd index
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+
+from ghostwire_protocol import FRAME_RELAY, encode_frame, parse_frame
+from ghostwire_crypto import SUITE_CHACHA, get_codec
+
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_INDEX_INTERVAL = 4096   # Bytes of records between two index entries
+DEFAULT_SYNC_INTERVAL = 0.05    # Seconds between group commits (0: fsync every append)
+
+# Record: data length, CRC-32 of everything after it, sequence, timestamp; then the data
+RECORD = struct.Struct('!IIQd')
+# Index entry: sequence and timestamp of a record, and its offset in the segment
+INDEX_ENTRY = struct.Struct('!QdQ')
+INDEX_GROWTH = 1024  # Entries added to an active segment's index file at a time
+EPOCH_FILE = "epoch"  # Names the numbering of the history kept in a log directory
+
+class LogSegment:
+    """One data file of the log and its sparse index.
+
+    The index is a file of fixed-size entries, mapped into memory, so
+    finding a sequence number or a time is a binary search over the map
+    and nothing is read from the data file before the record it points
+    at. The active segment's index file is grown ahead of use and its
+    unused tail is zero (sequence numbers start at 1).
+    """
+
+    def __init__(self, directory, base, index_interval, writable=False):
+        self.base = base
+        self.index_interval = index_interval
+        self.path = os.path.join(directory, f"{base:020d}.log")
+        self.index_path = os.path.join(directory, f"{base:020d}.idx")
+        self.writable = writable
+        self.file = open(self.path, 'ab+' if writable else 'rb')
+        self.size = os.path.getsize(self.path)
+        self.index_file = open(self.index_path, 'a+b' if writable else 'rb')
+        self.index = None
+        self.count = 0
+        self.last_indexed = None
+        self.last_sequence = base - 1
+        self.last_timestamp = 0.0
+        self.map_index()
+        self.recover()
+
+    def map_index(self, capacity=0):
+        """(Re)map the index file, growing it to capacity entries first if writable"""
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        size = os.path.getsize(self.index_path)
+        if self.writable and size < capacity * INDEX_ENTRY.size:
+            self.index_file.truncate(capacity * INDEX_ENTRY.size)
+            size = capacity * INDEX_ENTRY.size
+        if size:
+            access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ
+            self.index = mmap.mmap(self.index_file.fileno(), size, access=access)
+
+    def capacity(self):
+        return len(self.index) // INDEX_ENTRY.size if self.index is not None else 0
+
+    def entry(self, position):
+        return INDEX_ENTRY.unpack_from(self.index, position * INDEX_ENTRY.size)
+
+    def recover(self):
+        """Find the index's end and the last whole record; cut off a torn tail.
+
+        After a crash the index can point past the data that reached the
+        disk, and the data can end in a partial record. Only the records
+        after the last usable index entry are read to find out.
+        """
+        low, high = 0, self.capacity()
+        while low < high:  # First unused (zero) entry
+            middle = (low + high) // 2
+            if self.entry(middle)[0]:
+                low = middle + 1
+            else:
+                high = middle
+        self.count = low
+        while self.count and self.entry(self.count - 1)[2] >= self.size:
+            self.count -= 1
+        while True:
+            offset = self.entry(self.count - 1)[2] if self.count else 0
+            self.last_indexed = offset if self.count else None
+            valid = offset
+            for sequence, timestamp, _, end in self.scan(offset, self.size):
+                self.note(sequence, timestamp, valid)
+                valid = end
+            if valid > offset or not self.count:
+                break
+            self.count -= 1  # The indexed record itself is torn; start from the entry before
+        if valid < self.size:
+            if not self.writable:
+                raise ValueError(f"{self.path} is damaged at offset {valid}")
+            self.file.truncate(valid)
+            self.size = valid
+        if self.writable and self.count < self.capacity():
+            self.index[self.count * INDEX_ENTRY.size:] = bytes(len(self.index) - self.count * INDEX_ENTRY.size)
+
+    def note(self, sequence, timestamp, offset):
+        """Account for a record at offset, adding an index entry when one is due"""
+        if self.last_indexed is None or offset - self.last_indexed >= self.index_interval:
+            if self.writable:
+                if self.count == self.capacity():
+                    self.map_index(self.count + INDEX_GROWTH)
+                INDEX_ENTRY.pack_into(self.index, self.count * INDEX_ENTRY.size, sequence, timestamp, offset)
+                self.count += 1
+            self.last_indexed = offset
+        self.last_sequence = sequence
+        self.last_timestamp = timestamp
+
+    def scan(self, offset, end):
+        """(sequence, timestamp, data, next offset) of the whole records in [offset, end)"""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while offset + RECORD.size <= end:
+                header = f.read(RECORD.size)
+                if len(header) < RECORD.size:
+                    return
+                length, crc, sequence, timestamp = RECORD.unpack(header)
+                if offset + RECORD.size + length > end:
+                    return
+                data = f.read(length)
+                if len(data) < length or zlib.crc32(data, zlib.crc32(header[8:])) != crc:
+                    return
+                offset += RECORD.size + length
+                yield sequence, timestamp, data, offset
+
+    def seek(self, field, value):
+        """Offset of the last indexed record whose field (0: sequence, 1: timestamp) is below value"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.entry(middle)[field] < value:
+                low = middle + 1
+            else:
+                high = middle
+        return self.entry(low - 1)[2] if low else 0
+
+    def first(self, field):
+        """Sequence number or timestamp of the segment's first record (always indexed)"""
+        return self.entry(0)[field] if self.count else None
+
+    def seal(self):
+        """Stop appending: trim the index to its entries and map it read-only"""
+        self.file.close()
+        self.file = open(self.path, 'rb')
+        self.index.close()
+        self.index = None
+        self.index_file.truncate(self.count * INDEX_ENTRY.size)
+        self.index_file.close()
+        self.index_file = open(self.index_path, 'rb')
+        self.writable = False
+        self.map_index()
+
+    def close(self):
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        self.index_file.close()
+        self.file.close()
+
+class MessageLog:
+    """Append-only log of numbered records in rotating segment files.
+
+    append() only adds the record to an in-memory batch; a background
+    thread writes the batch and fsyncs it every sync_interval seconds, so
+    one fsync covers every record appended meanwhile (group commit) and
+    the sender never waits for the disk. A crash can lose at most the
+    last interval. Segments roll over after segment_bytes; each has a
+    sparse index mapped into memory, so reading from any sequence number
+    or time costs two binary searches and a short scan however large the
+    log gets.
+    """
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES, index_interval=DEFAULT_INDEX_INTERVAL,
+                 sync_interval=DEFAULT_SYNC_INTERVAL):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.pending = []  # Records appended but not yet written
+        self.feeds = []  # Called before each sync to append records queued elsewhere
+        self.dirty = False  # Written but not yet fsynced
+        self.closed = False
+        os.makedirs(directory, exist_ok=True)
+        bases = sorted(int(name[:-4]) for name in os.listdir(directory)
+                       if name.endswith('.log') and name[:-4].isdigit())
+        self.segments = [LogSegment(directory, base, index_interval) for base in bases[:-1]]
+        self.active = LogSegment(directory, bases[-1] if bases else 1, index_interval, writable=True)
+        self.segments.append(self.active)
+        self.last_sequence = self.active.last_sequence
+        self.last_timestamp = self.active.last_timestamp
+        if not self.active.count and len(self.segments) > 1:  # Rolled over, nothing written yet
+            self.last_sequence = max(self.last_sequence, self.segments[-2].last_sequence)
+            self.last_timestamp = self.segments[-2].last_timestamp
+        self.syncer = None
+        if sync_interval > 0:
+            self.syncer = threading.Thread(target=self.sync_loop, daemon=True)
+            self.syncer.start()
+
+    def append(self, sequence, data, timestamp=None):
+        """Add a record; sequence numbers must increase"""
+        with self.lock:
+            if self.closed:
+                raise ValueError("log is closed")
+            if sequence <= self.last_sequence:
+                raise ValueError(f"sequence {sequence} is not after {self.last_sequence}")
+            timestamp = max(timestamp if timestamp is not None else time.time(), self.last_timestamp)
+            if self.active.size >= self.segment_bytes:
+                self.roll(sequence)
+            header = struct.pack('!Qd', sequence, timestamp)
+            record = RECORD.pack(len(data), zlib.crc32(data, zlib.crc32(header)), sequence, timestamp)
+            self.active.note(sequence, timestamp, self.active.size)
+            self.pending.append(record)
+            self.pending.append(data)
+            self.active.size += len(record) + len(data)
+            self.last_sequence = sequence
+            self.last_timestamp = timestamp
+            if not self.syncer:
+                self.write()
+                os.fsync(self.active.file.fileno())
+
+    def roll(self, sequence):
+        """Seal the active segment and start a new one at sequence"""
+        self.write()
+        os.fsync(self.active.file.fileno())
+        self.dirty = False
+        self.active.seal()
+        self.active = LogSegment(self.directory, sequence, self.index_interval, writable=True)
+        self.segments.append(self.active)
+
+    def write(self):
+        """Hand the pending batch to the OS (caller holds the lock)"""
+        if self.pending:
+            self.active.file.write(b"".join(self.pending))
+            self.active.file.flush()
+            self.pending = []
+            self.dirty = True
+
+    def sync(self):
+        """Write and fsync everything appended so far"""
+        for feed in self.feeds:
+            feed()
+        with self.lock:
+            if self.closed:
+                return
+            self.write()
+            if not self.dirty:
+                return
+            self.dirty = False
+            fileno = self.active.file.fileno()
+            index = self.active.index
+        os.fsync(fileno)
+        if index is not None:
+            index.flush()
+
+    def sync_loop(self):
+        while not self.closed:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except (OSError, ValueError):
+                pass  # Closed or rolled over meanwhile; the next round catches up
+
+    def read_from(self, sequence):
+        """(sequence, timestamp, data) of every record from sequence on, oldest first"""
+        return self.read(0, sequence)
+
+    def read_since(self, timestamp):
+        """(sequence, timestamp, data) of every record written at or after timestamp"""
+        return self.read(1, timestamp)
+
+    def read(self, field, value):
+        with self.lock:
+            self.write()
+            low, high = 0, len(self.segments)
+            while low < high:  # Last segment starting below value
+                middle = (low + high) // 2
+                first = self.segments[middle].first(field)
+                if first is not None and first < value:
+                    low = middle + 1
+                else:
+                    high = middle
+            start = max(low - 1, 0)
+            plan = [(segment, segment.seek(field, value) if i == start else 0, segment.size)
+                    for i, segment in enumerate(self.segments[start:], start)]
+        return self.records(plan, field, value)
+
+    @staticmethod
+    def records(plan, field, value):
+        for segment, offset, end in plan:
+            for sequence, timestamp, data, _ in segment.scan(offset, end):
+                if (sequence, timestamp)[field] >= value:
+                    yield sequence, timestamp, data
+
+    def close(self):
+        self.sync()
+        with self.lock:
+            self.closed = True
+            for segment in self.segments:
+                segment.close()
+
+class HistoryArchive:
+    """Keeps MessageHistory entries in a MessageLog, encrypted with the room key.
+
+    Each record is the entry's suite name, a NUL and a complete frame:
+    texts are sealed with ChaCha20-Poly1305 like any member's frame, relay
+    payloads are stored as received, so nothing readable touches the disk.
+    The epoch is created with the log directory and kept across restarts,
+    since so is the numbering.
+
+    record() is called with the history's lock held, so it only queues
+    the entry; sealing and appending happen on the log's syncer thread
+    (or whenever the archive is read) in the order entries were queued.
+    """
+
+    def __init__(self, log, key):
+        self.log = log
+        self.key = key
+        self.codec = get_codec(key, SUITE_CHACHA)
+        self.epoch = self.load_epoch(os.path.join(log.directory, EPOCH_FILE))
+        self.queue = deque()  # (entry, time recorded) not yet in the log
+        self.flush_lock = threading.Lock()  # Keeps appends in queue order
+        log.feeds.append(self.flush)
+
+    @staticmethod
+    def load_epoch(path):
+        try:
+            with open(path, 'r') as f:
+                epoch = f.read().strip()
+            if epoch:
+                return epoch
+        except FileNotFoundError:
+            pass
+        epoch = os.urandom(8).hex()
+        with open(path + ".tmp", 'w') as f:
+            f.write(epoch)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        return epoch
+
+    @property
+    def last_sequence(self):
+        self.flush()
+        return self.log.last_sequence
+
+    def record(self, entry):
+        self.queue.append((entry, time.time()))
+        if not self.log.syncer:
+            self.flush()  # No group commit: every append is written before returning
+
+    def flush(self):
+        """Seal the queued entries and append them to the log, oldest first"""
+        with self.flush_lock:
+            while self.queue:
+                (sequence, message, suite, payload), timestamp = self.queue.popleft()
+                if message is not None:
+                    data = self.codec.suite.encode() + b"\0" + self.codec.encode(message)
+                else:
+                    data = suite.encode() + b"\0" + encode_frame(FRAME_RELAY, payload)
+                self.log.append(sequence, data, timestamp)
+
+    def entries(self, sequence):
+        """History entries from sequence on, as MessageHistory keeps them"""
+        self.flush()
+        for number, _, data in self.log.read_from(sequence):
+            suite, _, frame = data.partition(b"\0")
+            suite = suite.decode()
+            parsed = parse_frame(frame)
+            if parsed is None:
+                continue
+            frame_type, payload = parsed
+            if frame_type == FRAME_RELAY:
+                yield number, None, suite, payload
+                continue
+            message = get_codec(self.key, suite).decode(frame_type, payload)
+            if message is not None:
+                yield number, message, None, None
+
+    def close(self):
+        self.log.close()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# ghostwire_protocol.py - Length-prefixed binary wire framing
+
+import struct
+from collections import deque
+
+# Every frame is a 5 byte header (payload length, frame type) followed by
+# the raw payload. Nothing is base64 encoded on the wire.
+HEADER = struct.Struct('!IB')
+HEADER_SIZE = HEADER.size
+
+FRAME_HELLO = 1   # Handshake text, e.g. "USERNAME:alice", optionally more "KEY:value" lines
+FRAME_DATA = 2    # Raw IV (16 bytes) followed by the AES-CBC ciphertext
+FRAME_SEALED = 3  # AEAD: nonce (12 bytes) + ciphertext + tag (16 bytes)
+FRAME_RELAY = 4   # Relay header (sender, target) + AEAD sealed with the header as associated data
+FRAME_SEQ = 5     # Room history sequence number (8 bytes) + one complete inner frame
+
+# Relay header: sender and target name lengths, then both names in UTF-8.
+# An empty target means the message is for the whole room.
+RELAY_HEADER = struct.Struct('!BB')
+
+# Sequence number of a room message, for members that asked for history (SINCE)
+SEQUENCE = struct.Struct('!Q')
+
+# What the server answers the sender of a private (@user) message
+PRIVATE_SENT = "[SYSTEM] Private message sent to {target}"
+USER_NOT_FOUND = "[SYSTEM] User {target} not found"
+
+MAX_FRAME_SIZE = 1024 * 1024
+RECV_SIZE = 65536
+
+class ProtocolError(ValueError):
+    """Raised when the peer sends something that is not a valid frame"""
+
+def encode_frame(frame_type, payload):
+    """Serialize one frame (header + payload) into bytes"""
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame of {len(payload)} bytes exceeds {MAX_FRAME_SIZE}")
+    return HEADER.pack(len(payload), frame_type) + payload
+
+def encode_hello(username=None, **fields):
+    """Build a handshake frame: USERNAME first, then one "KEY:value" line per field.
+
+    Clients send one right after connecting; the server answers with one
+    (without USERNAME) when the client asked it to negotiate something.
+    """
+    lines = [f"USERNAME:{username}"] if username is not None else []
+    lines.extend(f"{name.upper()}:{value}" for name, value in fields.items())
+    return encode_frame(FRAME_HELLO, "\n".join(lines).encode('utf-8'))
+
+# A client that wants to negotiate (cipher suite, room, history) first sends
+# PROBE, a handshake without USERNAME. A server that knows it answers with
+# PROBE and then reads the real handshake; one that predates it closes the
+# connection, and the client reconnects with a plain "USERNAME:" handshake.
+PROBE = encode_hello(negotiate=1)
+
+def is_probe(frame):
+    """True if frame is a PROBE (sent by a client, or a server's answer to one)"""
+    return (frame is not None and frame[0] == FRAME_HELLO and not bytes(frame[1]).startswith(b"USERNAME:")
+            and parse_hello_fields(frame[1]).get('NEGOTIATE') == '1')
+
+def parse_hello_fields(payload):
+    """Return every "KEY:value" line of a handshake payload as a dict"""
+    try:
+        text = bytes(payload).decode('utf-8')
+    except UnicodeDecodeError:
+        return {}
+    fields = {}
+    for line in text.split('\n'):
+        name, sep, value = line.partition(':')
+        if sep:
+            fields.setdefault(name.strip().upper(), value.strip())
+    return fields
+
+def parse_hello(payload):
+    """Return the username carried by a handshake payload, or None"""
+    try:
+        text = bytes(payload).decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    if not text.startswith('USERNAME:'):
+        return None
+    return parse_hello_fields(payload)['USERNAME'] or None
+
+def encode_relay_header(sender, target=None):
+    """Build the header that precedes a relayed payload"""
+    sender = sender.encode('utf-8')
+    target = (target or '').encode('utf-8')
+    if len(sender) > 255 or len(target) > 255:
+        raise ProtocolError("Usernames in a relay header are limited to 255 bytes")
+    return RELAY_HEADER.pack(len(sender), len(target)) + sender + target
+
+def parse_relay_header(payload):
+    """Return (sender, target or None, header size) of a relayed payload, or None"""
+    if len(payload) < RELAY_HEADER.size:
+        return None
+    sender_size, target_size = RELAY_HEADER.unpack_from(payload)
+    end = RELAY_HEADER.size + sender_size + target_size
+    if not sender_size or len(payload) < end:
+        return None
+    try:
+        sender = bytes(payload[RELAY_HEADER.size:RELAY_HEADER.size + sender_size]).decode('utf-8')
+        target = bytes(payload[RELAY_HEADER.size + sender_size:end]).decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return sender, target or None, end
+
+def parse_frame(data):
+    """Return (frame type, payload) of one complete encoded frame, or None"""
+    if len(data) < HEADER_SIZE:
+        return None
+    length, frame_type = HEADER.unpack_from(data)
+    if len(data) != HEADER_SIZE + length:
+        return None
+    return frame_type, data[HEADER_SIZE:]
+
+def encode_sequenced(sequence, frame):
+    """Wrap an encoded frame in a FRAME_SEQ carrying its history sequence number"""
+    return HEADER.pack(SEQUENCE.size + len(frame), FRAME_SEQ) + SEQUENCE.pack(sequence) + frame
+
+def parse_sequenced(payload):
+    """Return (sequence, inner frame type, inner payload) of a FRAME_SEQ payload, or None"""
+    if len(payload) < SEQUENCE.size + HEADER_SIZE:
+        return None
+    sequence, = SEQUENCE.unpack_from(payload)
+    length, frame_type = HEADER.unpack_from(payload, SEQUENCE.size)
+    start = SEQUENCE.size + HEADER_SIZE
+    if len(payload) != start + length:
+        return None
+    return sequence, frame_type, payload[start:]
+
+class FrameDecoder:
+    """Incremental decoder that turns arbitrary byte chunks into frames.
+
+    TCP gives no message boundaries: one recv() may hold half a frame or
+    several frames back to back. feed() buffers partial input and returns
+    every frame that is complete so far as (frame_type, payload) tuples.
+    """
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Add received bytes and return the list of completed frames"""
+        buffer = self.buffer
+        buffer += data
+        frames = []
+        offset = 0
+        available = len(buffer)
+
+        while available - offset >= HEADER_SIZE:
+            length, frame_type = HEADER.unpack_from(buffer, offset)
+            if length > self.max_frame_size:
+                raise ProtocolError(f"Frame of {length} bytes exceeds {self.max_frame_size}")
+            end = offset + HEADER_SIZE + length
+            if end > available:
+                break
+            frames.append((frame_type, bytes(buffer[offset + HEADER_SIZE:end])))
+            offset = end
+
+        if offset:
+            del buffer[:offset]
+        return frames
+
+    def pending(self):
+        """Number of buffered bytes that do not form a complete frame yet"""
+        return len(self.buffer)
+
+class FrameReader:
+    """Blocking frame reader on top of a connected socket"""
+
+    def __init__(self, sock, max_frame_size=MAX_FRAME_SIZE):
+        self.sock = sock
+        self.decoder = FrameDecoder(max_frame_size)
+        self.ready = deque()
+
+    def read_frame(self):
+        """Return the next (frame_type, payload) tuple, or None on EOF"""
+        while not self.ready:
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                return None
+            self.ready.extend(self.decoder.feed(data))
+        return self.ready.popleft()
+
+    def read_handshake(self):
+        """Return the client's handshake frame, answering a PROBE that precedes it"""
+        frame = self.read_frame()
+        if is_probe(frame):
+            self.sock.sendall(PROBE)
+            frame = self.read_frame()
+        return frame
+
+    def __iter__(self):
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                return
+            yield frame
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# ghostwire_quick.py - One-shot --send through a running agent, without loading the client or crypto
+
+import json
+import os
+
+CONFIG_FILE = "/tmp/ghostwire_config.json"
+USER_CONFIG = "/tmp/ghostwire_user.json"
+
+# Options a quick send understands, and whether each takes a value
+SEND_OPTIONS = {'--send': True, '--to': True, '--room': True, '--all': False}
+
+def parse_send(argv):
+    """Options of a plain `--send MESSAGE (--all | --to USER) [--room NAME]`, or None.
+
+    Anything else (other options, abbreviations, values that look like
+    options) is left to the full command line parser.
+    """
+    options = {}
+    arguments = iter(argv)
+    for argument in arguments:
+        name, equals, value = argument.partition('=')
+        takes_value = SEND_OPTIONS.get(name)
+        if takes_value is None or (equals and not takes_value):
+            return None
+        if takes_value and not equals:
+            value = next(arguments, None)
+            if value is None or value.startswith('-'):
+                return None
+        options[name] = value if takes_value else True
+    if '--send' not in options or not ('--all' in options or '--to' in options):
+        return None
+    return options
+
+def quick_send(argv):
+    """Send through the agent of the saved user, if one runs; False to take the full path.
+
+    A script that sends many messages pays for starting Python and this
+    module only: the room connection, its cipher suite and pycryptodome
+    live in the agent process.
+    """
+    options = parse_send(argv)
+    if options is None or not os.path.exists(CONFIG_FILE):
+        return False
+    try:
+        with open(USER_CONFIG, 'r') as f:
+            saved_config = json.load(f)
+        username, port = saved_config['username'], saved_config['port']
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    room = options.get('--room') or saved_config.get('room')
+    target_user = None if '--all' in options else options['--to']
+    message = options['--send']
+
+    from ghostwire_agent import send_via_agent
+    try:
+        if not send_via_agent(port, username, message, target_user, room):
+            return False
+    except Exception as e:
+        print(f"[ERROR] Failed to send message: {e}")
+        return True
+    if target_user:
+        print(f"[INFO] Private message sent to {target_user} via agent: {message}")
+    else:
+        print(f"[INFO] Message sent to all via agent: {message}")
+    return True
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# ghostwire_registry.py - Thread-safe registry of connected clients
+
+import threading
+
+class ClientRegistry:
+    """Connected clients and their per-username session index.
+
+    Joins and leaves take a short lock and are O(1). Readers never hold
+    the lock while they work: iterating the registry walks a snapshot
+    that is rebuilt at most once per change, so a broadcast always sees a
+    consistent member list while other threads keep joining and leaving.
+    Session sets are immutable frozensets that get replaced on change.
+
+    The read side mirrors a dict (iteration, items(), values(), get(),
+    len(), in) so the servers can keep treating it like self.clients.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.members = {}   # connection -> user info
+        self.sessions = {}  # username -> frozenset of connections
+        self.cached = None  # Last snapshot of members, None when stale
+
+    def add(self, connection, user_info):
+        """Register a connection that completed the handshake"""
+        username = user_info['username']
+        with self.lock:
+            self.members[connection] = user_info
+            self.sessions[username] = self.sessions.get(username, frozenset()) | {connection}
+            self.cached = None
+
+    def remove(self, connection):
+        """Unregister a connection; returns its user info or None"""
+        with self.lock:
+            user_info = self.members.pop(connection, None)
+            if user_info is None:
+                return None
+            username = user_info['username']
+            remaining = self.sessions.get(username, frozenset()) - {connection}
+            if remaining:
+                self.sessions[username] = remaining
+            else:
+                self.sessions.pop(username, None)
+            self.cached = None
+        return user_info
+
+    def snapshot(self):
+        """Consistent, read-only view of all members (connection -> info)"""
+        snapshot = self.cached
+        if snapshot is None:
+            with self.lock:
+                if self.cached is None:
+                    self.cached = dict(self.members)
+                snapshot = self.cached
+        return snapshot
+
+    def sessions_of(self, username):
+        """All connections of one user (empty if not connected)"""
+        return self.sessions.get(username, frozenset())
+
+    def usernames(self):
+        """Names of every connected user, one entry per user"""
+        with self.lock:
+            return list(self.sessions)
+
+    def get(self, connection, default=None):
+        return self.members.get(connection, default)
+
+    def __contains__(self, connection):
+        return connection in self.members
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def keys(self):
+        return self.snapshot().keys()
+
+    def values(self):
+        return self.snapshot().values()
+
+    def items(self):
+        return self.snapshot().items()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# ghostwire_ring.py - Shared-memory ring buffer and doorbells for worker fan-out
+
+import os
+import mmap
+import select
+import struct
+import threading
+
+# Ring layout: an 8 byte commit offset, then the data area. The offset is
+# the total number of bytes ever written, so it only grows; a record sits
+# at offset % capacity as a header (length, sequence) plus its payload.
+RING_HEADER = struct.Struct('!Q')
+RECORD = struct.Struct('!IQ')
+WRAP = 0xFFFFFFFF  # Record length marking "continue at the start of the area"
+
+DEFAULT_RING_BYTES = 4 * 1024 * 1024
+
+class SharedRing:
+    """Single-writer, multi-reader ring of records in an anonymous shared mmap.
+
+    Create it before forking: the mapping is inherited, so one process
+    publishes and every other process tails the same pages. Publishing
+    copies the record in once and then advances the commit offset; there
+    is no lock between processes. A reader that falls more than one lap
+    behind notices from the sequence numbers and skips ahead, counting
+    what it lost, instead of stalling the writer.
+    """
+
+    def __init__(self, capacity=DEFAULT_RING_BYTES):
+        self.capacity = capacity
+        self.buffer = mmap.mmap(-1, RING_HEADER.size + capacity)
+        self.write_offset = 0
+        self.sequence = 0
+        self.lock = threading.Lock()  # Threads of the writing process take turns
+
+    def max_record(self):
+        """Largest payload publish() accepts"""
+        return self.capacity // 2 - RECORD.size
+
+    def committed(self):
+        return RING_HEADER.unpack_from(self.buffer, 0)[0]
+
+    def publish(self, data):
+        """Append one record; False if it is too big for the ring"""
+        if len(data) > self.max_record():
+            return False
+        size = RECORD.size + len(data)
+        with self.lock:
+            offset = self.write_offset
+            position = offset % self.capacity
+            room = self.capacity - position
+            if room < size:
+                if room >= RECORD.size:
+                    RECORD.pack_into(self.buffer, RING_HEADER.size + position, WRAP, self.sequence)
+                offset += room
+                position = 0
+            start = RING_HEADER.size + position
+            RECORD.pack_into(self.buffer, start, len(data), self.sequence)
+            self.buffer[start + RECORD.size:start + size] = data
+            self.sequence += 1
+            self.write_offset = offset + size
+            RING_HEADER.pack_into(self.buffer, 0, self.write_offset)  # Commit
+        return True
+
+    def reader(self):
+        """A cursor that starts at the current end of the ring"""
+        return RingReader(self)
+
+class RingReader:
+    """One process's position in a SharedRing"""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.offset = ring.committed()
+        self.sequence = None  # Sequence number expected next, learned from the first record
+        self.lost = 0
+
+    def pending(self):
+        return self.ring.committed() != self.offset
+
+    def read(self):
+        """Copy out every record committed since the last call"""
+        ring = self.ring
+        buffer = ring.buffer
+        capacity = ring.capacity
+        committed = ring.committed()
+        if self.lapped(committed):
+            self.skip(committed)
+            return []
+
+        records = []
+        offset = self.offset
+        sequence = self.sequence
+        while offset < committed:
+            position = offset % capacity
+            room = capacity - position
+            if room < RECORD.size:
+                offset += room
+                continue
+            start = RING_HEADER.size + position
+            length, record_sequence = RECORD.unpack_from(buffer, start)
+            if length == WRAP:
+                offset += room
+                continue
+            if sequence is not None and record_sequence != sequence:
+                self.lost += (record_sequence - sequence) % (1 << 64)
+            records.append(buffer[start + RECORD.size:start + RECORD.size + length])
+            sequence = record_sequence + 1
+            offset += RECORD.size + length
+
+        # The writer may have lapped us while we were copying
+        committed = ring.committed()
+        if self.lapped(committed):
+            self.skip(committed)
+            return []
+        self.offset = offset
+        self.sequence = sequence
+        return records
+
+    def lapped(self, committed):
+        """True if the writer may have overwritten data we have not consumed.
+
+        A record that is being written but not committed yet can reach up
+        to max_record() past the commit offset, so half a lap is the limit.
+        """
+        ring = self.ring
+        return committed - self.offset > ring.capacity - ring.max_record() - RECORD.size
+
+    def skip(self, committed):
+        """Jump to the end of the ring after falling a lap behind"""
+        ring = self.ring
+        self.lost += max(1, (committed - self.offset) // ring.capacity)
+        self.offset = committed
+        self.sequence = None
+
+class Doorbell:
+    """Cross-process wakeup for one reader: an eventfd (or a pipe) plus a sleep flag.
+
+    Writers only pay for a syscall when the reader said it is about to
+    sleep, so a busy reader is never signalled per record.
+    """
+
+    def __init__(self, flags, index):
+        self.flags = flags  # Shared mmap with one "asleep" byte per doorbell
+        self.index = index
+        self.eventfd = hasattr(os, 'eventfd')
+        if self.eventfd:
+            self.read_fd = self.write_fd = os.eventfd(0, os.EFD_NONBLOCK)
+        else:
+            self.read_fd, self.write_fd = os.pipe()
+            os.set_blocking(self.read_fd, False)
+            os.set_blocking(self.write_fd, False)
+
+    def ring(self):
+        """Wake the reader if it is waiting"""
+        if self.flags[self.index]:
+            try:
+                if self.eventfd:
+                    os.eventfd_write(self.write_fd, 1)
+                else:
+                    os.write(self.write_fd, b'\0')
+            except BlockingIOError:
+                pass  # Already signalled
+
+    def wait(self, timeout, ready=None):
+        """Sleep until rung or timeout; ready() is re-checked after announcing sleep"""
+        self.flags[self.index] = 1
+        try:
+            if ready is not None and ready():
+                return
+            select.select([self.read_fd], [], [], timeout)
+            try:
+                os.read(self.read_fd, 4096)
+            except BlockingIOError:
+                pass
+        finally:
+            self.flags[self.index] = 0
+
+def create_doorbells(count):
+    """Doorbells for count readers, sharing one page of sleep flags"""
+    flags = mmap.mmap(-1, max(count, 1))
+    return [Doorbell(flags, index) for index in range(count)]
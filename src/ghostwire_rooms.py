@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# ghostwire_rooms.py - Host many rooms from one process and one port (--rooms)
+
+import json
+import os
+import socket
+import threading
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FRAME_HELLO, FrameReader, parse_hello_fields
+from ghostwire_simple import BLOCK_SIZE, GhostwireServer
+from ghostwire_store import UserStore
+
+ROOMS_DATA_FILE = "/tmp/ghostwire_rooms.json"  # Users as saved before ROOMS_DB; imported once
+ROOMS_DB = "/tmp/ghostwire_rooms.db"
+
+class HostedRoom(GhostwireServer):
+    """One room of a RoomHost: its own key, registry and stats, but no listener.
+
+    The host accepts connections and hands each one over after reading
+    the handshake, and keeps the users of every room in one store.
+    """
+
+    def load_data(self):
+        pass
+
+    def save_data(self):
+        pass
+
+class RoomHost:
+    """Accepts connections for many rooms and routes each by its ROOM hello field.
+
+    A room costs a registry and a few counters, not a socket or a thread:
+    the host runs one accept loop and every connection gets the usual
+    per-client thread of the room it joins. Clients that send no ROOM
+    (older versions) land in default_room; unknown rooms are refused.
+    """
+
+    def __init__(self, port, default_room=None, **options):
+        self.port = port
+        self.default_room = default_room
+        self.options = options  # Queue limits, slow policy and opaque, shared by all rooms
+        self.rooms = {}  # name -> HostedRoom
+        self.store = None  # UserStore shared by the rooms
+        self.running = False
+        self.load_data()
+
+    def add_room(self, name, key, creator='server-admin'):
+        """Host one more room; safe to call while the host is running"""
+        options = dict(self.options)
+        if options.get('log_dir'):
+            options['log_dir'] = os.path.join(options['log_dir'], name)  # One history log per room
+        room = HostedRoom(self.port, key, name, creator, **options)
+        if self.store:
+            room.store, room.store_room = self.store, name
+            room.users = self.store.load(name)
+            self.store.set_creator(creator, name)
+        room.running = self.running
+        self.rooms[name] = room
+        return room
+
+    def load_data(self):
+        """Open the store the users of every room are saved in"""
+        try:
+            self.store = UserStore(ROOMS_DB)
+            self.store.import_json(ROOMS_DATA_FILE, rooms=True)
+        except Exception as e:
+            print(f"[WARNING] Users will not be saved: {e}")
+            self.store = None
+
+    def save_data(self):
+        """Checkpoint the store (users are saved as they join)"""
+        if self.store:
+            self.store.checkpoint()
+
+    def get_stats(self):
+        """Counters of every room, by room name"""
+        return {name: room.get_stats() for name, room in self.rooms.items()}
+
+    def handle_client(self, client_socket, address):
+        """Read the handshake and pass the connection to the room it names"""
+        reader = FrameReader(client_socket)
+        try:
+            frame = reader.read_handshake()
+        except:
+            client_socket.close()
+            return
+        if not frame or frame[0] != FRAME_HELLO:
+            client_socket.close()
+            return
+
+        name = parse_hello_fields(frame[1]).get('ROOM', self.default_room)
+        room = self.rooms.get(name)
+        if room is None:
+            print(f"[WARNING] {address} asked for unknown room {name!r}")
+            client_socket.close()
+            return
+        room.serve_client(client_socket, address, reader, frame)
+
+    def create_listener(self):
+        """Bind and listen on the shared port"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind(('0.0.0.0', self.port))
+        server_socket.listen(128)
+        return server_socket
+
+    def start(self):
+        """Start accepting connections for every room"""
+        self.server_socket = self.create_listener()
+        self.running = True
+        for room in self.rooms.values():
+            room.running = True
+
+        print(f"[SERVER] Ghostwire hosting {len(self.rooms)} rooms on port {self.port}")
+        if self.default_room:
+            print(f"[SERVER] Clients without --room join '{self.default_room}'")
+        print(f"[SERVER] Waiting for connections...")
+
+        try:
+            while self.running:
+                client_socket, address = self.server_socket.accept()
+                client_thread = threading.Thread(
+                    target=self.handle_client,
+                    args=(client_socket, address)
+                )
+                client_thread.daemon = True
+                client_thread.start()
+
+        except KeyboardInterrupt:
+            print("\n[SERVER] Shutting down...")
+        except OSError:
+            pass  # Listener closed by stop()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop every room and save their users"""
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.server_socket.close()
+        except:
+            pass
+        for room in self.rooms.values():
+            room.stop()
+        self.save_data()
+        print(f"[SERVER] {len(self.rooms)} rooms on port {self.port} stopped")
+
+def load_rooms(path):
+    """Read a rooms file: {"name": {"key1": ..., "key2": ..., "key3": ..., "creator": ...}}
+
+    Returns (name, key, creator) tuples, keys derived like --key1/2/3.
+    """
+    with open(path, 'r') as f:
+        rooms = json.load(f)
+    return [(name, pad((room['key1'] + room['key2'] + room['key3']).encode(), BLOCK_SIZE),
+             room.get('creator', 'server-admin'))
+            for name, room in rooms.items()]
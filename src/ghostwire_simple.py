@@ -9,99 +9,365 @@ import sys
 import os
 import time
 import signal
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from Crypto.Util.Padding import pad
 import base64
+from ghostwire_protocol import (FRAME_HELLO, FRAME_DATA, FRAME_SEALED, FRAME_RELAY, FRAME_SEQ, FrameReader,
+                                PRIVATE_SENT, PROBE, USER_NOT_FOUND, ProtocolError, encode_frame, encode_hello,
+                                encode_sequenced, is_probe, parse_hello, parse_hello_fields, parse_relay_header,
+                                parse_sequenced)
+from ghostwire_fanout import (DEFAULT_QUEUE_FRAMES, DEFAULT_QUEUE_BYTES, POLICY_DISCONNECT,
+                              SLOW_CLIENT_POLICIES, POLICY_ALIASES, OutboundQueue, ClientWriter)
+from ghostwire_registry import ClientRegistry
+from ghostwire_history import DEFAULT_HISTORY_MESSAGES, DEFAULT_HISTORY_BYTES, MessageHistory, SeenWindow
+from ghostwire_quick import CONFIG_FILE, USER_CONFIG
+from ghostwire_crypto import AEAD_SUITES, PREFERRED_SUITES, RelayCodec, choose_suite, get_codec, get_context
 
 BLOCK_SIZE = 16
-DATA_FILE = "/tmp/ghostwire_data.json"
-CONFIG_FILE = "/tmp/ghostwire_config.json"
+DATA_FILE = "/tmp/ghostwire_data.json"   # Users as saved before USERS_DB; imported once
+USERS_DB = "/tmp/ghostwire_users.db"
+RECONNECT_ATTEMPTS = 5   # How often a dropped room session tries to get back in
+RECONNECT_DELAY = 2.0
+
+# Counters folded into the server totals when a client's queue goes away
+QUEUE_COUNTERS = ('enqueued', 'dropped', 'sent_frames', 'sent_bytes', 'pauses')
 
 class GhostwireServer:
-    def __init__(self, port, key, alias, creator_username):
+    def __init__(self, port, key, alias, creator_username, queue_size=DEFAULT_QUEUE_FRAMES,
+                 queue_bytes=DEFAULT_QUEUE_BYTES, slow_policy=POLICY_DISCONNECT, opaque=False,
+                 history=DEFAULT_HISTORY_MESSAGES, history_bytes=DEFAULT_HISTORY_BYTES, log_dir=None):
         self.port = port
         self.key = key
+        self.cipher = get_context(key)  # Cached per-key AES context
+        self.codec = get_codec(key)     # AES-CBC frames for clients that negotiate nothing
         self.alias = alias
         self.creator = creator_username  # Store the creator username
-        self.clients = {}  # socket -> user info
+        self.queue_size = queue_size    # High-water mark in frames per client
+        self.queue_bytes = queue_bytes  # High-water mark in bytes per client
+        self.slow_policy = POLICY_ALIASES.get(slow_policy, slow_policy)  # What to do with clients that can't keep up
+        self.opaque = opaque            # Forward relay frames from capable clients without decrypting
+        from ghostwire_gateway import GatewayChannel  # Server-only, so loaded here rather than at import
+        self.gateway_channel = GatewayChannel  # Members behind an edge gateway, written by its link
+        archive = None
+        if log_dir:
+            from ghostwire_log import HistoryArchive, MessageLog  # Server-only modules load on first use
+            archive = HistoryArchive(MessageLog(log_dir), key)  # Room history on disk
+        self.history = MessageHistory(history, history_bytes, archive)  # Recent room messages for SINCE catch-up
+        self.clients = ClientRegistry()  # socket -> user info, username -> sessions
         self.users = {}    # username -> info
+        self.store = None  # UserStore the users are saved in
+        self.store_room = ''  # Name of this room in the store
         self.running = False
+        self.removals = threading.local()  # Per-thread queue of pending removals
+        self.stats_lock = threading.Lock()
+        self.counters = dict.fromkeys(QUEUE_COUNTERS + ('evicted', 'rejected', 'relayed'), 0)
         self.load_data()
     
     def load_data(self):
-        """Load existing user data"""
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, 'r') as f:
-                    data = json.load(f)
-                    self.users = data.get('users', {})
-            except:
-                pass
+        """Open the user store and load existing users"""
+        try:
+            from ghostwire_store import UserStore
+            self.store = UserStore(USERS_DB)
+            self.store.import_json(DATA_FILE)
+            self.store.set_creator(self.creator)
+            self.users = self.store.load()
+        except Exception as e:
+            print(f"[WARNING] Users will not be saved: {e}")
+            self.store = None
     
     def save_data(self):
-        """Save user data"""
-        try:
-            data = {'users': self.users, 'creator': self.creator}
-            with open(DATA_FILE, 'w') as f:
-                json.dump(data, f)
-        except:
-            pass
+        """Checkpoint the user store (users are saved as they join)"""
+        if self.store:
+            self.store.checkpoint()
+    
+    def remember_user(self, username, info=None):
+        """Add a user to the room's users and save it, if it is new"""
+        if username in self.users:
+            return
+        info = info or {'created': True}
+        self.users[username] = info
+        if self.store:
+            try:
+                self.store.add(username, info, self.store_room)
+            except Exception as e:
+                print(f"[WARNING] Could not save user {username}: {e}")
     
     def encrypt_message(self, message):
-        cipher = AES.new(self.key, AES.MODE_CBC)
-        ct_bytes = cipher.encrypt(pad(message.encode(), BLOCK_SIZE))
-        iv = base64.b64encode(cipher.iv).decode('utf-8')
-        ct = base64.b64encode(ct_bytes).decode('utf-8')
-        return iv + " " + ct
+        """Encrypt text into a raw IV + ciphertext payload"""
+        return self.cipher.encrypt_text(message)
     
-    def decrypt_message(self, encrypted_message):
-        try:
-            iv, ct = encrypted_message.split(" ", 1)
-            iv = base64.b64decode(iv)
-            ct = base64.b64decode(ct)
-            cipher = AES.new(self.key, AES.MODE_CBC, iv)
-            pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-            return pt.decode('utf-8')
-        except:
+    def decrypt_message(self, payload):
+        """Decrypt a raw IV + ciphertext payload back into text"""
+        return self.cipher.decrypt_text(payload)
+    
+    def encode_message(self, message):
+        """Encrypt text and wrap it in a data frame ready for the wire"""
+        return self.codec.encode(message)
+    
+    def negotiate(self, client_socket, fields):
+        """Pick the cipher suite for a new member and tell the client which one (and the history epoch)"""
+        if 'CIPHER' not in fields:
+            return self.codec  # Client predates negotiation: AES-CBC data frames
+        suite = choose_suite(fields['CIPHER'].split(','))
+        if self.opaque and fields.get('RELAY') == '1' and suite in AEAD_SUITES:
+            self.write_direct(client_socket, encode_hello(cipher=suite, relay=1, epoch=self.history.epoch))
+            return get_codec(self.key, suite, relay=True)
+        self.write_direct(client_socket, encode_hello(cipher=suite, epoch=self.history.epoch))
+        return get_codec(self.key, suite)
+    
+    def open_frame(self, codec, frame_type, payload):
+        """Decrypt a member's frame with its codec; None (and counted) if rejected"""
+        if frame_type not in (FRAME_DATA, FRAME_SEALED):
             return None
+        text = codec.decode(frame_type, payload)
+        if text is None:
+            with self.stats_lock:
+                self.counters['rejected'] += 1
+        return text
+    
+    def handle_frame(self, client_socket, username, codec, frame_type, payload):
+        """Route one frame from a member: relay it untouched or decrypt and handle it"""
+        if frame_type == FRAME_RELAY and codec.relay:
+            self.relay_frame(client_socket, username, codec, payload)
+            return
+        decrypted_message = self.open_frame(codec, frame_type, payload)
+        if decrypted_message:
+            self.handle_message(client_socket, username, decrypted_message)
+    
+    def relay_frame(self, client_socket, username, codec, payload):
+        """Forward a relay frame to its recipients without decrypting it.
+        
+        Only the header is read, and its sender must be the member's own
+        username; the payload itself goes out as received.
+        """
+        header = parse_relay_header(payload)
+        if header is None or header[0] != username:
+            with self.stats_lock:
+                self.counters['rejected'] += 1
+            return
+        target_user = header[1]
+        if not target_user:
+            print(f"[{username}]: (relayed, {len(payload)} bytes)")
+            self.relay_to_all(codec, payload, exclude_socket=client_socket)
+        elif self.relay_to_user(codec, payload, target_user):
+            self.send_text(client_socket, PRIVATE_SENT.format(target=target_user))
+        else:
+            self.send_text(client_socket, USER_NOT_FOUND.format(target=target_user))
+    
+    def relay_to_all(self, codec, payload, exclude_socket=None):
+        """Relay a payload to all connected clients, numbering it in the room history"""
+        with self.history.lock:
+            sequence = self.history.append_relay(codec.suite, payload)
+            recipients = [member for member in self.clients if member != exclude_socket]
+        self.deliver_relay(recipients, codec, payload, sequence)
+    
+    def relay_to_user(self, codec, payload, target_user):
+        """Relay a payload to every session of a specific user"""
+        return self.deliver_relay(self.clients.sessions_of(target_user), codec, payload)
+    
+    def deliver_relay(self, recipients, codec, payload, sequence=None):
+        """Queue a relay payload for recipients; True if anyone got it.
+        
+        Relay members on the same suite get the original bytes; anyone
+        else is sent the message decrypted once and re-encrypted in their
+        own format. With a sequence number, members that asked for history
+        get it wrapped in a FRAME_SEQ.
+        """
+        frame = encode_frame(FRAME_RELAY, payload)
+        frames = {}
+        sequenced = {}
+        opened = None
+        relayed = 0
+        delivered = False
+        dead_clients = []
+        for recipient in recipients:
+            user_info = self.clients.get(recipient)
+            if user_info is None:
+                continue
+            peer = user_info['codec']
+            try:
+                if peer.relay and peer.suite == codec.suite:
+                    if sequence is not None and user_info.get('sequenced'):
+                        self.send_raw(recipient, self.sequence_frame(frame, sequence, sequenced))
+                    else:
+                        self.send_raw(recipient, frame)
+                    relayed += 1
+                else:
+                    if opened is None:
+                        opened = codec.open_relay(payload) or False
+                        if not opened:
+                            with self.stats_lock:
+                                self.counters['rejected'] += 1
+                    if not opened:
+                        continue
+                    self.send_text(recipient, codec.format_relay(*opened), frames, sequence, sequenced)
+                delivered = True
+            except:
+                dead_clients.append(recipient)
+        
+        with self.stats_lock:
+            self.counters['relayed'] += relayed
+        for dead_client in dead_clients:
+            self.remove_client(dead_client)
+        return delivered
+    
+    def write_direct(self, client_socket, data):
+        """Write bytes straight to a connection that has no outbound queue.
+        
+        Only for a connection that is not a member yet: the handshake
+        answer and one-shot command replies. Blocks until written.
+        """
+        client_socket.sendall(data)
+    
+    def create_outbox(self, notify=None):
+        """Build a client's outbound queue with the configured limits"""
+        return OutboundQueue(self.queue_size, self.queue_bytes, self.slow_policy, notify)
+    
+    def start_writer(self, client_socket):
+        """Create the outbound queue and writer thread for a new member"""
+        if isinstance(client_socket, self.gateway_channel):
+            return client_socket.attach()  # Written by the gateway link's own writer
+        outbox = self.create_outbox()
+        writer = ClientWriter(client_socket, outbox, on_error=self.remove_client)
+        writer.start()
+        return {'outbox': outbox, 'writer': writer}
+    
+    def send_raw(self, client_socket, data):
+        """Queue already encoded bytes for a member without blocking the caller.
+        
+        ConnectionError if the member's queue refuses them, or if it is no
+        longer a member: recipients are picked before they are sent to, so
+        one may have left or been evicted since. Its socket is never
+        written to directly, which could block the sender on a stalled peer.
+        """
+        user_info = self.clients.get(client_socket)
+        if user_info is None:
+            raise ConnectionError("client is no longer a member")
+        if not user_info['outbox'].put(data):
+            if not user_info['outbox'].closed:
+                with self.stats_lock:
+                    self.counters['evicted'] += 1
+                print(f"[WARN] Evicting slow client {user_info['username']}")
+            raise ConnectionError("client outbound queue is full or closed")
+    
+    def send_text(self, client_socket, message, frames=None, sequence=None, sequenced=None):
+        """Encrypt message with the client's cipher suite and queue it.
+        
+        frames caches one encoded frame per suite, so a message going to
+        many members is encrypted once per suite rather than per member.
+        sequence is the message's history number, sent (wrapped in a
+        FRAME_SEQ, cached in sequenced) to members that asked for history.
+        """
+        user_info = self.clients.get(client_socket)
+        codec = user_info['codec'] if user_info else self.codec
+        if frames is None:
+            frame = codec.encode(message)
+        else:
+            frame = frames.get(codec.suite)
+            if frame is None:
+                frame = frames[codec.suite] = codec.encode(message)
+        if sequence is not None and user_info is not None and user_info.get('sequenced'):
+            frame = self.sequence_frame(frame, sequence, sequenced)
+        self.send_raw(client_socket, frame)
     
-    def broadcast_to_all(self, message, exclude_socket=None):
-        """Send message to all connected clients"""
-        encrypted_msg = self.encrypt_message(message)
+    def sequence_frame(self, frame, sequence, sequenced=None):
+        """FRAME_SEQ around an encoded frame, built once per distinct frame"""
+        if sequenced is None:
+            return encode_sequenced(sequence, frame)
+        wrapped = sequenced.get(frame)
+        if wrapped is None:
+            wrapped = sequenced[frame] = encode_sequenced(sequence, frame)
+        return wrapped
+    
+    def broadcast_to_all(self, message, exclude_socket=None, frames=None):
+        """Send message to all connected clients (frames: encoded copies per suite).
+        
+        The message is numbered and its recipients are picked while the
+        history lock is held, so a member joining at the same time gets it
+        either in its backlog or live, never both. It is encrypted and
+        queued after the lock is released, so joins and other broadcasts
+        do not wait on the fan-out.
+        """
+        if frames is None:
+            frames = {}
+        sequenced = {}
         dead_clients = []
         
-        for client_socket in self.clients:
-            if client_socket != exclude_socket:
-                try:
-                    client_socket.send(encrypted_msg.encode('utf-8'))
-                except:
-                    dead_clients.append(client_socket)
+        with self.history.lock:
+            sequence = self.history.append(message)
+            recipients = [client_socket for client_socket in self.clients if client_socket != exclude_socket]
+        
+        for client_socket in recipients:
+            try:
+                self.send_text(client_socket, message, frames, sequence, sequenced)
+            except:
+                dead_clients.append(client_socket)
         
         for dead_client in dead_clients:
             self.remove_client(dead_client)
     
     def send_to_user(self, message, target_user):
-        """Send message to specific user"""
-        encrypted_msg = self.encrypt_message(message)
+        """Send message to every session of a specific user"""
+        sessions = self.clients.sessions_of(target_user)
+        if not sessions:
+            return False
         
-        for client_socket, user_info in self.clients.items():
-            if user_info['username'] == target_user:
-                try:
-                    client_socket.send(encrypted_msg.encode('utf-8'))
-                    return True
-                except:
-                    self.remove_client(client_socket)
-        return False
+        frames = {}
+        delivered = False
+        for client_socket in sessions:
+            try:
+                self.send_text(client_socket, message, frames)
+                delivered = True
+            except:
+                self.remove_client(client_socket)
+        return delivered
+    
+    def register_client(self, client_socket, username, address, codec=None):
+        """Add a member that completed the handshake to the client indexes"""
+        user_info = {'username': username, 'address': address, 'codec': codec or self.codec}
+        user_info.update(self.start_writer(client_socket))
+        self.clients.add(client_socket, user_info)
+        return user_info
+    
+    def unregister_client(self, client_socket):
+        """Drop a member from the client indexes; returns its info or None"""
+        return self.clients.remove(client_socket)
     
     def remove_client(self, client_socket):
-        """Remove client connection"""
-        if client_socket in self.clients:
-            user_info = self.clients[client_socket]
+        """Remove client connection.
+        
+        Announcing a departure can uncover more dead clients; those are
+        queued and handled by this same loop instead of recursing.
+        """
+        pending = getattr(self.removals, 'pending', None)
+        if pending is not None:
+            pending.append(client_socket)
+            return
+        
+        self.removals.pending = pending = [client_socket]
+        try:
+            while pending:
+                self.remove_one_client(pending.pop())
+        finally:
+            self.removals.pending = None
+    
+    def remove_one_client(self, client_socket):
+        """Unregister, close and announce a single client"""
+        user_info = self.unregister_client(client_socket)
+        if user_info is not None:
             username = user_info.get('username', 'Unknown')
             print(f"[INFO] {username} disconnected")
-            del self.clients[client_socket]
-            self.broadcast_to_all(f"[SYSTEM] {username} left the room")
+            user_info['outbox'].close(discard=True)
+            self.retire_counters(user_info['outbox'])
+            if self.running:
+                self.broadcast_to_all(f"[SYSTEM] {username} left the room")
         
+        # close() alone leaves the connection open while the handler thread
+        # still sits in recv on it; shutdown sends the FIN so the peer sees EOF
+        if isinstance(client_socket, socket.socket):
+            try:
+                client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
         try:
             client_socket.close()
         except:
@@ -109,97 +375,211 @@ class GhostwireServer:
     
     def handle_client(self, client_socket, address):
         """Handle individual client"""
-        username = None
+        reader = FrameReader(client_socket)
         try:
             # Wait for client to send username first
-            data = client_socket.recv(1024)
-            if not data:
+            frame = reader.read_handshake()
+        except:
+            client_socket.close()
+            return
+        self.serve_client(client_socket, address, reader, frame)
+    
+    def serve_client(self, client_socket, address, reader, frame):
+        """Run a connection whose first frame (the handshake) was already read"""
+        if frame and frame[0] == FRAME_HELLO and 'GATEWAY' in parse_hello_fields(frame[1]):
+            # An edge gateway carrying many members over this one connection
+            name = parse_hello_fields(frame[1])['GATEWAY']
+            from ghostwire_gateway import GatewayLink
+            GatewayLink(self, client_socket, f"{name} ({address[0]})").serve(reader)
+            return
+        
+        admitted = self.admit_client(client_socket, address, frame)
+        if admitted is None:
+            return
+        username, codec = admitted
+        
+        try:
+            for frame_type, payload in reader:
+                if not self.running:
+                    break
+                
+                self.handle_frame(client_socket, username, codec, frame_type, payload)
+        
+        except Exception as e:
+            print(f"[ERROR] Client {username} error: {e}")
+        finally:
+            self.remove_client(client_socket)
+    
+    def admit_client(self, client_socket, address, frame):
+        """Handle a connection's handshake; (username, codec) once it is a member.
+        
+        Returns None, with the connection closed, for bad handshakes and
+        one-shot commands.
+        """
+        try:
+            if not frame or frame[0] != FRAME_HELLO:
                 client_socket.close()
-                return
+                return None
             
-            username_data = data.decode('utf-8')
-            if username_data.startswith('USERNAME:'):
-                username = username_data.split(':', 1)[1].strip()
-                
-                # Handle special commands
-                if username == "LIST_USERS_CMD":
-                    self.send_user_list(client_socket)
-                    client_socket.close()
-                    return
-                    
-            else:
+            username = parse_hello(frame[1])
+            if not username:
                 client_socket.close()
-                return
+                return None
+            
+            # Handle special commands
+            if self.handle_command(client_socket, username):
+                client_socket.close()
+                return None
+            
+            fields = parse_hello_fields(frame[1])
+            codec = self.negotiate(client_socket, fields)
             
             # Ensure user exists in users list
-            if username not in self.users:
-                self.users[username] = {'created': True}
+            self.remember_user(username)
             
-            self.clients[client_socket] = {'username': username, 'address': address}
+            self.join_member(client_socket, username, address, codec, fields)
             
             print(f"[INFO] {username} connected from {address}")
             self.broadcast_to_all(f"[SYSTEM] {username} joined the room", exclude_socket=client_socket)
         except:
             client_socket.close()
+            return None
+        return username, codec
+    
+    def join_member(self, client_socket, username, address, codec, fields):
+        """Register a new member; if its handshake asked for SINCE:<n>, send the history after n first.
+        
+        n counts in the numbering named by the handshake's EPOCH; from
+        another epoch it means nothing here and the whole backlog is sent.
+        """
+        since = fields.get('SINCE', '')
+        with self.history.lock:
+            user_info = self.register_client(client_socket, username, address, codec)
+            if since.isdigit():
+                user_info['sequenced'] = True
+                since = int(since)
+                if fields.get('EPOCH', self.history.epoch) != self.history.epoch or since > self.history.sequence:
+                    since = 0  # Numbered by another worker or node, or an earlier run of this server
+                self.replay_history(client_socket, codec, since)
+        return user_info
+    
+    def replay_history(self, client_socket, codec, since):
+        """Queue the kept messages newer than since for one member, in one piece.
+        
+        Texts are encrypted with the member's codec in one batch; relay
+        frames go out as received when the member can take them.
+        """
+        entries = self.history.since(since)
+        if not entries:
             return
+        encoded = iter(codec.encode_batch([entry[1] for entry in entries if entry[1] is not None]))
+        chunks = []
+        for sequence, message, suite, payload in entries:
+            if message is not None:
+                frame = next(encoded)
+            elif codec.relay and codec.suite == suite:
+                frame = encode_frame(FRAME_RELAY, payload)
+            else:
+                opened = get_codec(self.key, suite, relay=True).open_relay(payload)
+                if not opened:
+                    continue
+                frame = codec.encode(codec.format_relay(*opened))
+            chunks.append(encode_sequenced(sequence, frame))
+        self.send_raw(client_socket, b"".join(chunks))
+    
+    def handle_message(self, client_socket, username, decrypted_message):
+        """Route a decrypted message from a connected client"""
+        # Check if it's a private message
+        if decrypted_message.startswith('@'):
+            # Private message format: @username message
+            parts = decrypted_message.split(' ', 1)
+            if len(parts) >= 2:
+                target_user = parts[0][1:]  # Remove @
+                private_msg = parts[1]
+                success = self.send_to_user(f"[PRIVATE from {username}]: {private_msg}", target_user)
+                if success:
+                    # COMPLETE PRIVACY - NO LOGGING AT ALL
+                    # Send confirmation to sender
+                    self.send_text(client_socket, PRIVATE_SENT.format(target=target_user))
+                else:
+                    # Send error to sender
+                    self.send_text(client_socket, USER_NOT_FOUND.format(target=target_user))
+        else:
+            # Public message - show in server log
+            print(f"[{username}]: {decrypted_message}")
+            # Broadcast to other clients
+            self.broadcast_to_all(f"[{username}]: {decrypted_message}", exclude_socket=client_socket)
+    
+    def handle_command(self, client_socket, username):
+        """Answer LIST_USERS_CMD / STATS_CMD handshakes; True if one was handled"""
+        if username == "LIST_USERS_CMD":
+            self.send_user_list(client_socket)
+            return True
+        if username == "STATS_CMD":
+            self.send_stats(client_socket)
+            return True
+        return False
+    
+    def retire_counters(self, outbox):
+        """Fold a departing client's queue counters into the server totals"""
+        queue_stats = outbox.stats()
+        with self.stats_lock:
+            for name in QUEUE_COUNTERS:
+                self.counters[name] += queue_stats[name]
+    
+    def get_stats(self):
+        """Server-wide fan-out and backpressure counters"""
+        with self.stats_lock:
+            stats = dict(self.counters)
+        stats.update({'clients': 0, 'queued_frames': 0, 'queued_bytes': 0, 'paused_clients': 0})
         
-        try:
-            while self.running:
-                data = client_socket.recv(1024)
-                if not data:
-                    break
-                
-                encrypted_message = data.decode('utf-8')
-                decrypted_message = self.decrypt_message(encrypted_message)
-                
-                if decrypted_message:
-                    # Check if it's a private message
-                    if decrypted_message.startswith('@'):
-                        # Private message format: @username message
-                        parts = decrypted_message.split(' ', 1)
-                        if len(parts) >= 2:
-                            target_user = parts[0][1:]  # Remove @
-                            private_msg = parts[1]
-                            success = self.send_to_user(f"[PRIVATE from {username}]: {private_msg}", target_user)
-                            if success:
-                                # COMPLETE PRIVACY - NO LOGGING AT ALL
-                                # Send confirmation to sender
-                                confirmation = self.encrypt_message(f"[SYSTEM] Private message sent to {target_user}")
-                                client_socket.send(confirmation.encode('utf-8'))
-                            else:
-                                # Send error to sender
-                                error_msg = self.encrypt_message(f"[SYSTEM] User {target_user} not found")
-                                client_socket.send(error_msg.encode('utf-8'))
-                    else:
-                        # Public message - show in server log
-                        print(f"[{username}]: {decrypted_message}")
-                        # Broadcast to other clients
-                        self.broadcast_to_all(f"[{username}]: {decrypted_message}", exclude_socket=client_socket)
+        for user_info in list(self.clients.values()):
+            queue_stats = user_info['outbox'].stats()
+            for name in QUEUE_COUNTERS + ('queued_frames', 'queued_bytes'):
+                stats[name] += queue_stats[name]
+            stats['paused_clients'] += queue_stats['paused']
+            stats['clients'] += 1
         
-        except Exception as e:
-            print(f"[ERROR] Client {username} error: {e}")
-        finally:
-            self.remove_client(client_socket)
+        stats.update({'queue_size': self.queue_size, 'queue_bytes': self.queue_bytes,
+                      'slow_policy': self.slow_policy, 'opaque': self.opaque,
+                      'history': len(self.history), 'sequence': self.history.sequence})
+        return stats
+    
+    def send_stats(self, client_socket):
+        """Send the server counters (as JSON) to the requesting client"""
+        try:
+            self.write_direct(client_socket, self.encode_message(json.dumps(self.get_stats())))
+        except:
+            pass
+    
+    def connected_users(self):
+        """Usernames with at least one live session"""
+        return self.clients.usernames()
     
     def send_user_list(self, client_socket):
         """Send user list to requesting client"""
-        connected_users = [user_info['username'] for user_info in self.clients.values()]
+        connected_users = self.connected_users()
         created_users = list(self.users.keys())
         
         user_list = f"Connected: {', '.join(connected_users)} | Created: {', '.join(created_users)}"
-        encrypted_response = self.encrypt_message(user_list)
+        encrypted_response = self.encode_message(user_list)
         
         try:
-            client_socket.send(encrypted_response.encode('utf-8'))
+            self.write_direct(client_socket, encrypted_response)
         except:
             pass
     
+    def create_listener(self):
+        """Bind and listen on the room port"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind(('0.0.0.0', self.port))
+        server_socket.listen(10)
+        return server_socket
+    
     def start(self):
         """Start the server"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind(('0.0.0.0', self.port))
-        self.server_socket.listen(10)
+        self.server_socket = self.create_listener()
         self.running = True
         
         print(f"[SERVER] Ghostwire '{self.alias}' started on port {self.port}")
@@ -230,15 +610,20 @@ class GhostwireServer:
         print(f"[SERVER] Broadcasting termination message to {len(self.clients)} users")
         
         # Send termination message to all clients
+        frames = {}
         for client_socket in list(self.clients.keys()):
             try:
-                encrypted_msg = self.encrypt_message(termination_message)
-                client_socket.send(encrypted_msg.encode('utf-8'))
-                # Give a moment for message to be sent
-                time.sleep(0.1)
+                self.send_text(client_socket, termination_message, frames)
             except:
                 pass
         
+        # Give the writers a moment to flush what is still queued
+        for user_info in list(self.clients.values()):
+            user_info['outbox'].close()
+        deadline = time.time() + 1.0
+        for user_info in list(self.clients.values()):
+            user_info['writer'].join(max(0, deadline - time.time()))
+        
         # Now disconnect all clients
         for client_socket in list(self.clients.keys()):
             self.remove_client(client_socket)
@@ -248,17 +633,90 @@ class GhostwireServer:
         except:
             pass
         
+        self.history.close()
+        
         self.save_data()
+        stats = self.get_stats()
+        print(f"[SERVER] Fan-out: {stats['sent_frames']} frames sent, {stats['dropped']} dropped, "
+              f"{stats['evicted']} slow clients evicted")
         print(f"[SERVER] Server on port {self.port} stopped")
 
-def send_message(host, port, key, username, message, target_user=None, users={}):
+def connect_room(host, port, key, username, ciphers=PREFERRED_SUITES, relay=True, room=None, since=None):
+    """Join a room and agree on a cipher suite.
+    
+    Returns (socket, FrameReader, MessageCodec). The client first sends
+    PROBE and only a server that answers it gets the full handshake:
+    the cipher offer, room and since. A server that predates negotiation
+    closes the connection on PROBE instead; the client then reconnects
+    with a bare "USERNAME:" handshake, exactly what such a server
+    expects, and uses AES-CBC data frames. Nothing waits on a timeout.
+    When an --opaque server accepts the relay offer the codec sends
+    relay frames instead. room picks a room on a server that hosts
+    several (--rooms). With since the server first sends the room
+    messages numbered after it, and numbers everything that follows
+    (FRAME_SEQ).
+    """
+    return handshake_room(host, port, key, username, ciphers, relay, room, since)[:3]
+
+def handshake_room(host, port, key, username, ciphers=PREFERRED_SUITES, relay=True, room=None, since=None,
+                   epoch=None):
+    """connect_room, also returning the fields of the server's answer ({} from an old server).
+    
+    epoch is the history epoch since was counted in; a server whose
+    history has another epoch ignores since and sends its whole backlog.
+    """
+    client_socket = socket.create_connection((host, port))
+    reader = FrameReader(client_socket)
+    try:
+        client_socket.sendall(PROBE)
+        answer = reader.read_frame()
+    except (OSError, ProtocolError):
+        answer = None
+    if not is_probe(answer):
+        client_socket.close()
+        client_socket = socket.create_connection((host, port))
+        client_socket.sendall(encode_hello(username))
+        return client_socket, FrameReader(client_socket), get_codec(key), {}
+    
+    fields = {'cipher': ",".join(ciphers)}
+    if relay:
+        fields['relay'] = 1
+    if room:
+        fields['room'] = room
+    if since is not None:
+        fields['since'] = since
+        if epoch is not None:
+            fields['epoch'] = epoch
+    client_socket.sendall(encode_hello(username, **fields))
+    frame = reader.read_frame()
+    if not frame or frame[0] != FRAME_HELLO:
+        client_socket.close()
+        raise ConnectionError(f"{host}:{port} refused the handshake for {username}")
+    
+    fields = parse_hello_fields(frame[1])
+    suite = fields.get('CIPHER')
+    if suite in ciphers and relay and fields.get('RELAY') == '1' and suite in AEAD_SUITES:
+        codec = RelayCodec(get_context(key, suite), username)
+    elif suite in ciphers:
+        codec = get_codec(key, suite)
+    else:
+        codec = get_codec(key)
+    return client_socket, reader, codec, fields
+
+def send_message(host, port, key, username, message, target_user=None, users={}, room=None):
     """Send a message to the server"""
     try:
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.connect((host, port))
+        # Reuse the room connection of a running --agent when there is one
+        from ghostwire_agent import send_via_agent
+        if send_via_agent(port, username, message, target_user, room):
+            if target_user:
+                print(f"[INFO] Private message sent to {target_user} via agent: {message}")
+            else:
+                print(f"[INFO] Message sent to all via agent: {message}")
+            return
         
-        # Send username first
-        client_socket.send(f"USERNAME:{username}".encode('utf-8'))
+        # Send username first and agree on a cipher suite
+        client_socket, reader, codec = connect_room(host, port, key, username, room=room)
         
         # Prepare message
         if target_user:
@@ -267,25 +725,14 @@ def send_message(host, port, key, username, message, target_user=None, users={})
             full_message = message
         
         # Encrypt and send message
-        cipher = AES.new(key, AES.MODE_CBC)
-        ct_bytes = cipher.encrypt(pad(full_message.encode(), BLOCK_SIZE))
-        iv = base64.b64encode(cipher.iv).decode('utf-8')
-        ct = base64.b64encode(ct_bytes).decode('utf-8')
-        encrypted_message = iv + " " + ct
-        
-        client_socket.send(encrypted_message.encode('utf-8'))
+        client_socket.sendall(codec.encode(full_message))
         
         # Wait for confirmation if private message
         if target_user:
             try:
-                response = client_socket.recv(1024).decode('utf-8')
-                if response:
-                    iv, ct = response.split(" ", 1)
-                    iv = base64.b64decode(iv)
-                    ct = base64.b64decode(ct)
-                    cipher = AES.new(key, AES.MODE_CBC, iv)
-                    pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-                    confirmation = pt.decode('utf-8')
+                frame = reader.read_frame()
+                confirmation = codec.decode(*frame) if frame else None
+                if confirmation:
                     print(f"[INFO] {confirmation}")
             except:
                 pass
@@ -300,44 +747,217 @@ def send_message(host, port, key, username, message, target_user=None, users={})
     except Exception as e:
         print(f"[ERROR] Failed to send message: {e}")
 
-def join_room_persistent(host, port, key, username):
+def read_batch(source):
+    """Yield (message, target_user) pairs from JSON lines in a file or '-' for stdin"""
+    stream = sys.stdin if source == '-' else open(source, 'r', encoding='utf-8')
+    try:
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                yield str(entry['message']), entry.get('to')
+            except (ValueError, KeyError, TypeError, AttributeError):
+                print(f"[WARN] Skipping invalid batch line {line_number}")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def private_reply(text):
+    """('delivered' | 'not_found', target) for the server's answer to a private message, else None"""
+    for outcome, template in (('delivered', PRIVATE_SENT), ('not_found', USER_NOT_FOUND)):
+        prefix, _, suffix = template.partition('{target}')
+        if text.startswith(prefix) and text.endswith(suffix) and len(text) > len(prefix) + len(suffix):
+            return outcome, text[len(prefix):len(text) - len(suffix)]
+    return None
+
+def send_batch(host, port, key, username, source, chunk_frames=64, room=None):
+    """Send every message of a JSON-lines batch over a single connection"""
+    try:
+        client_socket, reader, codec = connect_room(host, port, key, username, room=room)
+    except Exception as e:
+        print(f"[ERROR] Failed to connect for batch send: {e}")
+        return
+
+    # Confirmations for private messages arrive while we are still sending;
+    # read them concurrently so the server never sees us as a slow client
+    # Only answers for a target we still wait on count; room broadcasts
+    # that merely look alike ("[bob]: file not found") are ignored
+    replies = {'delivered': 0, 'not_found': 0}
+    awaiting = {}  # Target user -> private messages sent but not yet answered
+    replies_changed = threading.Condition()
+    def read_replies():
+        try:
+            for frame_type, payload in reader:
+                text = codec.decode(frame_type, payload)
+                reply = private_reply(text) if text is not None else None
+                if reply is None:
+                    continue
+                outcome, target_user = reply
+                with replies_changed:
+                    if awaiting.get(target_user):
+                        awaiting[target_user] -= 1
+                        replies[outcome] += 1
+                        replies_changed.notify()
+        except (OSError, ValueError):
+            pass
+
+    reply_thread = threading.Thread(target=read_replies, daemon=True)
+    reply_thread.start()
+
+    sent = 0
+    sent_bytes = 0
+    private = 0
+    pending = []
+    started = time.time()
+
+    def flush():
+        # Encrypt the whole chunk at once and write it without waiting for replies
+        nonlocal sent, sent_bytes, pending
+        data = b"".join(codec.encode_batch(pending))
+        client_socket.sendall(data)
+        sent += len(pending)
+        sent_bytes += len(data)
+        pending = []
+
+    try:
+        for message, target_user in read_batch(source):
+            if target_user:
+                message = f"@{target_user} {message}"
+                private += 1
+                with replies_changed:
+                    awaiting[target_user] = awaiting.get(target_user, 0) + 1
+            pending.append(message)
+            if len(pending) >= chunk_frames:
+                flush()
+        if pending:
+            flush()
+        elapsed = time.time() - started
+
+        # Wait for the confirmation of every private message before leaving
+        with replies_changed:
+            replies_changed.wait_for(lambda: replies['delivered'] + replies['not_found'] >= private, 5)
+    except Exception as e:
+        print(f"[ERROR] Batch send failed after {sent} messages: {e}")
+        return
+    finally:
+        # Shut down first: close() alone does not wake the reader thread
+        try:
+            client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client_socket.close()
+
+    rate = sent / elapsed if elapsed > 0 else float(sent)
+    print(f"[INFO] Sent {sent} messages ({sent_bytes} bytes) in {elapsed:.3f}s - "
+          f"{rate:.0f} msg/sec, {sent_bytes / 1024 / max(elapsed, 1e-9):.0f} KB/s")
+    if private:
+        print(f"[INFO] Private: {replies['delivered']} delivered, {replies['not_found']} to unknown users")
+
+class RoomSession:
+    """A member's room connection that survives short drops.
+    
+    It joins with SINCE:<last sequence seen>, so the server replays what
+    the member missed (the recent room history on the first join) and
+    numbers every later message. Numbers already seen are skipped, so
+    each message is shown once even when messages from different
+    senders arrive slightly out of order. Numbers only count within the
+    history epoch the server names when we join: if a rejoin lands on
+    another epoch (another worker or node, or a restart without --log)
+    the server sends its whole backlog and we start counting over.
+    """
+    
+    def __init__(self, host, port, key, username, room=None, since=0):
+        self.host = host
+        self.port = port
+        self.key = key
+        self.username = username
+        self.room = room
+        self.last_sequence = since  # Highest number seen, asked for on rejoin
+        self.seen = SeenWindow()
+        self.epoch = None  # Epoch of the server's history the numbers belong to
+        self.closed = False
+        self.connect()
+    
+    def connect(self):
+        self.socket, self.reader, self.codec, answer = handshake_room(
+            self.host, self.port, self.key, self.username, room=self.room, since=self.last_sequence,
+            epoch=self.epoch)
+        epoch = answer.get('EPOCH')
+        if epoch != self.epoch:
+            if self.epoch is not None:
+                self.last_sequence = 0
+                self.seen = SeenWindow()
+            self.epoch = epoch
+    
+    def reconnect(self):
+        """Try to rejoin after a drop; True once back in the room"""
+        for _ in range(RECONNECT_ATTEMPTS):
+            time.sleep(RECONNECT_DELAY)
+            if self.closed:
+                return False
+            try:
+                self.connect()
+                return True
+            except OSError:
+                continue
+        return False
+    
+    def receive(self, frame_type, payload):
+        """Text of one frame; None for repeats and frames that are not for us"""
+        if frame_type == FRAME_SEQ:
+            sequenced = parse_sequenced(payload)
+            if sequenced is None:
+                return None
+            sequence = sequenced[0]
+            if not self.seen.add(sequence):
+                return None
+            self.last_sequence = max(self.last_sequence, sequence)
+        message = self.codec.decode(frame_type, payload)
+        if message is None:
+            print("[ERROR] Failed to decrypt message")
+        return message
+    
+    def listen(self):
+        """Print room messages until the session is closed or cannot rejoin"""
+        while not self.closed:
+            try:
+                for frame_type, payload in self.reader:
+                    if frame_type not in self.codec.frame_types:
+                        continue
+                    message = self.receive(frame_type, payload)
+                    if message is not None:
+                        print(message)
+            except (OSError, ValueError):
+                pass
+            if self.closed:
+                return
+            print(f"[WARNING] Connection lost, rejoining after message {self.last_sequence}...")
+            if not self.reconnect():
+                print("[ERROR] Could not rejoin the room")
+                return
+            print("[INFO] Rejoined the room")
+    
+    def send(self, message):
+        self.socket.sendall(self.codec.encode(message))
+    
+    def close(self):
+        self.closed = True
+        self.socket.close()
+
+def join_room_persistent(host, port, key, username, room=None):
     """Join room and stay connected to receive and send messages"""
     try:
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.connect((host, port))
-        
-        # Send username to join
-        client_socket.send(f"USERNAME:{username}".encode('utf-8'))
+        # Send username to join, agree on a cipher suite and catch up on recent messages
+        session = RoomSession(host, port, key, username, room)
         
         print(f"[INFO] Connected to room as {username}")
         print(f"[INFO] You are now in the room. Type messages to send. Ctrl+C to leave.")
         print("-" * 50)
         
-        # Start thread to listen for incoming messages
-        def listen_for_messages():
-            try:
-                while True:
-                    data = client_socket.recv(1024)
-                    if not data:
-                        break
-                    
-                    try:
-                        encrypted_message = data.decode('utf-8')
-                        iv, ct = encrypted_message.split(" ", 1)
-                        iv = base64.b64decode(iv)
-                        ct = base64.b64decode(ct)
-                        cipher = AES.new(key, AES.MODE_CBC, iv)
-                        pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-                        message = pt.decode('utf-8')
-                        print(message)
-                    except Exception as e:
-                        print(f"[ERROR] Failed to decrypt message: {e}")
-            except:
-                pass
-        
         # Start listening thread
-        import threading
-        listen_thread = threading.Thread(target=listen_for_messages)
+        listen_thread = threading.Thread(target=session.listen)
         listen_thread.daemon = True
         listen_thread.start()
         
@@ -354,13 +974,7 @@ def join_room_persistent(host, port, key, username):
                             full_message = user_input
                         
                         # Encrypt and send message
-                        cipher = AES.new(key, AES.MODE_CBC)
-                        ct_bytes = cipher.encrypt(pad(full_message.encode(), BLOCK_SIZE))
-                        iv = base64.b64encode(cipher.iv).decode('utf-8')
-                        ct = base64.b64encode(ct_bytes).decode('utf-8')
-                        encrypted_message = iv + " " + ct
-                        
-                        client_socket.send(encrypted_message.encode('utf-8'))
+                        session.send(full_message)
                 except EOFError:
                     break
                 except KeyboardInterrupt:
@@ -369,19 +983,16 @@ def join_room_persistent(host, port, key, username):
         except KeyboardInterrupt:
             print(f"\n[INFO] {username} leaving room...")
         
-        client_socket.close()
+        session.close()
         
     except Exception as e:
         print(f"[ERROR] Failed to join room: {e}")
 
-def create_user_in_room(host, port, key, username):
+def create_user_in_room(host, port, key, username, room=None):
     """Create user ID in room and STAY CONNECTED to receive messages"""
     try:
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client_socket.connect((host, port))
-        
-        # Send username to create user
-        client_socket.send(f"USERNAME:{username}".encode('utf-8'))
+        # Send username to create user, agree on a cipher suite and catch up on recent messages
+        session = RoomSession(host, port, key, username, room)
         
         print(f"[INFO] User '{username}' created and joined the room")
         print(f"[INFO] You are now connected and will see all messages")
@@ -394,38 +1005,17 @@ def create_user_in_room(host, port, key, username):
             'username': username, 
             'port': port,
             'host': host,
-            'key': base64.b64encode(key).decode('utf-8')
+            'key': base64.b64encode(key).decode('utf-8'),
+            'room': room
         }
         try:
-            with open('/tmp/ghostwire_user.json', 'w') as f:
+            with open(USER_CONFIG, 'w') as f:
                 json.dump(user_config, f)
         except:
             pass
         
-        # Start thread to listen for incoming messages
-        def listen_for_messages():
-            try:
-                while True:
-                    data = client_socket.recv(1024)
-                    if not data:
-                        break
-                    
-                    try:
-                        encrypted_message = data.decode('utf-8')
-                        iv, ct = encrypted_message.split(" ", 1)
-                        iv = base64.b64decode(iv)
-                        ct = base64.b64decode(ct)
-                        cipher = AES.new(key, AES.MODE_CBC, iv)
-                        pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-                        message = pt.decode('utf-8')
-                        print(message)
-                    except Exception as e:
-                        print(f"[ERROR] Failed to decrypt message: {e}")
-            except:
-                pass
-        
         # Start listening thread
-        listen_thread = threading.Thread(target=listen_for_messages)
+        listen_thread = threading.Thread(target=session.listen)
         listen_thread.daemon = True
         listen_thread.start()
         
@@ -457,13 +1047,7 @@ def create_user_in_room(host, port, key, username):
                             full_message = user_input
                         
                         # Encrypt and send message
-                        cipher = AES.new(key, AES.MODE_CBC)
-                        ct_bytes = cipher.encrypt(pad(full_message.encode(), BLOCK_SIZE))
-                        iv = base64.b64encode(cipher.iv).decode('utf-8')
-                        ct = base64.b64encode(ct_bytes).decode('utf-8')
-                        encrypted_message = iv + " " + ct
-                        
-                        client_socket.send(encrypted_message.encode('utf-8'))
+                        session.send(full_message)
                 except EOFError:
                     break
                 except KeyboardInterrupt:
@@ -472,7 +1056,7 @@ def create_user_in_room(host, port, key, username):
         except KeyboardInterrupt:
             print(f"\n[INFO] {username} leaving room...")
         
-        client_socket.close()
+        session.close()
         
     except Exception as e:
         print(f"[ERROR] Failed to create user: {e}")
@@ -480,7 +1064,7 @@ def create_user_in_room(host, port, key, username):
 def get_saved_user_config():
     """Get the saved user config from previous --create-user"""
     try:
-        with open('/tmp/ghostwire_user.json', 'r') as f:
+        with open(USER_CONFIG, 'r') as f:
             user_config = json.load(f)
             return user_config
     except:
@@ -582,25 +1166,20 @@ def handle_extract_command(user_input, username):
     except Exception as e:
         print(f"Error in extract command: {e}")
 
-def list_users(host, port, key):
+def list_users(host, port, key, room=None):
     """List all users"""
     try:
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         client_socket.connect((host, port))
         
         # Send special command to list users
-        client_socket.send("USERNAME:LIST_USERS_CMD".encode('utf-8'))
+        client_socket.sendall(encode_hello("LIST_USERS_CMD", room=room) if room else encode_hello("LIST_USERS_CMD"))
         
         # Wait for response
-        response = client_socket.recv(1024).decode('utf-8')
-        if response:
+        frame = FrameReader(client_socket).read_frame()
+        if frame and frame[0] == FRAME_DATA:
             try:
-                iv, ct = response.split(" ", 1)
-                iv = base64.b64decode(iv)
-                ct = base64.b64decode(ct)
-                cipher = AES.new(key, AES.MODE_CBC, iv)
-                pt = unpad(cipher.decrypt(ct), BLOCK_SIZE)
-                user_list = pt.decode('utf-8')
+                user_list = get_context(key).decrypt(frame[1]).decode('utf-8')
                 print(f"[USERS] {user_list}")
             except:
                 print("[ERROR] Failed to decrypt user list")
@@ -612,6 +1191,29 @@ def list_users(host, port, key):
     except Exception as e:
         print(f"[ERROR] Failed to list users: {e}")
 
+def show_stats(host, port, key, room=None):
+    """Print the server's fan-out and backpressure counters"""
+    try:
+        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client_socket.connect((host, port))
+        client_socket.sendall(encode_hello("STATS_CMD", room=room) if room else encode_hello("STATS_CMD"))
+        
+        frame = FrameReader(client_socket).read_frame()
+        if frame and frame[0] == FRAME_DATA:
+            try:
+                stats = json.loads(get_context(key).decrypt(frame[1]).decode('utf-8'))
+                for name, value in stats.items():
+                    print(f"[STATS] {name}: {value}")
+            except:
+                print("[ERROR] Failed to decrypt server stats")
+        else:
+            print("[INFO] No stats received")
+        
+        client_socket.close()
+        
+    except Exception as e:
+        print(f"[ERROR] Failed to get stats: {e}")
+
 def save_config(port, key, alias, creator):
     """Save connection config for easy access"""
     config = {
@@ -637,6 +1239,56 @@ def load_config():
             pass
     return None, None, None, None
 
+def run_rooms(args, server_options):
+    """Serve every room of a --rooms file from this process"""
+    from ghostwire_rooms import RoomHost, load_rooms
+    if args.use_async or args.workers > 1:
+        print("[ERROR] --rooms cannot be combined with --async or --workers")
+        return
+    try:
+        rooms = load_rooms(args.rooms)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"[ERROR] Cannot read rooms file {args.rooms}: {e}")
+        return
+    
+    host = RoomHost(args.port, **server_options)
+    for name, room_key, creator in rooms:
+        host.add_room(name, room_key, creator)
+    # Rooms started from --key1/2/3 and --alias also take clients that name no room
+    if args.key1 and args.key2 and args.key3 and args.alias:
+        host.add_room(args.alias, pad((args.key1 + args.key2 + args.key3).encode(), BLOCK_SIZE),
+                      args.create_user or "server-admin")
+        host.default_room = args.alias
+    
+    def signal_handler(sig, frame):
+        print("\n[SERVER] Received shutdown signal...")
+        host.stop()
+        sys.exit(0)
+    
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    host.start()
+
+def run_gateway(args, server_options):
+    """Relay local clients to a room server over one upstream connection"""
+    from ghostwire_gateway import GhostwireGateway
+    upstream_host, _, upstream_port = args.relay.rpartition(':')
+    if not upstream_port.isdigit():
+        print("[ERROR] --relay needs the room server as HOST:PORT")
+        return
+    gateway = GhostwireGateway(args.port, upstream_host or 'localhost', int(upstream_port), args.node, args.room,
+                               server_options['queue_size'], server_options['queue_bytes'],
+                               server_options['slow_policy'])
+    
+    def signal_handler(sig, frame):
+        print("\n[GATEWAY] Received shutdown signal...")
+        gateway.stop()
+        sys.exit(0)
+    
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    gateway.start()
+
 def main():
     parser = argparse.ArgumentParser(description='Ghostwire - Command-Line Only P2P Communication Tool')
     parser.add_argument('--port', type=int, help='Port number (default: 2222)', default=2222)
@@ -652,6 +1304,37 @@ def main():
     parser.add_argument('--all', action='store_true', help='Send to all users')
     parser.add_argument('--to', help='Send to specific user')
     parser.add_argument('--list-all', action='store_true', help='List all users')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Serve the room on a single asyncio event loop (for very large rooms)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Serve the room from N pre-forked processes sharing the port (default: 1)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_FRAMES,
+                        help=f'Max frames queued per client before the slow policy applies (default: {DEFAULT_QUEUE_FRAMES})')
+    parser.add_argument('--queue-bytes', type=int, default=DEFAULT_QUEUE_BYTES,
+                        help=f'Max bytes queued per client before the slow policy applies (default: {DEFAULT_QUEUE_BYTES})')
+    parser.add_argument('--slow-policy', choices=SLOW_CLIENT_POLICIES + tuple(POLICY_ALIASES), default=POLICY_DISCONNECT,
+                        help='What to do with clients that fall behind (default: disconnect)')
+    parser.add_argument('--history', type=int, default=DEFAULT_HISTORY_MESSAGES,
+                        help=f'Recent room messages kept for members that rejoin (default: {DEFAULT_HISTORY_MESSAGES}, 0 disables)')
+    parser.add_argument('--history-bytes', type=int, default=DEFAULT_HISTORY_BYTES,
+                        help=f'Max bytes of kept room messages (default: {DEFAULT_HISTORY_BYTES})')
+    parser.add_argument('--log', metavar='DIR',
+                        help='Keep the room history on disk in DIR, so it survives restarts')
+    parser.add_argument('--stats', action='store_true', help='Show server fan-out counters')
+    parser.add_argument('--opaque', action='store_true',
+                        help='Relay members\' encrypted frames as is instead of decrypting and re-encrypting them')
+    parser.add_argument('--peer', action='append', metavar='HOST:PORT',
+                        help='Share the room with the node at HOST:PORT (repeatable)')
+    parser.add_argument('--node', help='Name of this node in a room mesh (default: hostname:port)')
+    parser.add_argument('--relay', metavar='HOST:PORT',
+                        help='Run an edge gateway on --port that carries local clients to the room server at HOST:PORT')
+    parser.add_argument('--rooms', metavar='FILE',
+                        help='Host every room listed in FILE ({"name": {"key1", "key2", "key3", "creator"}}) on one port')
+    parser.add_argument('--room', help='Room to join on a server started with --rooms')
+    parser.add_argument('--agent', action='store_true',
+                        help='Keep one room connection open and relay --send through it')
+    parser.add_argument('--send-batch', metavar='FILE',
+                        help='Send JSON-lines messages ({"message": ..., "to": ...}) from FILE, or - for stdin')
     
     # Steganography options (simplified)
     parser.add_argument('--stealthimage', help='Hide message in image')
@@ -724,6 +1407,16 @@ def main():
         
         return  # Exit after handling steganography commands
     
+    server_options = {'queue_size': args.queue_size, 'queue_bytes': args.queue_bytes,
+                      'slow_policy': args.slow_policy, 'opaque': args.opaque,
+                      'history': args.history, 'history_bytes': args.history_bytes, 'log_dir': args.log}
+    if args.enable and args.rooms:
+        run_rooms(args, server_options)
+        return
+    if args.relay:
+        run_gateway(args, server_options)
+        return
+    
     saved_port, saved_key, saved_alias, saved_creator = load_config()
     
     # Generate encryption key from the three keys if provided
@@ -742,7 +1435,7 @@ def main():
         if args.enable:
             print("[ERROR] --key1, --key2, --key3 required to start server")
             return
-        elif args.send or args.list_all:
+        elif args.send or args.send_batch or args.list_all or args.stats or args.agent:
             print("[ERROR] No saved connection. Please start server first or provide keys.")
             return
         else:
@@ -755,7 +1448,25 @@ def main():
             return
         
         creator = args.create_user or "server-admin"
-        server = GhostwireServer(args.port, key, args.alias, creator)
+        if args.workers > 1:
+            if args.use_async or args.peer or args.node:
+                print("[ERROR] --workers cannot be combined with --async or --peer")
+                return
+            from ghostwire_workers import run_workers
+            run_workers(args.port, key, args.alias, creator, args.workers, **server_options)
+            return
+        if args.peer or args.node:
+            if args.use_async:
+                print("[ERROR] --peer cannot be combined with --async")
+                return
+            from ghostwire_federation import FederatedServer
+            server = FederatedServer(args.port, key, args.alias, creator, args.node, args.peer or (),
+                                     **server_options)
+        elif args.use_async:
+            from ghostwire_async import AsyncGhostwireServer
+            server = AsyncGhostwireServer(args.port, key, args.alias, creator, **server_options)
+        else:
+            server = GhostwireServer(args.port, key, args.alias, creator, **server_options)
         
         # Set up signal handler for graceful shutdown
         def signal_handler(sig, frame):
@@ -774,9 +1485,9 @@ def main():
     elif args.create_user:
         # Create user in room (quick connect and disconnect)
         username = args.create_user
-        create_user_in_room(args.host, args.port, key, username)
+        create_user_in_room(args.host, args.port, key, username, args.room)
     
-    elif args.send:
+    elif args.send or args.send_batch or args.agent:
         # Use saved user config from --create-user
         saved_config = get_saved_user_config()
         
@@ -786,25 +1497,31 @@ def main():
             host = saved_config['host']
             port = saved_config['port']
             key = base64.b64decode(saved_config['key'].encode('utf-8'))
-            
-            if args.all:
-                send_message(host, port, key, username, args.send)
-            elif args.to:
-                send_message(host, port, key, username, args.send, args.to)
-            else:
-                print("[ERROR] Please specify --all or --to username")
+            room = args.room or saved_config.get('room')
         else:
             # Fallback to manual specification
             username = args.user or "anonymous"
-            if args.all:
-                send_message(args.host, args.port, key, username, args.send)
-            elif args.to:
-                send_message(args.host, args.port, key, username, args.send, args.to)
-            else:
-                print("[ERROR] Please specify --all or --to username")
+            host = args.host
+            port = args.port
+            room = args.room
+        
+        if args.send_batch:
+            send_batch(host, port, key, username, args.send_batch, room=room)
+        elif args.agent:
+            from ghostwire_agent import GhostwireAgent
+            agent = GhostwireAgent(host, port, key, username, room)
+            signal.signal(signal.SIGTERM, lambda sig, frame: agent.stop())
+            agent.start()
+        elif args.all or args.to:
+            send_message(host, port, key, username, args.send, None if args.all else args.to, room=room)
+        else:
+            print("[ERROR] Please specify --all or --to username")
     
     elif args.list_all:
-        list_users(args.host, args.port, key)
+        list_users(args.host, args.port, key, args.room)
+    
+    elif args.stats:
+        show_stats(args.host, args.port, key, args.room)
     
     else:
         # Show usage
@@ -812,14 +1529,29 @@ def main():
         print("")
         print("To start a server:")
         print("  ghostwire --enable --key1 <k1> --key2 <k2> --key3 <k3> --alias <room-name> --create-user <your-username>")
+        print("  ghostwire --enable ... --async   (single event loop, for very large rooms)")
+        print("  ghostwire --enable ... --opaque  (forward encrypted messages without decrypting them)")
+        print("  ghostwire --enable ... --workers 4   (one process per core, sharing the port)")
+        print("  ghostwire --enable ... --peer other-node:2222   (share the room with another server)")
+        print("  ghostwire --relay room-host:2222 --port 2222   (edge gateway: one upstream link for all local clients)")
+        print("  ghostwire --enable --rooms rooms.json   (many rooms on one port, pick one with --room)")
         print("")
         print("To send messages:")
         print("  ghostwire --send 'message' --user <username> --all")
         print("  ghostwire --send 'message' --user <username> --to <target-user>")
         print("")
+        print("To send many messages over one connection (JSON lines, optional \"to\"):")
+        print("  ghostwire --send-batch messages.jsonl   (or - for stdin)")
+        print("")
+        print("To keep one connection open for fast repeated sends:")
+        print("  ghostwire --agent   (then --send reuses it automatically)")
+        print("")
         print("To list users:")
         print("  ghostwire --list-all")
         print("")
+        print("To see fan-out counters (queued, dropped, evicted):")
+        print("  ghostwire --stats")
+        print("")
         print("NOTE: --user is optional for sending messages (defaults to 'anonymous')")
 
 if __name__ == "__main__":
@@ -7,16 +7,46 @@ Implements LSB (Least Significant Bit) steganography for hiding messages in imag
 import argparse
 import os
 import sys
+import io
+import contextlib
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import PIL
 from PIL import Image
 import base64
 import json
+import struct
+import zlib
+import numpy as np
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 from Crypto.Random import get_random_bytes
 
+# Default cap on the pixel data worked on at once, beyond the one copy of an image that hiding has to save
+MEMORY_BUDGET = 64 * 1024 * 1024
+# Working memory per pixel of a strip: PIL's 4-byte pixel, its RGB array and the array of LSBs
+STRIP_BYTES_PER_PIXEL = 10
+# Pillow releases whose PNG and raw decoders were checked to stop after the
+# rows limit_rows asks for (see test_stego.py); any other release gets
+# whole-image decoding until that test passes against it
+PARTIAL_DECODE_PILLOW = ((9, 0), (13, 0))
+
+# v2 container at the start of the LSB stream: magic, version, flags, payload length, CRC-32 of the payload.
+# v1 images hold the text itself, one byte per character, up to END_MARKER.
+CONTAINER = struct.Struct('!4sBBII')
+MAGIC = b'GWST'
+VERSION = 2
+FLAG_ENCRYPTED = 0x01
+END_MARKER = b"<<<GHOSTWIRE_END>>>"
+
+# Files a batch picks up from a directory
+IMAGE_EXTENSIONS = {'.png', '.bmp', '.tif', '.tiff', '.ppm', '.gif', '.webp', '.jpg', '.jpeg'}
+
 class GhostwireSteganography:
-    def __init__(self, key1=None, key2=None, key3=None):
-        """Initialize with optional encryption keys"""
+    def __init__(self, key1=None, key2=None, key3=None, memory_budget=MEMORY_BUDGET):
+        """Initialize with optional encryption keys and a cap on working memory in bytes"""
+        self.memory_budget = memory_budget
         self.encryption_key = None
         if key1 and key2 and key3:
             # Combine three keys for encryption
@@ -36,18 +66,23 @@ class GhostwireSteganography:
                 message += chr(int(byte, 2))
         return message
     
+    def encrypt_bytes(self, data):
+        """IV followed by the AES-CBC encryption of data"""
+        cipher = AES.new(self.encryption_key, AES.MODE_CBC)
+        return cipher.iv + cipher.encrypt(pad(data, AES.block_size))
+    
+    def decrypt_bytes(self, data):
+        """Reverse encrypt_bytes(); ValueError if the keys do not match"""
+        cipher = AES.new(self.encryption_key, AES.MODE_CBC, data[:16])
+        return unpad(cipher.decrypt(data[16:]), AES.block_size)
+    
     def encrypt_message(self, message):
         """Encrypt message using AES if keys are provided"""
         if not self.encryption_key:
             return message
         
         try:
-            cipher = AES.new(self.encryption_key, AES.MODE_CBC)
-            padded_message = pad(message.encode(), AES.block_size)
-            encrypted = cipher.encrypt(padded_message)
-            
-            # Combine IV and encrypted data
-            result = base64.b64encode(cipher.iv + encrypted).decode('utf-8')
+            result = base64.b64encode(self.encrypt_bytes(message.encode())).decode('utf-8')
             return f"ENCRYPTED:{result}"
         except Exception as e:
             print(f"Encryption failed: {e}")
@@ -60,14 +95,7 @@ class GhostwireSteganography:
         
         try:
             encrypted_data = encrypted_message[10:]  # Remove "ENCRYPTED:" prefix
-            data = base64.b64decode(encrypted_data)
-            
-            iv = data[:16]  # First 16 bytes are IV
-            encrypted = data[16:]  # Rest is encrypted message
-            
-            cipher = AES.new(self.encryption_key, AES.MODE_CBC, iv)
-            decrypted = unpad(cipher.decrypt(encrypted), AES.block_size)
-            return decrypted.decode('utf-8')
+            return self.decrypt_bytes(base64.b64decode(encrypted_data)).decode('utf-8')
         except Exception as e:
             print(f"Decryption failed: {e}")
             return encrypted_message
@@ -77,99 +105,182 @@ class GhostwireSteganography:
         try:
             # Load image
             img = Image.open(image_path)
-            img = img.convert('RGB')  # Ensure RGB mode
+            if img.mode != 'RGB':
+                img = img.convert('RGB')  # Ensure RGB mode
             
             # Encrypt message if keys are provided and encryption is enabled
+            payload = message.encode('utf-8')
+            flags = 0
             if encrypt and self.encryption_key:
-                message = self.encrypt_message(message)
-            
-            # Add delimiter to mark end of message
-            message += "<<<GHOSTWIRE_END>>>"
+                payload = self.encrypt_bytes(payload)
+                flags |= FLAG_ENCRYPTED
             
-            # Convert message to binary
-            binary_message = self.string_to_binary(message)
+            # Container header first, so readers know what follows and how long it is
+            data = CONTAINER.pack(MAGIC, VERSION, flags, len(payload), zlib.crc32(payload)) + payload
             
             # Get image dimensions
             width, height = img.size
             total_pixels = width * height
             
             # Check if image is large enough
-            if len(binary_message) > total_pixels * 3:  # 3 channels (RGB)
+            if len(data) * 8 > total_pixels * 3:  # 3 channels (RGB)
                 raise ValueError("Image too small to hide the message")
             
-            # Convert image to list of pixels
-            pixels = list(img.getdata())
-            
-            # Hide message in LSB of each color channel
-            binary_index = 0
-            modified_pixels = []
+            # Channel values of the rows the message needs, in pixel order (R, G, B, R, ...), a strip at a time
+            rows = self.strip_rows(width)
+            for top in range(0, height, rows):
+                start = top * width * 3 // 8
+                if start >= len(data):
+                    break
+                bits = np.unpackbits(np.frombuffer(data[start:start + rows * width * 3 // 8], dtype=np.uint8))
+                strip = np.array(img.crop((0, top, width, top + min(rows, -(-len(bits) // (width * 3))))))
+                channels = strip.reshape(-1)[:len(bits)]
+                channels &= 0xFE
+                channels |= bits
+                img.paste(Image.fromarray(strip), (0, top))
             
-            for pixel in pixels:
-                if binary_index < len(binary_message):
-                    # Get RGB values
-                    r, g, b = pixel
-                    
-                    # Modify LSB of red channel
-                    if binary_index < len(binary_message):
-                        r = (r & 0xFE) | int(binary_message[binary_index])
-                        binary_index += 1
-                    
-                    # Modify LSB of green channel
-                    if binary_index < len(binary_message):
-                        g = (g & 0xFE) | int(binary_message[binary_index])
-                        binary_index += 1
-                    
-                    # Modify LSB of blue channel
-                    if binary_index < len(binary_message):
-                        b = (b & 0xFE) | int(binary_message[binary_index])
-                        binary_index += 1
-                    
-                    modified_pixels.append((r, g, b))
-                else:
-                    modified_pixels.append(pixel)
-            
-            # Create new image with modified pixels
-            new_img = Image.new('RGB', (width, height))
-            new_img.putdata(modified_pixels)
-            
-            # Save the image
-            new_img.save(output_path)
+            # Save the image, like a new one: no metadata carried over from the source
+            img.info = {}
+            img.save(output_path)
             
             return True, f"Message successfully hidden in {output_path}"
             
         except Exception as e:
             return False, f"Error hiding message: {str(e)}"
     
+    def strip_rows(self, width):
+        """Rows of a strip that fits the memory budget; a multiple of 8, so it packs into whole bytes"""
+        rows = self.memory_budget // (width * STRIP_BYTES_PER_PIXEL)
+        return max(rows - rows % 8, 8)
+    
+    def limit_rows(self, img, rows):
+        """Make a not yet loaded image decode only its first rows rows; False if its format can't.
+        
+        PNG (not interlaced) and raw TIFF, PPM and similar files store rows top to
+        bottom in one stream, so decoding can stop early. Other images load whole.
+        Pillow has no public way to decode part of a file, so this rewrites
+        the image's tile and private size: only on PARTIAL_DECODE_PILLOW
+        releases, and open_rows checks the result.
+        """
+        version = tuple(int(part) for part in PIL.__version__.split('.')[:2] if part.isdigit())
+        if not PARTIAL_DECODE_PILLOW[0] <= version < PARTIAL_DECODE_PILLOW[1]:
+            return False
+        width, height = img.size
+        if rows >= height or len(img.tile) != 1 or img.info.get('interlace'):
+            return False
+        codec, extents, offset, args = img.tile[0]
+        ystep = args[2] if isinstance(args, tuple) and len(args) > 2 else 1  # -1 for bottom-up BMP
+        if tuple(extents) != (0, 0, width, height) or not (codec == 'zip' or codec == 'raw' and ystep == 1):
+            return False
+        img.tile = [(codec, (0, 0, width, rows), offset, args)]
+        img._size = (width, rows)
+        return True
+    
+    def open_rows(self, image_path, rows=None):
+        """The image, decoded only down to row rows where possible, otherwise whole.
+        
+        Any failure of the partial decode, or a result of the wrong size,
+        falls back to opening and decoding the whole file.
+        """
+        if rows is not None:
+            img = Image.open(image_path)
+            try:
+                if self.limit_rows(img, rows):
+                    img.load()
+                    if img.size[1] == rows and img.im.size == img.size:
+                        return img
+            except Exception:
+                pass
+        img = Image.open(image_path)
+        img.load()
+        return img
+    
+    def lsb_chunks(self, image_path):
+        """Bytes packed from the image's LSBs, in order, a row strip at a time.
+        
+        Strips start small and double up to what the memory budget allows,
+        so a short message near the top of a large image is read without
+        unpacking the rest of it. Where the format allows, only the rows
+        read so far are decoded, again from the top each time twice as
+        many are needed, until that would no longer fit the budget. Each
+        strip is a multiple of 8 rows, so every strip packs into whole
+        bytes; bits after the last whole byte of the image are dropped.
+        """
+        width, height = Image.open(image_path).size
+        most = self.strip_rows(width)
+        decoded, top, rows = None, 0, 8
+        while top < height:
+            bottom = min(top + rows, height)
+            if decoded is None or decoded.size[1] < bottom:
+                prefix = max(bottom, 2 * top)
+                decoded = self.open_rows(image_path, prefix if prefix * width * 4 <= self.memory_budget else None)
+            strip = decoded.crop((0, top, width, bottom))
+            if strip.mode != 'RGB':
+                strip = strip.convert('RGB')
+            bits = np.asarray(strip).reshape(-1) & 1
+            yield np.packbits(bits[:len(bits) - len(bits) % 8]).tobytes()
+            top = bottom
+            rows = min(rows * 2, most)
+    
+    def read_container(self, image_path):
+        """(version, flags, payload) hidden in the image, or None if it holds no message.
+        
+        Reads only as many LSBs as the message needs: the header of a v2
+        container gives its length, and a v1 message ends at END_MARKER.
+        A v1 message is text, so a NUL byte before the marker means the
+        image holds no message at all. ValueError if the message is damaged.
+        """
+        chunks = self.lsb_chunks(image_path)
+        data = bytearray()
+        for chunk in chunks:
+            data += chunk
+            if len(data) >= CONTAINER.size:
+                break
+        
+        if data.startswith(MAGIC):
+            if len(data) < CONTAINER.size:
+                raise ValueError("message header cut short")
+            _, version, flags, length, crc = CONTAINER.unpack_from(data)
+            if version != VERSION:
+                raise ValueError(f"unsupported container version {version}")
+            end = CONTAINER.size + length
+            while len(data) < end:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                data += chunk
+            payload = bytes(data[CONTAINER.size:end])
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                raise ValueError("message corrupted (checksum mismatch)")
+            return version, flags, payload
+        
+        start = 0
+        while True:
+            end = data.find(END_MARKER, start)
+            if end >= 0:
+                return 1, 0, bytes(data[:end])
+            if data.find(0, start) >= 0:
+                return None
+            start = max(len(data) - len(END_MARKER) + 1, 0)  # The marker may straddle two chunks
+            chunk = next(chunks, None)
+            if chunk is None:
+                return None
+            data += chunk
+    
     def extract_message_from_image(self, image_path, decrypt=True):
         """Extract hidden message from image"""
         try:
-            # Load image
-            img = Image.open(image_path)
-            img = img.convert('RGB')
-            
-            # Get all pixels
-            pixels = list(img.getdata())
-            
-            # Extract binary message from LSB
-            binary_message = ""
-            
-            for pixel in pixels:
-                r, g, b = pixel
-                
-                # Extract LSB from each channel
-                binary_message += str(r & 1)
-                binary_message += str(g & 1)
-                binary_message += str(b & 1)
-            
-            # Convert binary to string
-            message = self.binary_to_string(binary_message)
-            
-            # Find the end delimiter
-            end_marker = "<<<GHOSTWIRE_END>>>"
-            if end_marker in message:
-                message = message[:message.find(end_marker)]
-            else:
+            found = self.read_container(image_path)
+            if found is None:
                 return False, "No hidden message found or message corrupted"
+            version, flags, payload = found
+            if flags & FLAG_ENCRYPTED:
+                # Shown and decrypted like a v1 encrypted message
+                message = "ENCRYPTED:" + base64.b64encode(payload).decode('ascii')
+            elif version == 1:
+                message = payload.decode('latin-1')  # One character per byte, as chr() gave
+            else:
+                message = payload.decode('utf-8')
             
             # Decrypt message if it's encrypted and we have keys
             if decrypt and self.encryption_key:
@@ -186,12 +297,118 @@ class GhostwireSteganography:
             img = Image.open(image_path)
             width, height = img.size
             total_pixels = width * height
-            # 3 bits per pixel (RGB), 8 bits per character
-            max_chars = (total_pixels * 3) // 8
-            return max_chars
+            # 3 bits per pixel (RGB), 8 bits per byte of UTF-8 text, less the container header
+            max_chars = (total_pixels * 3) // 8 - CONTAINER.size
+            return max(max_chars, 0)
         except Exception as e:
             return 0
 
+def batch_jobs(source, message=None, output_dir=None):
+    """[(image, message, output)] for every image of a directory or a JSON-lines manifest.
+    
+    Manifest lines look like {"image": "a.jpg", "message": "...", "output": "b.png"};
+    message and output fall back to the given ones. Without an output path,
+    hidden images go to output_dir as PNG, which keeps the LSBs intact.
+    The whole source is read first: ValueError for an invalid manifest line,
+    for two images that would be written to the same output (a.jpg and
+    a.png both becoming a.png), or for an output that is one of the input
+    images (output_dir set to the source directory), before any image is
+    touched.
+    """
+    def output_for(image):
+        return output_dir and os.path.join(output_dir, os.path.splitext(os.path.basename(image))[0] + '.png')
+    
+    jobs = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                image = os.path.join(source, name)
+                jobs.append((image, message, output_for(image)))
+    else:
+        with open(source, 'r') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    image = entry['image']
+                except (ValueError, KeyError, TypeError):
+                    raise ValueError(f"invalid manifest line {line_number}")
+                jobs.append((image, entry.get('message', message), entry.get('output') or output_for(image)))
+    
+    def resolved(path):
+        return os.path.normcase(os.path.realpath(path))
+    
+    inputs = {resolved(image): image for image, _, _ in jobs}
+    written = {}
+    for image, _, output in jobs:
+        if not output:
+            continue
+        path = resolved(output)
+        if path in inputs:
+            raise ValueError(f"{image} would be written over the input image {inputs[path]}")
+        if path in written:
+            raise ValueError(f"{written[path]} and {image} would both be written to {output}")
+        written[path] = image
+    return jobs
+
+def run_batch_job(job):
+    """Hide in or extract from one image of a batch, in a worker process; the result as a dict"""
+    mode, keys, encrypt, memory_budget, (image, message, output) = job
+    stego = GhostwireSteganography(*keys, memory_budget=memory_budget)
+    result = {'image': image}
+    try:
+        result['bytes'] = os.path.getsize(image)
+    except OSError as e:
+        result.update(ok=False, error=f"Image file not found: {e.strerror}")
+        return result
+    # Decryption reports wrong keys with print(); keep it out of the JSON lines
+    with contextlib.redirect_stdout(io.StringIO()) as printed:
+        if mode == 'hide':
+            if not message or not output:
+                success, text = False, "message and output are required"
+            else:
+                success, text = stego.hide_message_in_image(image, message, output, encrypt)
+                text = output if success else text
+        else:
+            success, text = stego.extract_message_from_image(image, encrypt)
+    result['ok'] = success
+    result[('output' if mode == 'hide' else 'message') if success else 'error'] = text
+    if printed.getvalue():
+        result['note'] = printed.getvalue().strip()
+    return result
+
+def run_batch(mode, jobs, keys=(None, None, None), encrypt=True, memory_budget=MEMORY_BUDGET, workers=None,
+              out=sys.stdout):
+    """Hide ('hide') or extract ('extract') for every job over a process pool.
+    
+    Writes one JSON line per image to out as each finishes, so results
+    stream in completion order. jobs is normally the list from batch_jobs,
+    read and checked in full before this starts; only a few jobs per
+    worker are handed to the pool at a time, so it never holds more.
+    Returns (images, failed, image bytes read, seconds).
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = iter(jobs)
+    images = failed = total_bytes = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        while True:
+            for job in itertools.islice(jobs, workers * 4 - len(pending)):
+                pending.add(executor.submit(run_batch_job, (mode, keys, encrypt, memory_budget, job)))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                images += 1
+                failed += not result['ok']
+                total_bytes += result.get('bytes', 0)
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            out.flush()
+    return images, failed, total_bytes, time.perf_counter() - started
+
 def main():
     parser = argparse.ArgumentParser(description='Ghostwire Steganography - Hide/Extract messages in images')
     
@@ -203,6 +420,11 @@ def main():
                       help='Extract message from image (specify image path)')
     group.add_argument('--stealth-capacity', metavar='IMAGE_PATH',
                       help='Check how many characters can be hidden in image')
+    group.add_argument('--stealth-batch', metavar='DIR_OR_MANIFEST',
+                      help='Hide --message in every image of a directory (into --output DIR), '
+                           'or per a JSON-lines manifest')
+    group.add_argument('--extract-batch', metavar='DIR_OR_MANIFEST',
+                      help='Extract from every image of a directory or JSON-lines manifest')
     
     # Message and output (for hiding)
     parser.add_argument('--message', help='Message to hide in image')
@@ -216,6 +438,9 @@ def main():
     # Options
     parser.add_argument('--no-encrypt', action='store_true',
                        help='Don\'t encrypt the message (not recommended)')
+    parser.add_argument('--workers', type=int, help='Processes for --stealth-batch/--extract-batch (default: one per core)')
+    parser.add_argument('--memory-budget', type=int, default=MEMORY_BUDGET // (1024 * 1024), metavar='MB',
+                       help='Cap on pixel data worked on at once, in MB (default: %(default)s)')
     
     # Network options (for future integration)
     parser.add_argument('--all', action='store_true', help='Send to all users (future feature)')
@@ -225,7 +450,7 @@ def main():
     args = parser.parse_args()
     
     # Initialize steganography with encryption keys
-    stego = GhostwireSteganography(args.key1, args.key2, args.key3)
+    stego = GhostwireSteganography(args.key1, args.key2, args.key3, args.memory_budget * 1024 * 1024)
     
     if args.stealth_image:
         # Hide message in image
@@ -276,6 +501,34 @@ def main():
             print(f"❌ {result}")
             sys.exit(1)
     
+    elif args.stealth_batch or args.extract_batch:
+        # Hide or extract across many images; JSON lines on stdout, the summary on stderr
+        source = args.stealth_batch or args.extract_batch
+        if not os.path.exists(source):
+            print(f"Error: {source} not found")
+            sys.exit(1)
+        if args.stealth_batch and os.path.isdir(source) and not (args.output and args.message):
+            # A manifest may name every output and message itself
+            print("Error: --output DIR and --message are required when hiding in a directory of images")
+            sys.exit(1)
+        if args.stealth_batch and args.output:
+            os.makedirs(args.output, exist_ok=True)
+        
+        mode = 'hide' if args.stealth_batch else 'extract'
+        try:
+            images, failed, total_bytes, elapsed = run_batch(
+                mode, batch_jobs(source, args.message, args.output), (args.key1, args.key2, args.key3),
+                not args.no_encrypt, args.memory_budget * 1024 * 1024, args.workers)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        elapsed = max(elapsed, 1e-9)
+        print(f"📊 {images} images ({total_bytes / 1024 / 1024:.1f} MB) in {elapsed:.2f}s - "
+              f"{images / elapsed:.1f} images/sec, {total_bytes / 1024 / 1024 / elapsed:.1f} MB/sec, "
+              f"{failed} failed", file=sys.stderr)
+        if failed:
+            sys.exit(1)
+    
     elif args.stealth_capacity:
         # Check image capacity
         if not os.path.exists(args.stealth_capacity):
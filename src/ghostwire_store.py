@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# ghostwire_store.py - Users of the rooms, kept in SQLite and written as they change
+
+import json
+import os
+import sqlite3
+import threading
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS users (room TEXT NOT NULL, username TEXT NOT NULL, info TEXT NOT NULL, "
+    "PRIMARY KEY (room, username)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS rooms (room TEXT PRIMARY KEY, creator TEXT)",
+)
+
+class UserStore:
+    """Users of one or more rooms in an SQLite database in WAL mode.
+
+    Each change is one small transaction appended to the write-ahead log,
+    so a crash loses at most the users that joined in the last moment
+    and nothing is rewritten as the table grows; checkpoint() folds the
+    log back into the database. Rooms share a file and are told apart by
+    name ('' for a server that hosts a single room). One connection is
+    shared by the server's threads; processes (--workers) open their own.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # WAL keeps the file consistent through crashes
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+
+    def load(self, room=''):
+        """username -> info of every user of a room"""
+        with self.lock:
+            # One JSON document built by SQLite parses far faster than a json.loads per row
+            users, = self.connection.execute("SELECT json_group_object(username, json(info)) FROM users "
+                                             "WHERE room = ?", (room,)).fetchone()
+        return json.loads(users)
+
+    def add(self, username, info, room=''):
+        """Record a user unless the room already has one by that name"""
+        with self.lock:
+            self.connection.execute("INSERT OR IGNORE INTO users VALUES (?, ?, ?)",
+                                    (room, username, json.dumps(info)))
+
+    def put(self, username, info, room=''):
+        """Record a user, replacing what was stored for it"""
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO users VALUES (?, ?, ?)",
+                                    (room, username, json.dumps(info)))
+
+    def set_creator(self, creator, room=''):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO rooms VALUES (?, ?)", (room, creator))
+
+    def import_json(self, path, rooms=False):
+        """Move users from an old JSON data file into the store, once.
+
+        The file is {"users": {...}, "creator": ...} for a single room, or
+        {"rooms": {name: {"users": ..., "creator": ...}}} with rooms=True.
+        It is renamed to *.migrated afterwards so it is not read again.
+        """
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        saved = data.get('rooms', {}) if rooms else {'': data}
+        users = [(room, username, json.dumps(info))
+                 for room, room_data in saved.items() for username, info in room_data.get('users', {}).items()]
+        creators = [(room, room_data['creator']) for room, room_data in saved.items() if room_data.get('creator')]
+        with self.lock:
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?)", users)
+                self.connection.executemany("INSERT OR IGNORE INTO rooms VALUES (?, ?)", creators)
+        try:
+            os.replace(path, path + '.migrated')
+        except OSError:
+            pass
+        return len(users)
+
+    def checkpoint(self):
+        """Fold the write-ahead log into the database file and shrink it"""
+        with self.lock:
+            try:
+                self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.OperationalError:
+                pass  # Another process is using the database; its checkpoint will do
+
+    def close(self):
+        self.checkpoint()
+        with self.lock:
+            self.connection.close()
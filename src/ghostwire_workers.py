@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# ghostwire_workers.py - Pre-forked SO_REUSEPORT workers serving one room
+
+import os
+import sys
+import struct
+import socket
+import signal
+import threading
+import multiprocessing
+from collections import Counter
+
+from ghostwire_protocol import HEADER, MAX_FRAME_SIZE, FrameReader, ProtocolError, parse_relay_header
+from ghostwire_fanout import POLICY_DISCONNECT, OutboundQueue, ClientWriter
+from ghostwire_crypto import get_codec
+from ghostwire_ring import DEFAULT_RING_BYTES, SharedRing, create_doorbells
+from ghostwire_simple import GhostwireServer
+
+# Frames exchanged between workers on the bus
+BUS_JOIN = 1       # Username of a member that joined on the sending worker
+BUS_LEAVE = 2      # Username of a member that left it
+BUS_BROADCAST = 3  # Text for every member, plus the frames already encrypted per suite
+BUS_PRIVATE = 4    # Target username, newline, text
+BUS_RELAY = 5      # Cipher suite, newline, relay payload as the member sent it
+
+# Bus frames carry whole client messages plus a little routing
+BUS_MAX_FRAME = 2 * MAX_FRAME_SIZE
+BUS_QUEUE_FRAMES = 65536
+BUS_QUEUE_BYTES = 64 * 1024 * 1024
+LISTEN_BACKLOG = 1024
+RING_IDLE_WAIT = 0.05  # Longest a ring reader sleeps without being rung
+
+# Broadcast body: text length and text, frame count, then per frame the
+# suite name and the encoded frame
+TEXT_SIZE = struct.Struct('!I')
+SUITE_SIZE = struct.Struct('!B')
+
+def bus_frame(kind, payload):
+    return HEADER.pack(len(payload), kind) + payload
+
+def pack_broadcast(message, frames):
+    """Bus body for a broadcast: the text and every frame encoded for it so far"""
+    text = message.encode('utf-8')
+    parts = [TEXT_SIZE.pack(len(text)), text, SUITE_SIZE.pack(len(frames))]
+    for suite, frame in frames.items():
+        suite = suite.encode('ascii')
+        parts += [SUITE_SIZE.pack(len(suite)), suite, TEXT_SIZE.pack(len(frame)), frame]
+    return b"".join(parts)
+
+def unpack_broadcast(body):
+    """(text, {suite: frame}) of a broadcast bus body"""
+    size, = TEXT_SIZE.unpack_from(body)
+    offset = TEXT_SIZE.size + size
+    message = body[TEXT_SIZE.size:offset].decode('utf-8')
+    count, = SUITE_SIZE.unpack_from(body, offset)
+    offset += SUITE_SIZE.size
+    frames = {}
+    for _ in range(count):
+        size, = SUITE_SIZE.unpack_from(body, offset)
+        suite = body[offset + SUITE_SIZE.size:offset + SUITE_SIZE.size + size].decode('ascii')
+        offset += SUITE_SIZE.size + size
+        size, = TEXT_SIZE.unpack_from(body, offset)
+        frames[suite] = body[offset + TEXT_SIZE.size:offset + TEXT_SIZE.size + size]
+        offset += TEXT_SIZE.size + size
+    return message, frames
+
+def create_bus(workers):
+    """One Unix socketpair per pair of workers: {(a, b): (socket of a, socket of b)}"""
+    return {(a, b): socket.socketpair()
+            for a in range(workers) for b in range(a + 1, workers)}
+
+def bus_endpoints(bus, worker_id):
+    """Keep this worker's ends of the bus ({peer id: socket}) and close the rest"""
+    peers = {}
+    for (a, b), (socket_a, socket_b) in bus.items():
+        if a == worker_id:
+            peers[b] = socket_a
+            socket_b.close()
+        elif b == worker_id:
+            peers[a] = socket_b
+            socket_a.close()
+        else:
+            socket_a.close()
+            socket_b.close()
+    return peers
+
+class WorkerServer(GhostwireServer):
+    """GhostwireServer running as one of several processes on the same port.
+
+    Every worker accepts on its own SO_REUSEPORT socket, so the kernel
+    spreads new connections over the processes (and so over cores).
+    Workers are connected pairwise by socketpairs; joins and leaves,
+    room broadcasts, private messages and relay frames are published on
+    that bus and each worker delivers them to its own members. Bus
+    writes go through the same bounded queues and writer threads as
+    client writes, so publishing never blocks a member's thread.
+
+    With rings (one SharedRing per worker, written only by its owner)
+    the room fan-out skips the sockets: a broadcast or relay frame is
+    written once into shared memory, already encrypted for the suites
+    in use, and every other worker copies it out once for all of its
+    members. Membership and private messages stay on the socket bus.
+    """
+
+    def __init__(self, port, key, alias, creator_username, worker_id, peers, rings=None,
+                 doorbells=None, **options):
+        super().__init__(port, key, alias, creator_username, **options)
+        self.worker_id = worker_id
+        self.workers = len(peers) + 1
+        self.bus_sockets = peers  # worker id -> socket to that worker
+        self.peers = {}           # worker id -> outbound bus queue
+        self.remote_members = {peer_id: Counter() for peer_id in peers}  # username -> sessions
+        self.members_lock = threading.Lock()
+        self.rings = rings            # worker id -> SharedRing that worker publishes on
+        self.doorbells = doorbells    # worker id -> Doorbell that wakes that worker
+        self.ring_readers = {}
+        self.ring_stop = threading.Event()
+
+    def create_listener(self):
+        """Listen on the room port alongside the other workers"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server_socket.bind(('0.0.0.0', self.port))
+        server_socket.listen(LISTEN_BACKLOG)
+        return server_socket
+
+    def connect_bus(self):
+        """Start a bus writer and reader for every other worker"""
+        for peer_id, bus_socket in self.bus_sockets.items():
+            outbox = OutboundQueue(BUS_QUEUE_FRAMES, BUS_QUEUE_BYTES, POLICY_DISCONNECT)
+            ClientWriter(bus_socket, outbox, on_error=lambda _, peer_id=peer_id: self.drop_peer(peer_id)).start()
+            self.peers[peer_id] = outbox
+            reader = threading.Thread(target=self.read_bus, args=(peer_id, bus_socket))
+            reader.daemon = True
+            reader.start()
+        if self.rings:
+            self.ring_readers = {peer_id: self.rings[peer_id].reader() for peer_id in self.bus_sockets}
+            tail = threading.Thread(target=self.tail_rings)
+            tail.daemon = True
+            tail.start()
+
+    def publish(self, kind, payload):
+        """Queue a bus frame for every other worker"""
+        frame = bus_frame(kind, payload)
+        for peer_id, outbox in list(self.peers.items()):
+            if not outbox.put(frame):
+                self.drop_peer(peer_id)
+
+    def publish_fanout(self, kind, payload):
+        """Put a room-wide frame on this worker's ring, or on the bus if it does not fit"""
+        if not self.rings or not self.rings[self.worker_id].publish(bytes([kind]) + payload):
+            self.publish(kind, payload)
+            return
+        for peer_id in self.ring_readers:
+            self.doorbells[peer_id].ring()
+
+    def tail_rings(self):
+        """Deliver what the other workers publish on their rings"""
+        doorbell = self.doorbells[self.worker_id]
+        pending = lambda: any(reader.pending() for reader in self.ring_readers.values())
+        while not self.ring_stop.is_set():
+            delivered = False
+            for peer_id, reader in self.ring_readers.items():
+                for record in reader.read():
+                    delivered = True
+                    try:
+                        self.handle_bus(peer_id, record[0], record[1:])
+                    except Exception as e:
+                        print(f"[ERROR] Ring record from worker {peer_id}: {e}")
+            if not delivered:
+                doorbell.wait(RING_IDLE_WAIT, pending)
+
+    def drop_peer(self, peer_id):
+        """Forget a worker whose bus connection failed, and its members"""
+        outbox = self.peers.pop(peer_id, None)
+        if outbox is None:
+            return
+        outbox.close(discard=True)
+        with self.members_lock:
+            self.remote_members[peer_id].clear()
+        try:
+            self.bus_sockets[peer_id].close()
+        except OSError:
+            pass
+        if self.running:
+            print(f"[WARN] Lost bus connection to worker {peer_id}")
+
+    def read_bus(self, peer_id, bus_socket):
+        """Apply what another worker publishes until its connection closes"""
+        try:
+            for kind, payload in FrameReader(bus_socket, BUS_MAX_FRAME):
+                self.handle_bus(peer_id, kind, payload)
+        except (OSError, ProtocolError):
+            pass
+        finally:
+            self.drop_peer(peer_id)
+
+    def handle_bus(self, peer_id, kind, payload):
+        """Deliver one bus frame to this worker's own members"""
+        if kind == BUS_JOIN or kind == BUS_LEAVE:
+            username = payload.decode('utf-8')
+            with self.members_lock:
+                members = self.remote_members[peer_id]
+                if kind == BUS_JOIN:
+                    members[username] += 1
+                    self.remember_user(username)
+                elif members[username] > 1:
+                    members[username] -= 1
+                else:
+                    members.pop(username, None)
+        elif kind == BUS_BROADCAST:
+            message, frames = unpack_broadcast(payload)
+            super().broadcast_to_all(message, frames=frames)
+        elif kind == BUS_PRIVATE:
+            target_user, _, message = payload.decode('utf-8').partition('\n')
+            super().send_to_user(message, target_user)
+        elif kind == BUS_RELAY:
+            suite, _, payload = payload.partition(b'\n')
+            codec = get_codec(self.key, suite.decode('ascii'), relay=True)
+            header = parse_relay_header(payload)
+            if header is None:
+                return
+            if header[1]:
+                super().relay_to_user(codec, payload, header[1])
+            else:
+                super().relay_to_all(codec, payload)
+
+    def is_remote_member(self, username):
+        with self.members_lock:
+            return any(members[username] for members in self.remote_members.values())
+
+    def register_client(self, client_socket, username, address, codec=None):
+        user_info = super().register_client(client_socket, username, address, codec)
+        self.publish(BUS_JOIN, username.encode('utf-8'))
+        return user_info
+
+    def unregister_client(self, client_socket):
+        user_info = super().unregister_client(client_socket)
+        if user_info is not None:
+            self.publish(BUS_LEAVE, user_info['username'].encode('utf-8'))
+        return user_info
+
+    def broadcast_to_all(self, message, exclude_socket=None, frames=None):
+        """Send message to the members of every worker, encrypting once per suite"""
+        if frames is None:
+            frames = {}
+        super().broadcast_to_all(message, exclude_socket, frames)
+        self.publish_fanout(BUS_BROADCAST, pack_broadcast(message, frames))
+
+    def send_to_user(self, message, target_user):
+        """Send message to every session of a user, on whichever workers they are"""
+        delivered = super().send_to_user(message, target_user)
+        if self.is_remote_member(target_user):
+            self.publish(BUS_PRIVATE, f"{target_user}\n{message}".encode('utf-8'))
+            delivered = True
+        return delivered
+
+    def relay_to_all(self, codec, payload, exclude_socket=None):
+        super().relay_to_all(codec, payload, exclude_socket)
+        self.publish_fanout(BUS_RELAY, codec.suite.encode('ascii') + b'\n' + payload)
+
+    def relay_to_user(self, codec, payload, target_user):
+        delivered = super().relay_to_user(codec, payload, target_user)
+        if self.is_remote_member(target_user):
+            self.publish(BUS_RELAY, codec.suite.encode('ascii') + b'\n' + payload)
+            delivered = True
+        return delivered
+
+    def connected_users(self):
+        """Usernames with a live session on any worker"""
+        usernames = super().connected_users()
+        with self.members_lock:
+            for members in self.remote_members.values():
+                usernames.extend(username for username in members if username not in usernames)
+        return usernames
+
+    def get_stats(self):
+        """This worker's counters, tagged with which worker answered"""
+        stats = super().get_stats()
+        with self.members_lock:
+            remote = sum(sum(members.values()) for members in self.remote_members.values())
+        stats.update({'worker': self.worker_id, 'workers': self.workers, 'remote_clients': remote,
+                      'ring_lost': sum(reader.lost for reader in self.ring_readers.values())})
+        return stats
+
+    def save_data(self):
+        """Every worker saves the users it sees; only the first one checkpoints the store"""
+        if self.worker_id == 0:
+            super().save_data()
+
+    def start(self):
+        """Join the bus, then serve like a single-process room"""
+        self.connect_bus()
+        super().start()
+
+    def stop(self):
+        """Stop serving, tell the other workers who left and close the bus"""
+        super().stop()
+        self.ring_stop.set()
+        for outbox in list(self.peers.values()):
+            outbox.close()
+
+def run_worker(worker_id, bus, rings, doorbells, port, key, alias, creator_username, options):
+    """Entry point of one forked worker process"""
+    if options.get('log_dir'):
+        options = dict(options, log_dir=os.path.join(options['log_dir'], f"worker{worker_id}"))
+    server = WorkerServer(port, key, alias, creator_username, worker_id,
+                          bus_endpoints(bus, worker_id), rings, doorbells, **options)
+
+    # The supervisor handles Ctrl+C and asks workers to stop with SIGTERM
+    def signal_handler(sig, frame):
+        server.stop()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal_handler)
+    print(f"[SERVER] Worker {worker_id} running as pid {os.getpid()}")
+    try:
+        server.start()
+    except OSError:
+        pass  # Listener closed by stop()
+
+def run_workers(port, key, alias, creator_username, workers, ring_bytes=DEFAULT_RING_BYTES, **options):
+    """Pre-fork workers that share the room port, until interrupted (ring_bytes=0: socket bus only)"""
+    if not hasattr(socket, 'SO_REUSEPORT') or not hasattr(os, 'fork'):
+        print("[ERROR] --workers needs SO_REUSEPORT and fork() (Linux, BSD or macOS)")
+        return
+
+    bus = create_bus(workers)
+    rings = doorbells = None
+    if ring_bytes:
+        rings = [SharedRing(ring_bytes) for _ in range(workers)]  # Mapped before fork, so shared
+        doorbells = create_doorbells(workers)
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=run_worker,
+                                 args=(worker_id, bus, rings, doorbells, port, key, alias,
+                                       creator_username, options))
+                 for worker_id in range(workers)]
+    for process in processes:
+        process.start()
+    for pair in bus.values():
+        for bus_socket in pair:
+            bus_socket.close()
+    print(f"[SERVER] Room '{alias}' served by {workers} workers on port {port}")
+
+    def stop_workers(*_):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n[SERVER] Shutting down workers...")
+        stop_workers()
+        for process in processes:
+            process.join()
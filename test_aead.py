@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire AEAD cipher negotiation (AES-GCM / ChaCha20-Poly1305)
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import (FRAME_DATA, FRAME_SEALED, FrameReader, encode_frame, encode_hello,
+                                parse_hello, parse_hello_fields)
+from ghostwire_crypto import SUITE_CBC, SUITE_CHACHA, SUITE_GCM, AEAD_SUITES, get_codec, get_context
+
+KEY = pad(b"sealedasealedbsealedc", 16)
+
+def start_server():
+    """Run a threaded GhostwireServer in the background"""
+    from ghostwire_simple import GhostwireServer
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = GhostwireServer(port, KEY, 'aead-test', 'tester')
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+    time.sleep(0.3)
+    return server
+
+def test_aead_contexts():
+    """Sealed payloads round-trip and any modification is rejected"""
+    print("🔧 Testing AEAD contexts...")
+    for suite in AEAD_SUITES:
+        context = get_context(KEY, suite)
+        payload = context.encrypt_text("attack at dawn")
+        if len(payload) != 12 + len("attack at dawn") + 16:
+            print(f"❌ {suite}: payload is not nonce || ciphertext || tag")
+            return False
+        if context.decrypt_text(payload) != "attack at dawn":
+            print(f"❌ {suite}: round trip failed")
+            return False
+        for position in (0, 13, len(payload) - 1):
+            tampered = bytearray(payload)
+            tampered[position] ^= 1
+            if context.decrypt_text(bytes(tampered)) is not None:
+                print(f"❌ {suite}: tampered byte {position} accepted")
+                return False
+        if context.decrypt_text(b"short") is not None:
+            print(f"❌ {suite}: truncated payload accepted")
+            return False
+        print(f"✅ {suite} - OK")
+
+    if get_context(KEY, SUITE_GCM).decrypt_text(get_context(KEY, SUITE_CHACHA).encrypt_text("x")) is not None:
+        print("❌ Suites share a key")
+        return False
+    print("✅ Per-suite key separation - OK")
+    return True
+
+def test_hello_fields():
+    """Handshake frames carry extra KEY:value lines without breaking parse_hello"""
+    print("\n🤝 Testing handshake fields...")
+    payload = encode_hello("alice", cipher="aes-gcm,aes-cbc")[5:]
+    if parse_hello(payload) != "alice":
+        print("❌ Username lost with extra fields")
+        return False
+    if parse_hello_fields(payload) != {'USERNAME': "alice", 'CIPHER': "aes-gcm,aes-cbc"}:
+        print(f"❌ Fields parsed wrong: {parse_hello_fields(payload)}")
+        return False
+    print("✅ Handshake fields - OK")
+    return True
+
+def test_negotiation_and_mixed_room():
+    """AEAD and legacy members share a room, each in its own format"""
+    print("\n🔐 Testing negotiation in a mixed room...")
+    from ghostwire_simple import connect_room
+    server = start_server()
+
+    try:
+        legacy = socket.create_connection(('127.0.0.1', server.port))
+        legacy.settimeout(3)
+        legacy.sendall(encode_hello("legacy"))
+        legacy_reader = FrameReader(legacy)
+        time.sleep(0.1)
+
+        gcm_socket, gcm_reader, gcm = connect_room('127.0.0.1', server.port, KEY, "gcm", ciphers=(SUITE_GCM,))
+        gcm_socket.settimeout(3)
+        sender, _, codec = connect_room('127.0.0.1', server.port, KEY, "sender")
+        if codec.suite != SUITE_CHACHA or gcm.suite != SUITE_GCM:
+            print(f"❌ Negotiated {codec.suite} / {gcm.suite}")
+            return False
+        print(f"✅ Negotiated {codec.suite} (default) and {gcm.suite} (on request) - OK")
+
+        legacy_reader.read_frame()  # "[SYSTEM] gcm joined the room"
+        legacy_reader.read_frame()  # "[SYSTEM] sender joined the room"
+        gcm_reader.read_frame()     # "[SYSTEM] sender joined the room"
+
+        sender.sendall(codec.encode("sealed hello"))
+        frame_type, payload = legacy_reader.read_frame()
+        if frame_type != FRAME_DATA or server.decrypt_message(payload) != "[sender]: sealed hello":
+            print("❌ Legacy member did not get an AES-CBC data frame")
+            return False
+        frame_type, payload = gcm_reader.read_frame()
+        if frame_type != FRAME_SEALED or gcm.decode(frame_type, payload) != "[sender]: sealed hello":
+            print("❌ AEAD member did not get a sealed frame")
+            return False
+        print("✅ Each member receives its own frame format - OK")
+
+        # Garbage is rejected before any string work and never relayed
+        sender.sendall(encode_frame(FRAME_SEALED, os.urandom(64)))
+        sender.sendall(encode_frame(FRAME_DATA, get_context(KEY).encrypt_text("wrong frame type")))
+        sender.sendall(codec.encode("after garbage"))
+        frame_type, payload = gcm_reader.read_frame()
+        if gcm.decode(frame_type, payload) != "[sender]: after garbage":
+            print("❌ Garbage frame was relayed")
+            return False
+        if server.get_stats()['rejected'] != 2:
+            print(f"❌ Expected 2 rejected frames, got {server.get_stats()['rejected']}")
+            return False
+        print("✅ Forged and mismatched frames rejected and counted - OK")
+
+        for sock in (legacy, gcm_socket, sender):
+            sock.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        server.stop()
+
+def test_fallback_to_old_server():
+    """A server without negotiation gets a plain handshake, without waiting on a timeout"""
+    print("\n🕰️  Testing fallback against a server without negotiation...")
+    from ghostwire_simple import connect_room
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(2)
+    handshakes = []
+    connections = []  # Kept open until the client is done
+
+    def old_server():
+        # Reads the username the way servers before negotiation did
+        for _ in range(2):
+            conn, _ = listener.accept()
+            frame = FrameReader(conn).read_frame()
+            text = bytes(frame[1]).decode('utf-8')
+            if not text.startswith('USERNAME:'):
+                conn.close()
+                continue
+            handshakes.append(text.split(':', 1)[1].strip())
+            conn.sendall(get_codec(KEY).encode("[SYSTEM] welcome"))
+            connections.append(conn)
+
+    threading.Thread(target=old_server, daemon=True).start()
+    try:
+        started = time.time()
+        client_socket, reader, codec = connect_room('127.0.0.1', listener.getsockname()[1], KEY, "old",
+                                                    room='lobby', since=0)
+        elapsed = time.time() - started
+        first = codec.decode(*reader.read_frame())
+        client_socket.close()
+    finally:
+        listener.close()
+        for conn in connections:
+            conn.close()
+    if codec.suite != SUITE_CBC:
+        print(f"❌ Expected AES-CBC fallback, got {codec.suite}")
+        return False
+    if handshakes[:1] != ["old"]:
+        print(f"❌ Old server read the username as {handshakes[:1]}")
+        return False
+    if first != "[SYSTEM] welcome":
+        print(f"❌ First message from the old server lost, got {first!r}")
+        return False
+    if elapsed > 1:
+        print(f"❌ Fallback took {elapsed:.2f}s")
+        return False
+    print(f"✅ Falls back to AES-CBC in {elapsed * 1000:.0f}ms with a plain handshake - OK")
+    return True
+
+def main():
+    print("🚀 Ghostwire AEAD Test")
+    print("=" * 50)
+
+    tests = [
+        ("AEAD Contexts", test_aead_contexts),
+        ("Handshake Fields", test_hello_fields),
+        ("Negotiation", test_negotiation_and_mixed_room),
+        ("Old Server Fallback", test_fallback_to_old_server)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Test script for the Ghostwire send agent (one room connection for many sends)
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FrameReader, encode_hello
+
+KEY = pad(b"agentaagentbagentc", 16)
+
+def start_server():
+    """Run a threaded GhostwireServer in the background"""
+    from ghostwire_simple import GhostwireServer
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = GhostwireServer(port, KEY, 'agent-test', 'tester')
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+    time.sleep(0.3)
+    return server
+
+def test_no_agent_fallback():
+    """Without a running agent, send_via_agent reports it did nothing"""
+    print("🔧 Testing fallback when no agent runs...")
+    from ghostwire_agent import send_via_agent
+    if send_via_agent(1, "nobody-here", "hello"):
+        print("❌ Claimed delivery without an agent")
+        return False
+    print("✅ Falls back to a direct connection - OK")
+    return True
+
+def test_agent_relays_many_sends():
+    """Hundreds of sends share one connection and cause a single join"""
+    print("\n📨 Testing agent relay...")
+    from ghostwire_agent import GhostwireAgent, AgentConnection, send_via_agent
+    server = start_server()
+
+    listener = socket.create_connection(('127.0.0.1', server.port))
+    listener.settimeout(5)
+    listener.sendall(encode_hello("listener"))
+    reader = FrameReader(listener)
+    time.sleep(0.1)
+
+    agent = GhostwireAgent('127.0.0.1', server.port, KEY, "scripted")
+    threading.Thread(target=agent.start, daemon=True).start()
+    try:
+        for _ in range(50):
+            if agent.running:
+                break
+            time.sleep(0.05)
+
+        count = 300
+        started = time.time()
+        connection = AgentConnection(server.port, "scripted")
+        for i in range(count):
+            connection.send(f"msg {i}")
+        connection.close()
+        send_via_agent(server.port, "scripted", "secret", "listener")
+        elapsed = time.time() - started
+
+        received = [server.decrypt_message(reader.read_frame()[1]) for _ in range(count + 2)]
+        joins = [text for text in received if text.endswith("joined the room")]
+        if joins != ["[SYSTEM] scripted joined the room"]:
+            print(f"❌ Expected exactly one join, saw {joins}")
+            return False
+        if received[1:count + 1] != [f"[scripted]: msg {i}" for i in range(count)]:
+            print("❌ Relayed messages missing or out of order")
+            return False
+        if received[-1] != "[PRIVATE from scripted]: secret":
+            print(f"❌ Private send not relayed, got: {received[-1]}")
+            return False
+        print(f"✅ {count} sends over one connection in {elapsed:.2f}s ({count / elapsed:.0f} msg/sec) - OK")
+
+        if len(server.clients.sessions_of("scripted")) != 1:
+            print("❌ Agent should hold exactly one session")
+            return False
+        print("✅ Single session held by the agent - OK")
+        return True
+    finally:
+        agent.stop()
+        listener.close()
+        time.sleep(0.2)
+        server.stop()
+
+def test_agent_reports_unknown_user():
+    """A private send to a missing user fails with the room's answer"""
+    print("\n🔍 Testing private send to an unknown user...")
+    import stat
+    from ghostwire_agent import GhostwireAgent, AgentConnection
+    server = start_server()
+
+    agent = GhostwireAgent('127.0.0.1', server.port, KEY, "asker")
+    threading.Thread(target=agent.start, daemon=True).start()
+    try:
+        for _ in range(50):
+            if agent.running:
+                break
+            time.sleep(0.05)
+
+        mode = stat.S_IMODE(os.stat(agent.path).st_mode)
+        if mode != 0o600:
+            print(f"❌ Agent socket created with mode {oct(mode)}")
+            return False
+        print("✅ Agent socket is 0600 - OK")
+
+        mode = stat.S_IMODE(os.stat(os.path.dirname(agent.path)).st_mode)
+        if mode & 0o077:
+            print(f"❌ Agent socket directory created with mode {oct(mode)}")
+            return False
+        print("✅ Agent socket directory is private - OK")
+
+        connection = AgentConnection(server.port, "asker")
+        try:
+            connection.send("anyone there?", "ghost")
+            print("❌ Send to an unknown user reported success")
+            return False
+        except ConnectionError as e:
+            if str(e) != "[SYSTEM] User ghost not found":
+                print(f"❌ Unexpected error: {e}")
+                return False
+        connection.send("talking to myself", "asker")
+        connection.send("hello room")
+        connection.close()
+        print("✅ Unknown user reported back to the sender - OK")
+        return True
+    finally:
+        agent.stop()
+        time.sleep(0.2)
+        server.stop()
+
+def test_foreign_socket_refused():
+    """Sockets and directories other users could have set up are not used"""
+    print("\n🔒 Testing agent socket ownership checks...")
+    import tempfile
+    from ghostwire_agent import GhostwireAgent, agent_socket_path, send_via_agent
+    previous = os.environ.get('XDG_RUNTIME_DIR')
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['XDG_RUNTIME_DIR'] = directory
+        try:
+            os.chmod(directory, 0o755)
+            agent = GhostwireAgent('127.0.0.1', 1, KEY, "shared")
+            agent.start()  # Refuses before ever dialling port 1
+            if agent.running or os.path.exists(agent.path):
+                print("❌ Agent listened in a directory other users can read")
+                return False
+            print("✅ Directory open to other users refused - OK")
+
+            if os.getuid() != 0:
+                print("⚠️ Not root, cannot hand a socket to another user - skipped")
+                return True
+            os.chmod(directory, 0o700)
+            path = agent_socket_path(2, "victim")
+            impostor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            impostor.bind(path)
+            impostor.listen(1)
+            os.chown(path, 65534, 65534)
+            try:
+                if send_via_agent(2, "victim", "secret"):
+                    print("❌ Message handed to another user's socket")
+                    return False
+            finally:
+                impostor.close()
+            print("✅ Socket owned by another user refused - OK")
+            return True
+        finally:
+            if previous is None:
+                del os.environ['XDG_RUNTIME_DIR']
+            else:
+                os.environ['XDG_RUNTIME_DIR'] = previous
+
+def main():
+    print("🚀 Ghostwire Send Agent Test")
+    print("=" * 50)
+
+    tests = [
+        ("No Agent Fallback", test_no_agent_fallback),
+        ("Agent Relay", test_agent_relays_many_sends),
+        ("Unknown User", test_agent_reports_unknown_user),
+        ("Foreign Socket", test_foreign_socket_refused)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the asyncio Ghostwire server (--async)
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FrameReader, encode_hello
+
+KEY = pad(b"asyncaasyncbasyncc", 16)
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(port, **options):
+    """Run an AsyncGhostwireServer in a background thread"""
+    from ghostwire_async import AsyncGhostwireServer
+    server = AsyncGhostwireServer(port, KEY, 'async-test', 'tester', **options)
+    thread = threading.Thread(target=server.start)
+    thread.daemon = True
+    thread.start()
+    for _ in range(50):
+        if server.running:
+            break
+        time.sleep(0.05)
+    return server, thread
+
+def connect(port, username):
+    """Open a client connection and perform the USERNAME handshake"""
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.settimeout(2)
+    sock.sendall(encode_hello(username))
+    time.sleep(0.1)
+    return sock
+
+def receive(server, sock):
+    """Read one frame from the server and decrypt it"""
+    frame = FrameReader(sock).read_frame()
+    return server.decrypt_message(frame[1]) if frame else None
+
+def test_async_routing():
+    """Public, private and LIST_USERS_CMD traffic on the event loop"""
+    print("🔧 Testing asyncio server routing...")
+    port = free_port()
+    server, thread = start_server(port)
+
+    try:
+        alice = connect(port, 'alice')
+        bob = connect(port, 'bob')
+        receive(server, alice)  # "[SYSTEM] bob joined the room"
+
+        bob.sendall(server.encode_message("hello room"))
+        received = receive(server, alice)
+        if received != "[bob]: hello room":
+            print(f"❌ Public message not routed, got: {received}")
+            return False
+        print("✅ Public message - OK")
+
+        alice.sendall(server.encode_message("@bob psst"))
+        received = receive(server, bob)
+        if received != "[PRIVATE from alice]: psst":
+            print(f"❌ Private message not routed, got: {received}")
+            return False
+        print("✅ Private message - OK")
+
+        lister = socket.create_connection(('127.0.0.1', port))
+        lister.settimeout(2)
+        lister.sendall(encode_hello("LIST_USERS_CMD"))
+        received = receive(server, lister)
+        lister.close()
+        if not received or "alice" not in received or "bob" not in received:
+            print(f"❌ User list incomplete, got: {received}")
+            return False
+        print("✅ LIST_USERS_CMD - OK")
+
+        alice.close()
+        bob.close()
+        return True
+    finally:
+        server.stop()
+        thread.join(5)
+
+def test_many_idle_connections():
+    """Hold a few hundred idle connections on a single thread"""
+    print("\n🔧 Testing many idle connections...")
+    port = free_port()
+    # Nobody reads, so every member must be able to queue all 300 join notices
+    server, thread = start_server(port, queue_size=1024)
+    threads_before = threading.active_count()
+
+    sockets = []
+    try:
+        for i in range(300):
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.sendall(encode_hello(f"idle{i}"))
+            sockets.append(sock)
+
+        for _ in range(50):
+            if len(server.clients) == len(sockets):
+                break
+            time.sleep(0.1)
+
+        if len(server.clients) != len(sockets):
+            print(f"❌ Expected {len(sockets)} clients, server has {len(server.clients)}")
+            return False
+        if threading.active_count() != threads_before:
+            print("❌ Server spawned threads per connection")
+            return False
+        print(f"✅ {len(sockets)} idle connections on one loop - OK")
+        return True
+    finally:
+        for sock in sockets:
+            sock.close()
+        server.stop()
+        thread.join(5)
+
+def main():
+    print("🚀 Ghostwire Asyncio Server Test")
+    print("=" * 50)
+
+    tests = [
+        ("Async Routing", test_async_routing),
+        ("Idle Connections", test_many_idle_connections)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
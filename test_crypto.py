@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared Ghostwire crypto context
+"""
+
+import sys
+import os
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+
+KEY = pad(b"cryptoacryptobcryptoc", 16)
+
+def test_compatible_with_aes_cbc():
+    """Payloads interoperate with plain pycryptodome AES-CBC in both directions"""
+    print("🔧 Testing AES-CBC compatibility...")
+    from ghostwire_crypto import get_context
+    context = get_context(KEY)
+
+    for size in (0, 1, 15, 16, 17, 63, 64, 65, 1000, 4096):
+        data = os.urandom(size)
+        payload = context.encrypt(data)
+        if unpad(AES.new(KEY, AES.MODE_CBC, payload[:16]).decrypt(payload[16:]), 16) != data:
+            print(f"❌ {size}-byte message does not decrypt with AES-CBC")
+            return False
+        cipher = AES.new(KEY, AES.MODE_CBC)
+        if context.decrypt(cipher.iv + cipher.encrypt(pad(data, 16))) != data:
+            print(f"❌ AES-CBC {size}-byte message does not decrypt with the context")
+            return False
+    print("✅ Interoperates with AES-CBC - OK")
+
+    if get_context(KEY) is not context:
+        print("❌ Context not cached per key")
+        return False
+    print("✅ Context cached per key - OK")
+    return True
+
+def test_batch_api():
+    """Batch encrypt/decrypt round-trip mixed sizes and flag bad payloads"""
+    print("\n📦 Testing batch API...")
+    from ghostwire_crypto import get_context
+    context = get_context(KEY)
+
+    messages = [os.urandom(size) for size in range(0, 300, 7)]
+    payloads = context.encrypt_batch(messages)
+    if [context.decrypt(payload) for payload in payloads] != messages:
+        print("❌ encrypt_batch output does not decrypt")
+        return False
+    if len({payload[:16] for payload in payloads}) != len(payloads):
+        print("❌ IVs reused within a batch")
+        return False
+
+    tampered = payloads[3][:-1] + bytes([payloads[3][-1] ^ 0xFF])
+    results = context.decrypt_batch(payloads + [b"short", tampered])
+    if results[:-2] != messages or results[-2:] != [None, None]:
+        print("❌ decrypt_batch results wrong")
+        return False
+    print("✅ Batch round trip and invalid payloads - OK")
+    return True
+
+def test_invalid_text():
+    """decrypt_text returns None rather than raising"""
+    print("\n🛡️  Testing invalid payloads...")
+    from ghostwire_crypto import decrypt_message, encrypt_message
+    if decrypt_message(KEY, encrypt_message(KEY, "héllo")) != "héllo":
+        print("❌ Text round trip failed")
+        return False
+    for garbage in (b"", b"x" * 16, b"x" * 33, os.urandom(48)):
+        if decrypt_message(KEY, garbage) is not None:
+            print(f"❌ Garbage of {len(garbage)} bytes decrypted")
+            return False
+    print("✅ Garbage rejected - OK")
+    return True
+
+def main():
+    print("🚀 Ghostwire Crypto Test")
+    print("=" * 50)
+
+    tests = [
+        ("AES-CBC Compatibility", test_compatible_with_aes_cbc),
+        ("Batch API", test_batch_api),
+        ("Invalid Payloads", test_invalid_text)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
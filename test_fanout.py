@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire broadcast fan-out through outbound queues
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FrameReader, encode_hello
+from ghostwire_fanout import OutboundQueue, POLICY_DROP_OLDEST, POLICY_DROP_NEWEST
+
+KEY = pad(b"fanoutafanoutbfanoutc", 16)
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(**options):
+    """Run a threaded GhostwireServer in the background"""
+    from ghostwire_simple import GhostwireServer
+    server = GhostwireServer(free_port(), KEY, 'fanout-test', 'tester', **options)
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+    time.sleep(0.3)
+    return server
+
+def join(server, username, rcvbuf=None):
+    """Connect a member, optionally with a tiny receive buffer"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.connect(('127.0.0.1', server.port))
+    sock.sendall(encode_hello(username))
+    time.sleep(0.1)
+    return sock
+
+def test_queue_basics():
+    """Frames come out in order and the bound is enforced"""
+    print("🔧 Testing outbound queue...")
+    queue = OutboundQueue(max_frames=3)
+    accepted = [queue.put(bytes([i])) for i in range(5)]
+    if accepted != [True, True, True, False, False]:
+        print(f"❌ Bound not enforced: {accepted}")
+        return False
+    if queue.take_nowait() != [b"\x00", b"\x01", b"\x02"]:
+        print("❌ Frames out of order")
+        return False
+    queue.close()
+    if queue.put(b"x") or queue.take_all() is not None:
+        print("❌ Closed queue still accepts frames")
+        return False
+    print("✅ Outbound queue - OK")
+    return True
+
+def test_slow_client_policies():
+    """drop-oldest, drop-newest and disconnect behave as documented"""
+    print("\n🚦 Testing slow client policies...")
+
+    queue = OutboundQueue(max_frames=4, policy=POLICY_DROP_OLDEST)
+    for i in range(10):
+        queue.put(bytes([i]))
+    if queue.take_nowait() != [b"\x06", b"\x07", b"\x08", b"\x09"] or queue.stats()['dropped'] != 6:
+        print("❌ drop-oldest did not keep the newest frames")
+        return False
+    print("✅ drop-oldest - OK")
+
+    queue = OutboundQueue(max_frames=4, policy=POLICY_DROP_NEWEST)
+    for i in range(6):
+        queue.put(bytes([i]))
+    if not queue.stats()['paused'] or len(queue) != 4 or queue.stats()['dropped'] != 2:
+        print("❌ drop-newest did not stop queueing at the high-water mark")
+        return False
+    if queue.take_nowait() != [b"\x00", b"\x01", b"\x02", b"\x03"]:
+        print("❌ drop-newest did not keep the oldest frames")
+        return False
+    queue.put(b"resume")
+    if queue.stats()['paused'] or queue.take_nowait() != [b"resume"]:
+        print("❌ drop-newest did not resume after draining")
+        return False
+    if OutboundQueue(policy='pause').policy != POLICY_DROP_NEWEST:
+        print("❌ The old 'pause' name is no longer accepted")
+        return False
+    print("✅ drop-newest - OK")
+
+    queue = OutboundQueue(max_bytes=10)
+    if not queue.put(b"x" * 8) or queue.put(b"x" * 8):
+        print("❌ disconnect did not trigger on the byte high-water mark")
+        return False
+    print("✅ disconnect on byte limit - OK")
+    return True
+
+def test_server_counters():
+    """A stalled member under drop-oldest stays connected and is counted"""
+    print("\n📊 Testing server backpressure counters...")
+    server = start_server(queue_size=8, slow_policy=POLICY_DROP_OLDEST)
+
+    try:
+        stalled = join(server, "stalled", rcvbuf=4096)
+        sender = join(server, "sender")
+        # Well beyond what the kernel socket buffers can absorb
+        frame = server.encode_message("y" * 8000)
+        for _ in range(1000):
+            sender.sendall(frame)
+        time.sleep(1)
+
+        stats = server.get_stats()
+        print(f"📊 {stats}")
+        if stats['clients'] != 2 or stats['dropped'] == 0 or stats['evicted'] != 0:
+            print("❌ Counters do not reflect the dropped frames")
+            return False
+        print("✅ Server counters - OK")
+
+        stalled.close()
+        sender.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        server.stop()
+
+def test_slow_member_does_not_stall_room():
+    """A member that never reads must not delay delivery to the others"""
+    print("\n🐌 Testing stalled member isolation...")
+    server = start_server()
+
+    try:
+        stalled = join(server, "stalled", rcvbuf=4096)
+        fast = join(server, "fast")
+        fast.settimeout(5)
+        reader = FrameReader(fast)
+        sender = join(server, "sender")
+        reader.read_frame()  # "[SYSTEM] sender joined the room"
+
+        count = 2000
+        text = "x" * 2000
+        frame = server.encode_message(text)
+        started = time.time()
+
+        def drain():
+            for _ in range(count):
+                reader.read_frame()
+
+        drainer = threading.Thread(target=drain)
+        drainer.start()
+        for _ in range(count):
+            sender.sendall(frame)
+        drainer.join(15)
+        elapsed = time.time() - started
+
+        if drainer.is_alive():
+            print("❌ Fast member did not receive every broadcast")
+            return False
+        print(f"✅ {count} broadcasts delivered to fast member in {elapsed:.2f}s despite a stalled member")
+
+        for sock in (stalled, fast, sender):
+            sock.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        server.stop()
+
+def test_departed_member_not_written():
+    """A recipient that left after being picked is skipped, not written to directly"""
+    print("\n🚪 Testing sends to a departed member...")
+    server = start_server()
+
+    try:
+        stalled = join(server, "stalled", rcvbuf=4096)
+        recipients = list(server.clients.keys())
+        server.unregister_client(recipients[0])  # Left or evicted after the snapshot
+
+        frames = {}
+        started = time.time()
+        try:
+            for _ in range(200):  # Far more than the stalled peer's buffers hold
+                server.send_text(recipients[0], "x" * 2000, frames)
+            print("❌ Send to a departed member succeeded")
+            return False
+        except ConnectionError:
+            pass
+        elapsed = time.time() - started
+        if elapsed > 0.5:
+            print(f"❌ Sender blocked for {elapsed:.2f}s")
+            return False
+        print("✅ Departed member refused without blocking the sender - OK")
+        stalled.close()
+        return True
+    finally:
+        server.stop()
+
+def test_evicted_member_gets_eof():
+    """A member evicted under the disconnect policy sees its connection end"""
+    print("\n🔌 Testing eviction of a stalled member...")
+    server = start_server(queue_size=8)
+
+    try:
+        stalled = join(server, "stalled", rcvbuf=4096)
+        sender = join(server, "sender")
+        frame = server.encode_message("z" * 8000)
+        for _ in range(1000):
+            sender.sendall(frame)
+            if server.get_stats()['evicted']:
+                break
+
+        stalled.settimeout(5)
+        try:
+            while stalled.recv(65536):
+                pass  # Drain what was delivered before the eviction
+        except socket.timeout:
+            print("❌ Evicted member never saw EOF")
+            return False
+        except ConnectionResetError:
+            pass
+        print(f"✅ Evicted member disconnected ({server.get_stats()['evicted']} evicted) - OK")
+
+        stalled.close()
+        sender.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        server.stop()
+
+def main():
+    print("🚀 Ghostwire Fan-out Test")
+    print("=" * 50)
+
+    tests = [
+        ("Queue Basics", test_queue_basics),
+        ("Slow Client Policies", test_slow_client_policies),
+        ("Server Counters", test_server_counters),
+        ("Stalled Member", test_slow_member_does_not_stall_room),
+        ("Departed Member", test_departed_member_not_written),
+        ("Evicted Member", test_evicted_member_gets_eof)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
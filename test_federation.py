@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire federated room nodes (--peer)
+"""
+
+import sys
+import os
+import json
+import socket
+import threading
+import multiprocessing
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import HEADER_SIZE, FrameReader, encode_hello
+from ghostwire_crypto import get_codec
+
+KEY = pad(b"meshameshbmeshc", 16)
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def run_node(port, node, peers):
+    from ghostwire_federation import FederatedServer
+    FederatedServer(port, KEY, 'mesh-test', 'tester', node, peers).start()
+
+def start_mesh():
+    """Three node processes linked in a triangle, so every frame has two paths"""
+    ports = [free_port() for _ in range(3)]
+    peers = [[], [f"127.0.0.1:{ports[0]}"], [f"127.0.0.1:{ports[0]}", f"127.0.0.1:{ports[1]}"]]
+    context = multiprocessing.get_context('fork')
+    nodes = [context.Process(target=run_node, args=(port, f"node{i}", peers[i]))
+             for i, port in enumerate(ports)]
+    for node in nodes:
+        node.start()
+    time.sleep(1.5)
+    return ports, nodes
+
+def ask(port, command):
+    """Send a LIST_USERS_CMD / STATS_CMD to one node and return the decrypted reply"""
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.settimeout(3)
+    sock.sendall(encode_hello(command))
+    reply = get_codec(KEY).decode(*FrameReader(sock).read_frame())
+    sock.close()
+    return reply
+
+def test_mesh_room():
+    """Members on three nodes share one room, each message delivered once"""
+    print("🌐 Testing a three-node mesh...")
+    from ghostwire_simple import connect_room
+    ports, nodes = start_mesh()
+    sockets = []
+    try:
+        members = {}
+        for name, port in (("alice", ports[0]), ("bob", ports[1]), ("carol", ports[2])):
+            sock, reader, codec = connect_room('127.0.0.1', port, KEY, name)
+            sock.settimeout(3)
+            sockets.append(sock)
+            members[name] = (sock, reader, codec)
+            time.sleep(0.3)
+        alice, bob, carol = members["alice"], members["bob"], members["carol"]
+        read = lambda member: member[2].decode(*member[1].read_frame())
+
+        if [read(alice), read(alice), read(bob)] != ["[SYSTEM] bob joined the room",
+                                                    "[SYSTEM] carol joined the room",
+                                                    "[SYSTEM] carol joined the room"]:
+            print("❌ Joins on other nodes not announced")
+            return False
+        print("✅ Joins announced across nodes - OK")
+
+        alice[0].sendall(alice[2].encode("hello mesh"))
+        alice[0].sendall(alice[2].encode("second"))
+        for member in (bob, carol):
+            if [read(member), read(member)] != ["[alice]: hello mesh", "[alice]: second"]:
+                print("❌ Broadcast missing or duplicated on another node")
+                return False
+        print("✅ Broadcast delivered once on every node - OK")
+
+        carol[0].sendall(carol[2].encode("@alice over here"))
+        if read(alice) != "[PRIVATE from carol]: over here" or \
+                read(carol) != "[SYSTEM] Private message sent to alice":
+            print("❌ Private message across nodes failed")
+            return False
+        print("✅ Private message across nodes - OK")
+
+        users = ask(ports[1], "LIST_USERS_CMD")
+        if not all(name in users.split('|')[0] for name in ("alice", "bob", "carol")):
+            print(f"❌ Node 1 lists {users!r}")
+            return False
+        stats = json.loads(ask(ports[2], "STATS_CMD"))
+        if stats['peers'] != ["node0", "node1"] or stats['duplicates'] == 0:
+            print(f"❌ Unexpected mesh stats: peers={stats['peers']} duplicates={stats['duplicates']}")
+            return False
+        print(f"✅ Shared member list, {stats['duplicates']} looped frames dropped - OK")
+
+        bob[0].close()
+        if read(alice) != "[SYSTEM] bob left the room":
+            print("❌ Departure not announced across nodes")
+            return False
+        time.sleep(0.2)
+        if "bob" in ask(ports[0], "LIST_USERS_CMD").split('|')[0]:
+            print("❌ Departed member still listed on another node")
+            return False
+        print("✅ Departures shared - OK")
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        print(f"❌ Mesh failed: {e}")
+        return False
+    finally:
+        for sock in sockets:
+            sock.close()
+        for node in nodes:
+            node.terminate()
+            node.join(5)
+
+def test_peer_needs_room_key():
+    """A node with another key is refused as a peer"""
+    print("\n🔑 Testing peer authentication...")
+    from ghostwire_federation import FederatedServer
+    servers = [FederatedServer(free_port(), KEY, 'mesh-test', 'tester', "good"),
+               FederatedServer(free_port(), pad(b"wrongkey", 16), 'mesh-test', 'tester', "bad")]
+    servers[1].peer_addresses = [f"127.0.0.1:{servers[0].port}"]
+    for server in servers:
+        threading.Thread(target=server.start, daemon=True).start()
+        time.sleep(0.3)  # Let the good node listen before the bad one dials it
+    time.sleep(0.5)
+    try:
+        if servers[0].links or servers[1].links:
+            print("❌ Node with the wrong key was linked")
+            return False
+        print("✅ Wrong key refused - OK")
+        return True
+    finally:
+        for server in servers:
+            server.stop()
+
+def test_reflected_auth_refused():
+    """One node's answer to a link cannot be replayed to another node"""
+    print("\n🪞 Testing replayed peer authentication...")
+    from ghostwire_federation import FederatedServer, MESH_AUTH
+    from ghostwire_protocol import FRAME_HELLO, parse_hello_fields
+    from ghostwire_workers import bus_frame
+    servers = [FederatedServer(free_port(), KEY, 'mesh-test', 'tester', name) for name in ("target", "oracle")]
+    for server in servers:
+        threading.Thread(target=server.start, daemon=True).start()
+    time.sleep(0.3)
+
+    def dial(server, challenge):
+        link = socket.create_connection(('127.0.0.1', server.port))
+        link.settimeout(3)
+        link.sendall(encode_hello(peer="intruder", challenge=challenge.hex()))
+        reader = FrameReader(link, 1 << 16)
+        hello, auth = reader.read_frame(), reader.read_frame()
+        if hello[0] != FRAME_HELLO or auth[0] != MESH_AUTH:
+            raise ValueError("unexpected handshake")
+        return link, reader, bytes.fromhex(parse_hello_fields(hello[1])['CHALLENGE']), auth
+
+    try:
+        first, reader, challenge, _ = dial(servers[0], os.urandom(16))
+        # Get another node holding the key to seal the target's challenge, then hand that over
+        second, _, _, answer = dial(servers[1], challenge)
+        first.sendall(bus_frame(*answer))
+        closed = reader.read_frame() is None
+        first.close()
+        second.close()
+        time.sleep(0.2)
+        if not closed or servers[0].links:
+            print("❌ Node accepted another node's answer from another link")
+            return False
+        print("✅ Reflected answer refused - OK")
+        return True
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Handshake failed: {e}")
+        return False
+    finally:
+        for server in servers:
+            server.stop()
+
+def test_dropped_link_forgets_its_members():
+    """Losing a link only forgets the members that were announced over it"""
+    print("\n🔗 Testing membership cleanup on a lost link...")
+    from ghostwire_federation import FederatedServer, MESH_MEMBERS, seal_link
+    from ghostwire_fanout import OutboundQueue
+    server = FederatedServer(free_port(), KEY, 'mesh-test', 'tester', "local")
+    links = {}
+    for name in ("relay", "liar"):
+        links[name] = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # A peer names itself; "liar" claims to be the node "relay" announced
+        server.links[links[name]] = {'node': "far", 'outbox': OutboundQueue(8, 1 << 16)}
+    frame = seal_link(server.mesh, MESH_MEMBERS, "far/0001", 1, b"alice")
+    server.handle_link_frame(links["relay"], MESH_MEMBERS, frame[HEADER_SIZE:])
+
+    server.drop_link(links["liar"])
+    if not server.is_remote_member("alice"):
+        print("❌ A link dropped members it never announced")
+        return False
+    server.drop_link(links["relay"])
+    if server.is_remote_member("alice") or "far" in server.member_frames:
+        print("❌ Members announced over a lost link were kept")
+        return False
+    print("✅ Only the lost link's members forgotten - OK")
+    return True
+
+def test_quiet_nodes_forgotten():
+    """Members and duplicate windows of a node that went quiet are dropped"""
+    print("\n🧹 Testing expiry of quiet nodes...")
+    from ghostwire_federation import FederatedServer, MESH_MEMBERS, MESH_REFRESH, seal_link
+    server = FederatedServer(free_port(), KEY, 'mesh-test', 'tester', "local")
+    for origin, usernames in (("gone/0001", b"alice"), ("live/0002", b"bob")):
+        frame = seal_link(server.mesh, MESH_MEMBERS, origin, 1, usernames)
+        server.handle_link_frame(None, MESH_MEMBERS, frame[HEADER_SIZE:])
+    server.seen["gone/0001"].heard -= 4 * MESH_REFRESH
+    node, members = "gone", server.remote_members["gone"]
+    server.remote_members[node] = members[:3] + (members[3] - 4 * MESH_REFRESH,) + members[4:]
+
+    server.forget_quiet_nodes(time.time() - 3 * MESH_REFRESH)
+    if set(server.seen) != {"live/0002"} or set(server.remote_members) != {"live"}:
+        print(f"❌ Kept {sorted(server.seen)} and {sorted(server.remote_members)}")
+        return False
+    print("✅ Quiet node forgotten, live node kept - OK")
+    return True
+
+def main():
+    print("🚀 Ghostwire Federation Test")
+    print("=" * 50)
+
+    tests = [
+        ("Mesh Room", test_mesh_room),
+        ("Peer Authentication", test_peer_needs_room_key),
+        ("Reflected Authentication", test_reflected_auth_refused),
+        ("Lost Link Members", test_dropped_link_forgets_its_members),
+        ("Quiet Nodes", test_quiet_nodes_forgotten)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the Ghostwire edge gateway (--relay)
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FrameReader, encode_hello
+from ghostwire_crypto import get_codec
+
+KEY = pad(b"edgeaedgebedgec", 16)
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_room_and_gateway():
+    """A threaded room server and a gateway in front of it"""
+    from ghostwire_simple import GhostwireServer
+    from ghostwire_gateway import GhostwireGateway
+    server = GhostwireServer(free_port(), KEY, 'gateway-test', 'tester')
+    threading.Thread(target=server.start, daemon=True).start()
+    time.sleep(0.3)
+    gateway = GhostwireGateway(free_port(), '127.0.0.1', server.port, name='edge')
+    threading.Thread(target=gateway.start, daemon=True).start()
+    time.sleep(0.3)
+    return server, gateway
+
+def test_gateway_room():
+    """Members behind the gateway share the room with direct members"""
+    print("🛰️ Testing members behind a gateway...")
+    from ghostwire_simple import connect_room
+    server, gateway = start_room_and_gateway()
+    sockets = []
+    try:
+        def join(port, name):
+            sock, reader, codec = connect_room('127.0.0.1', port, KEY, name)
+            sock.settimeout(3)
+            sockets.append(sock)
+            time.sleep(0.1)
+            return sock, reader, codec
+        read = lambda member: member[2].decode(*member[1].read_frame())
+
+        hub = join(server.port, "hub")
+        edge = [join(gateway.port, f"edge{i}") for i in range(3)]
+        if edge[0][2].suite == 'aes-cbc':
+            print("❌ Cipher negotiation did not pass through the gateway")
+            return False
+        for i, member in enumerate(edge):
+            for other in range(i + 1, 3):
+                if read(member) != f"[SYSTEM] edge{other} joined the room":
+                    print("❌ Join through the gateway not announced")
+                    return False
+        for i in range(3):
+            if read(hub) != f"[SYSTEM] edge{i} joined the room":
+                print("❌ Direct member did not see the gateway members join")
+                return False
+        print("✅ Handshakes pass through the gateway - OK")
+
+        fanouts, deliveries = gateway.fanouts, gateway.deliveries
+        hub[0].sendall(hub[2].encode("hello edge"))
+        if any(read(member) != "[hub]: hello edge" for member in edge):
+            print("❌ Broadcast did not reach the gateway members")
+            return False
+        if (gateway.fanouts - fanouts, gateway.deliveries - deliveries) != (1, 3):
+            print(f"❌ Broadcast crossed the link {gateway.fanouts - fanouts} times")
+            return False
+        print("✅ Broadcast crosses the link once for 3 members - OK")
+
+        edge[0][0].sendall(edge[0][2].encode("@edge2 psst"))
+        if read(edge[2]) != "[PRIVATE from edge0]: psst" or \
+                read(edge[0]) != "[SYSTEM] Private message sent to edge2":
+            print("❌ Private message between gateway members failed")
+            return False
+        edge[1][0].sendall(edge[1][2].encode("up to the hub"))
+        if read(hub) != "[edge1]: up to the hub":
+            print("❌ Gateway member's broadcast did not reach the room")
+            return False
+        for member in (edge[0], edge[2]):
+            read(member)
+        print("✅ Messages from gateway members - OK")
+
+        if len([sock for sock in server.clients if isinstance(sock, socket.socket)]) != 1:
+            print("❌ Gateway members hold their own server connections")
+            return False
+
+        # One-shot commands work through the gateway too
+        command = socket.create_connection(('127.0.0.1', gateway.port))
+        command.settimeout(3)
+        command.sendall(encode_hello("LIST_USERS_CMD"))
+        command_reader = FrameReader(command)
+        reply = get_codec(KEY).decode(*command_reader.read_frame())
+        closed = command_reader.read_frame() is None
+        command.close()
+        if "edge1" not in reply or not closed:
+            print(f"❌ Command through the gateway: {reply!r}")
+            return False
+        print("✅ One server connection, commands answered - OK")
+
+        edge[2][0].close()
+        if read(hub) != "[SYSTEM] edge2 left the room":
+            print("❌ Departure behind the gateway not noticed")
+            return False
+        gateway.stop()
+        left = sorted(read(hub) for _ in range(2))
+        if left != ["[SYSTEM] edge0 left the room", "[SYSTEM] edge1 left the room"]:
+            print(f"❌ Stopping the gateway left {left}")
+            return False
+        print("✅ Departures and gateway shutdown - OK")
+        return True
+    except (OSError, TypeError) as e:
+        print(f"❌ Gateway room failed: {e}")
+        return False
+    finally:
+        for sock in sockets:
+            sock.close()
+        gateway.stop()
+        server.stop()
+
+def main():
+    print("🚀 Ghostwire Gateway Test")
+    print("=" * 50)
+
+    tests = [
+        ("Gateway Room", test_gateway_room)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
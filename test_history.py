@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Test script for the Ghostwire room history (SINCE catch-up on join)
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FRAME_SEQ, parse_sequenced
+
+KEY = pad(b"histahistbhistc", 16)
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(**options):
+    from ghostwire_simple import GhostwireServer
+    server = GhostwireServer(free_port(), KEY, 'history-test', 'tester', **options)
+    threading.Thread(target=server.start, daemon=True).start()
+    time.sleep(0.3)
+    return server
+
+def test_history_ring():
+    """The ring keeps the newest messages within both limits, numbered without gaps"""
+    print("🧾 Testing the history ring...")
+    from ghostwire_history import MessageHistory
+
+    history = MessageHistory(3, 1000)
+    for i in range(5):
+        history.append(f"message {i}")
+    if [entry[0] for entry in history.since(0)] != [3, 4, 5] or history.first() != 3:
+        print("❌ Message limit not applied")
+        return False
+    if [entry[1] for entry in history.since(4)] != ["message 4"] or history.since(5):
+        print("❌ since() returned the wrong range")
+        return False
+
+    history = MessageHistory(100, 25)
+    for i in range(5):
+        history.append("x" * 10)
+    if len(history) != 2 or history.bytes != 20:
+        print(f"❌ Byte limit not applied: {len(history)} entries, {history.bytes} bytes")
+        return False
+    history.append("y" * 30)
+    if len(history) or history.sequence != 6:
+        print("❌ Oversized message should empty the ring but keep numbering")
+        return False
+
+    history = MessageHistory(100, 25)
+    for i in range(3):
+        history.append("é" * 5)  # 10 bytes in UTF-8
+    if len(history) != 2 or history.bytes != 20:
+        print(f"❌ Byte limit counted characters: {len(history)} entries, {history.bytes} bytes")
+        return False
+
+    history = MessageHistory(0)
+    history.append("not kept")
+    if history.since(0) or history.sequence != 1:
+        print("❌ Disabled history kept a message")
+        return False
+    print("✅ Message and byte limits - OK")
+    return True
+
+def test_catch_up_on_join():
+    """A late member gets the backlog, then live messages, each exactly once"""
+    print("\n⏪ Testing catch-up on join...")
+    from ghostwire_simple import RoomSession, connect_room
+    server = start_server()
+    sockets = []
+    try:
+        alice = connect_room('127.0.0.1', server.port, KEY, "alice")
+        sockets.append(alice[0])
+        for i in range(3):
+            alice[0].sendall(alice[2].encode(f"message {i}"))
+        time.sleep(0.2)
+
+        def read(session):
+            frame_type, payload = session.reader.read_frame()
+            if frame_type != FRAME_SEQ:
+                return None
+            return parse_sequenced(payload)[0], session.receive(frame_type, payload)
+
+        bob = RoomSession('127.0.0.1', server.port, KEY, "bob")
+        bob.socket.settimeout(3)
+        sockets.append(bob.socket)
+        backlog = [read(bob) for _ in range(4)]
+        if backlog != [(1, "[SYSTEM] alice joined the room"), (2, "[alice]: message 0"),
+                       (3, "[alice]: message 1"), (4, "[alice]: message 2")]:
+            print(f"❌ Unexpected backlog: {backlog}")
+            return False
+        alice[0].settimeout(3)
+        alice[2].decode(*alice[1].read_frame())  # bob joined
+        print("✅ Backlog replayed in order - OK")
+
+        alice[0].sendall(alice[2].encode("live"))
+        if read(bob) != (6, "[alice]: live"):
+            print("❌ Live message after the backlog not numbered")
+            return False
+
+        # Rejoining with the last number seen only brings what was missed
+        bob.socket.close()
+        alice[2].decode(*alice[1].read_frame())  # bob left
+        alice[0].sendall(alice[2].encode("while away"))
+        time.sleep(0.2)
+        bob.connect()
+        bob.socket.settimeout(3)
+        sockets.append(bob.socket)
+        if [read(bob), read(bob)] != [(7, "[SYSTEM] bob left the room"), (8, "[alice]: while away")]:
+            print("❌ Rejoin did not resume after the last message seen")
+            return False
+        alice[0].sendall(alice[2].encode("after"))
+        if read(bob) != (10, "[alice]: after"):
+            print("❌ Message repeated or lost after rejoining")
+            return False
+        if bob.receive(FRAME_SEQ, b"".join([(8).to_bytes(8, 'big'), alice[2].encode("old")])) is not None:
+            print("❌ Already seen message shown twice")
+            return False
+        print("✅ Rejoin resumes without repeats - OK")
+
+        # Members that do not ask for history get plain frames
+        alice[2].decode(*alice[1].read_frame())  # bob joined again
+        bob.send("hi alice")
+        frame_type, payload = alice[1].read_frame()
+        if frame_type == FRAME_SEQ or alice[2].decode(frame_type, payload) != "[bob]: hi alice":
+            print("❌ Member without SINCE got numbered frames")
+            return False
+        stats = server.get_stats()
+        if stats['sequence'] != 11 or stats['history'] != 11:
+            print(f"❌ Unexpected history stats: {stats['sequence']}, {stats['history']}")
+            return False
+        print("✅ Members without SINCE unchanged - OK")
+        return True
+    except (OSError, TypeError) as e:
+        print(f"❌ Catch-up failed: {e}")
+        return False
+    finally:
+        for sock in sockets:
+            sock.close()
+        server.stop()
+
+def test_rejoin_other_epoch():
+    """Rejoining a server with another history epoch starts the numbering over"""
+    print("\n🔄 Testing rejoin on a server with another history...")
+    from ghostwire_simple import RoomSession, connect_room
+    first, second = start_server(), start_server()  # E.g. two workers, or a restart without --log
+    sockets = []
+    try:
+        bob = RoomSession('127.0.0.1', first.port, KEY, "bob")
+        bob.socket.settimeout(3)
+        sockets.append(bob.socket)
+        alice = connect_room('127.0.0.1', first.port, KEY, "alice")
+        sockets.append(alice[0])
+        for i in range(5):
+            alice[0].sendall(alice[2].encode(f"old {i}"))
+        for _ in range(6):
+            bob.receive(*bob.reader.read_frame())
+        if bob.last_sequence != 7 or bob.epoch != first.history.epoch:
+            print(f"❌ Unexpected first join: last {bob.last_sequence}, epoch {bob.epoch}")
+            return False
+
+        carol = connect_room('127.0.0.1', second.port, KEY, "carol")
+        sockets.append(carol[0])
+        for i in range(10):  # Numbered past what bob has seen, so only the epoch tells them apart
+            carol[0].sendall(carol[2].encode(f"fresh {i}"))
+        time.sleep(0.2)
+        bob.socket.close()
+        bob.port = second.port
+        bob.connect()
+        bob.socket.settimeout(3)
+        sockets.append(bob.socket)
+        backlog = [bob.receive(*bob.reader.read_frame()) for _ in range(11)]
+        if backlog != ["[SYSTEM] carol joined the room"] + [f"[carol]: fresh {i}" for i in range(10)]:
+            print(f"❌ Backlog of the other epoch not shown: {backlog}")
+            return False
+        if bob.epoch != second.history.epoch or bob.last_sequence != 11:
+            print(f"❌ Numbering not started over: last {bob.last_sequence}")
+            return False
+        print("✅ Other epoch detected, whole backlog shown - OK")
+        return True
+    except (OSError, TypeError) as e:
+        print(f"❌ Rejoin failed: {e}")
+        return False
+    finally:
+        for sock in sockets:
+            sock.close()
+        first.stop()
+        second.stop()
+
+def test_relay_history():
+    """Relayed frames are kept as received and replayed in each member's format"""
+    print("\n🔐 Testing relay frames in the history...")
+    from ghostwire_simple import connect_room
+    server = start_server(opaque=True)
+    sockets = []
+    try:
+        alice = connect_room('127.0.0.1', server.port, KEY, "alice")
+        sockets.append(alice[0])
+        if not alice[2].relay:
+            print("❌ Opaque server did not accept relay frames")
+            return False
+        alice[0].sendall(alice[2].encode("sealed hello"))
+        time.sleep(0.2)
+
+        relay = connect_room('127.0.0.1', server.port, KEY, "bob", since=1)
+        plain = connect_room('127.0.0.1', server.port, KEY, "carol", relay=False, since=1)
+        for member in (relay, plain):
+            sockets.append(member[0])
+            member[0].settimeout(3)
+            frame_type, payload = member[1].read_frame()
+            if frame_type != FRAME_SEQ or member[2].decode(frame_type, payload) != "[alice]: sealed hello":
+                print("❌ Relay message not replayed")
+                return False
+        print("✅ Relay frames replayed to relay and plain members - OK")
+        return True
+    except (OSError, TypeError) as e:
+        print(f"❌ Relay history failed: {e}")
+        return False
+    finally:
+        for sock in sockets:
+            sock.close()
+        server.stop()
+
+def test_fanout_outside_history_lock():
+    """Broadcasts are queued after the history lock is released"""
+    print("\n🔓 Testing fan-out outside the history lock...")
+    from ghostwire_simple import RoomSession
+    server = start_server()
+    sockets = []
+    try:
+        bob = RoomSession('127.0.0.1', server.port, KEY, "bob")
+        sockets.append(bob.socket)
+        time.sleep(0.2)
+
+        lock_free = []
+        send_text = server.send_text
+        def checked_send_text(*args, **kwargs):
+            # Another thread, e.g. a member joining, must be able to take the lock now
+            probe = threading.Thread(target=lambda: lock_free.append(server.history.lock.acquire(timeout=1)
+                                                                     and server.history.lock.release() is None))
+            probe.start()
+            probe.join()
+            return send_text(*args, **kwargs)
+        server.send_text = checked_send_text
+        server.broadcast_to_all("[SYSTEM] announcement")
+        server.send_text = send_text
+        if lock_free != [True]:
+            print(f"❌ History lock held while queueing: {lock_free}")
+            return False
+        print("✅ Joins do not wait on the fan-out - OK")
+
+        # Messages from different senders may arrive out of order; none is dropped
+        codec = bob.codec
+        frames = [(sequence, codec.encode(f"[x]: {sequence}")) for sequence in (101, 100, 101)]
+        shown = [bob.receive(FRAME_SEQ, sequence.to_bytes(8, 'big') + frame) for sequence, frame in frames]
+        if shown != ["[x]: 101", "[x]: 100", None]:
+            print(f"❌ Out of order messages handled as {shown}")
+            return False
+        print("✅ Out of order numbers shown once each - OK")
+        return True
+    finally:
+        for sock in sockets:
+            sock.close()
+        server.stop()
+
+def main():
+    print("🚀 Ghostwire History Test")
+    print("=" * 50)
+
+    tests = [
+        ("History Ring", test_history_ring),
+        ("Catch-up on Join", test_catch_up_on_join),
+        ("Rejoin Other Epoch", test_rejoin_other_epoch),
+        ("Relay History", test_relay_history),
+        ("Fan-out Outside Lock", test_fanout_outside_history_lock)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test script for the Ghostwire history log (--log)
+"""
+
+import sys
+import os
+import socket
+import tempfile
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+
+KEY = pad(b"logalogblogc", 16)
+T0 = 1700000000.0
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def test_segments_and_seek():
+    """Records roll over into segments and are found by sequence number or time"""
+    print("📚 Testing segments and seeking...")
+    from ghostwire_log import MessageLog, RECORD
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = MessageLog(directory, segment_bytes=8192, index_interval=512, sync_interval=0)
+        for sequence in range(1, 2001):
+            log.append(sequence, f"record {sequence}".encode(), T0 + sequence)
+        if len(log.segments) < 5:
+            print(f"❌ Expected several segments, got {len(log.segments)}")
+            return False
+
+        records = list(log.read_from(1234))
+        if len(records) != 767 or records[0][0] != 1234 or records[-1][2] != b"record 2000":
+            print("❌ read_from() returned the wrong records")
+            return False
+        if next(log.read_since(T0 + 1500.5))[0] != 1501 or list(log.read_since(T0 + 5000)):
+            print("❌ read_since() returned the wrong records")
+            return False
+        if next(log.read_from(1))[0] != 1 or list(log.read_from(2001)):
+            print("❌ Log edges not handled")
+            return False
+
+        # The index lands within one index interval of the record asked for
+        segment = [s for s in log.segments if s.base <= 1234][-1]
+        first = next(segment.scan(segment.seek(0, 1234), segment.size))[0]
+        per_interval = 512 // (RECORD.size + len(b"record 1234")) + 1
+        if not 1234 - per_interval <= first <= 1234:
+            print(f"❌ Index pointed at record {first} for 1234")
+            return False
+        log.close()
+        print(f"✅ {len(log.segments)} segments, seek by sequence and time - OK")
+    return True
+
+def test_reopen_and_recover():
+    """A reopened log carries on; a torn last record is cut off"""
+    print("\n💾 Testing reopening and recovery...")
+    from ghostwire_log import MessageLog
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = MessageLog(directory, segment_bytes=4096, index_interval=256)
+        started = time.perf_counter()
+        for sequence in range(1, 501):
+            log.append(sequence, b"x" * 40)
+        appended = time.perf_counter() - started
+        log.close()
+
+        log = MessageLog(directory, segment_bytes=4096, index_interval=256)
+        if log.last_sequence != 500:
+            print(f"❌ Reopened log ends at {log.last_sequence}")
+            return False
+        try:
+            log.append(500, b"again")
+            print("❌ Repeated sequence number accepted")
+            return False
+        except ValueError:
+            pass
+        log.append(501, b"y" * 40)
+        log.close()
+        print(f"✅ Reopened at 500, group commit appended 500 records in {appended * 1000:.1f} ms - OK")
+
+        # Cut the last record in half, as a crash during a write would
+        last = sorted(name for name in os.listdir(directory) if name.endswith('.log'))[-1]
+        path = os.path.join(directory, last)
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 20)
+        log = MessageLog(directory, segment_bytes=4096, index_interval=256)
+        if log.last_sequence != 500 or list(log.read_from(500))[-1][0] != 500:
+            print("❌ Torn record not cut off")
+            return False
+        log.append(501, b"z" * 40)
+        if [record[2] for record in log.read_from(501)] != [b"z" * 40]:
+            print("❌ Could not append after recovery")
+            return False
+        log.close()
+        print("✅ Torn tail cut off and log continued - OK")
+    return True
+
+def test_archive_seals_off_the_lock():
+    """Archived messages are sealed and written by the syncer, not under the history lock"""
+    print("\n🔏 Testing deferred archive writes...")
+    from ghostwire_log import HistoryArchive, MessageLog
+    from ghostwire_history import MessageHistory
+    with tempfile.TemporaryDirectory() as directory:
+        log = MessageLog(directory, sync_interval=60)  # No group commit during the test
+        archive = HistoryArchive(log, KEY)
+        history = MessageHistory(2, 1 << 20, archive)
+        for i in range(50):
+            history.append(f"queued {i}")
+        if log.last_sequence != 0:
+            print(f"❌ {log.last_sequence} records written while the history lock was held")
+            return False
+        backlog = [entry[1] for entry in archive.entries(1)]
+        if backlog != [f"queued {i}" for i in range(50)]:
+            print("❌ Queued entries missing from the archived backlog")
+            return False
+        history.append("last one")
+        history.close()
+
+        archive = HistoryArchive(MessageLog(directory, sync_interval=0), KEY)
+        if archive.last_sequence != 51 or next(archive.entries(51))[1] != "last one":
+            print(f"❌ Reopened archive ends at {archive.last_sequence}")
+            return False
+        archive.close()
+        print("✅ Entries queued under the lock, sealed and kept on disk - OK")
+    return True
+
+def test_server_history_survives_restart():
+    """With --log a restarted server keeps its history and its numbering"""
+    print("\n🔁 Testing room history across a restart...")
+    from ghostwire_simple import GhostwireServer, RoomSession, connect_room
+    with tempfile.TemporaryDirectory() as directory:
+        def start():
+            server = GhostwireServer(free_port(), KEY, 'log-test', 'tester', log_dir=directory)
+            threading.Thread(target=server.start, daemon=True).start()
+            time.sleep(0.3)
+            return server
+
+        server = start()
+        alice = connect_room('127.0.0.1', server.port, KEY, "alice")
+        for i in range(3):
+            alice[0].sendall(alice[2].encode(f"before restart {i}"))
+        time.sleep(0.2)
+        alice[0].close()
+        time.sleep(0.2)
+        epoch = server.history.epoch
+        server.stop()
+        if not any(name.endswith('.log') for name in os.listdir(directory)):
+            print("❌ Nothing written to the log directory")
+            return False
+        if b"before restart" in b"".join(open(os.path.join(directory, name), 'rb').read()
+                                         for name in os.listdir(directory)):
+            print("❌ Message text stored unencrypted")
+            return False
+
+        server = start()
+        try:
+            bob = RoomSession('127.0.0.1', server.port, KEY, "bob")
+            bob.socket.settimeout(3)
+            seen = []
+            while len(seen) < 5:
+                message = bob.receive(*bob.reader.read_frame())
+                if message is not None:
+                    seen.append(message)
+            bob.close()
+            expected = ["[SYSTEM] alice joined the room"] + [f"[alice]: before restart {i}" for i in range(3)] + \
+                       ["[SYSTEM] alice left the room"]
+            if seen != expected or bob.last_sequence != 5 or bob.epoch != epoch:
+                print(f"❌ Unexpected history after restart: {seen} (last {bob.last_sequence})")
+                return False
+            print("✅ History and numbering survive a restart - OK")
+            return True
+        except (OSError, TypeError) as e:
+            print(f"❌ Restart failed: {e}")
+            return False
+        finally:
+            server.stop()
+
+def main():
+    print("🚀 Ghostwire Log Test")
+    print("=" * 50)
+
+    tests = [
+        ("Segments and Seek", test_segments_and_seek),
+        ("Reopen and Recover", test_reopen_and_recover),
+        ("Deferred Archive", test_archive_seals_off_the_lock),
+        ("History Across Restart", test_server_history_survives_restart)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for the Ghostwire binary wire framing
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+import base64
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import (FRAME_HELLO, FRAME_DATA, FrameDecoder, FrameReader,
+                                ProtocolError, encode_frame, encode_hello, parse_hello)
+
+KEY = pad(b"frameaframebframec", 16)
+
+def test_decoder_boundaries():
+    """Frames split across reads and coalesced reads both decode"""
+    print("🔧 Testing streaming frame decoder...")
+
+    frames = [encode_frame(FRAME_DATA, bytes([i]) * (i * 700)) for i in range(1, 6)]
+    stream = encode_hello("alice") + b"".join(frames)
+
+    # One byte at a time
+    decoder = FrameDecoder()
+    decoded = []
+    for i in range(len(stream)):
+        decoded.extend(decoder.feed(stream[i:i + 1]))
+
+    if len(decoded) != 6 or decoded[0] != (FRAME_HELLO, b"USERNAME:alice"):
+        print(f"❌ Byte-wise decode produced {len(decoded)} frames")
+        return False
+    if [len(payload) for _, payload in decoded[1:]] != [700, 1400, 2100, 2800, 3500]:
+        print("❌ Byte-wise decode produced wrong payload sizes")
+        return False
+    print("✅ Split frames - OK")
+
+    # Everything in a single chunk
+    decoded = FrameDecoder().feed(stream)
+    if len(decoded) != 6 or parse_hello(decoded[0][1]) != "alice":
+        print("❌ Coalesced frames not separated")
+        return False
+    print("✅ Coalesced frames - OK")
+
+    decoder = FrameDecoder(max_frame_size=1024)
+    try:
+        decoder.feed(encode_frame(FRAME_DATA, b"x" * 2048))
+        print("❌ Oversized frame accepted")
+        return False
+    except ProtocolError:
+        print("✅ Oversized frame rejected - OK")
+
+    return True
+
+def test_large_messages_through_server():
+    """Messages well over 1KB and back-to-back sends survive the server"""
+    print("\n📡 Testing large and back-to-back messages...")
+    from ghostwire_simple import GhostwireServer
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    server = GhostwireServer(port, KEY, 'frame-test', 'tester')
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+    time.sleep(0.3)
+
+    try:
+        receiver = socket.create_connection(('127.0.0.1', port))
+        receiver.settimeout(3)
+        receiver.sendall(encode_hello("receiver"))
+        reader = FrameReader(receiver)
+        time.sleep(0.1)
+
+        sender = socket.create_connection(('127.0.0.1', port))
+        sender.sendall(encode_hello("sender"))
+        reader.read_frame()  # "[SYSTEM] sender joined the room"
+
+        big = "G" * 3000
+        sender.sendall(server.encode_message(big) + server.encode_message("one") + server.encode_message("two"))
+
+        received = [server.decrypt_message(reader.read_frame()[1]) for _ in range(3)]
+        if received != [f"[sender]: {big}", "[sender]: one", "[sender]: two"]:
+            print("❌ Messages were corrupted or merged")
+            return False
+        print("✅ 3KB message and back-to-back sends - OK")
+
+        sender.close()
+        receiver.close()
+        time.sleep(0.2)
+    finally:
+        server.stop()
+
+    return True
+
+def test_wire_overhead():
+    """Binary frames are smaller than the old base64 text format"""
+    print("\n📏 Testing wire overhead...")
+    from ghostwire_simple import GhostwireServer
+
+    server = GhostwireServer(0, KEY, 'size-test', 'tester')
+    message = "x" * 1000
+    payload = server.encrypt_message(message)
+    old_format = (base64.b64encode(payload[:16]) + b" " + base64.b64encode(payload[16:]))
+    new_format = server.encode_message(message)
+
+    overhead = len(old_format) / len(new_format) - 1
+    print(f"📊 base64 text: {len(old_format)} bytes, binary frame: {len(new_format)} bytes ({overhead:.0%} extra for base64)")
+    return overhead > 0.3
+
+def main():
+    print("🚀 Ghostwire Wire Framing Test")
+    print("=" * 50)
+
+    tests = [
+        ("Decoder Boundaries", test_decoder_boundaries),
+        ("Large Messages", test_large_messages_through_server),
+        ("Wire Overhead", test_wire_overhead)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
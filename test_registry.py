@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire client bookkeeping and private message routing
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FrameReader, encode_hello
+
+KEY = pad(b"indexaindexbindexc", 16)
+
+def start_server():
+    """Run a threaded GhostwireServer in the background"""
+    from ghostwire_simple import GhostwireServer
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = GhostwireServer(port, KEY, 'index-test', 'tester')
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+    time.sleep(0.3)
+    return server
+
+def join(server, username):
+    """Connect a member and return its socket and frame reader"""
+    sock = socket.create_connection(('127.0.0.1', server.port))
+    sock.settimeout(3)
+    sock.sendall(encode_hello(username))
+    time.sleep(0.1)
+    return sock, FrameReader(sock)
+
+def test_multi_session_routing():
+    """Private messages reach every session of the target user"""
+    print("🔧 Testing username index routing...")
+    server = start_server()
+
+    try:
+        bob_laptop, laptop_reader = join(server, "bob")
+        bob_phone, phone_reader = join(server, "bob")
+        alice, _ = join(server, "alice")
+        laptop_reader.read_frame()  # "[SYSTEM] bob joined the room" (phone)
+        for reader in (laptop_reader, phone_reader):
+            reader.read_frame()     # "[SYSTEM] alice joined the room"
+
+        if server.clients.sessions_of("bob") != {s for s, info in server.clients.items() if info['username'] == "bob"}:
+            print("❌ Session index out of sync with connected clients")
+            return False
+
+        alice.sendall(server.encode_message("@bob ping"))
+        for reader in (laptop_reader, phone_reader):
+            received = server.decrypt_message(reader.read_frame()[1])
+            if received != "[PRIVATE from alice]: ping":
+                print(f"❌ Session missed private message, got: {received}")
+                return False
+        print("✅ Private message delivered to both sessions - OK")
+
+        bob_phone.close()
+        time.sleep(0.2)
+        if len(server.clients.sessions_of("bob")) != 1:
+            print("❌ Closed session still indexed")
+            return False
+        bob_laptop.close()
+        time.sleep(0.2)
+        if server.clients.sessions_of("bob"):
+            print("❌ User still indexed after last session left")
+            return False
+        print("✅ Index updated on leave - OK")
+
+        alice.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        server.stop()
+
+def test_registry_snapshot():
+    """Iteration walks a snapshot that later joins and leaves do not touch"""
+    print("\n📸 Testing registry snapshots...")
+    from ghostwire_registry import ClientRegistry
+
+    registry = ClientRegistry()
+    for i in range(3):
+        registry.add(i, {'username': f"user{i}"})
+    iterator = iter(registry)
+    registry.add(3, {'username': "user3"})
+    registry.remove(0)
+    if sorted(iterator) != [0, 1, 2]:
+        print("❌ Snapshot changed while iterating")
+        return False
+    if sorted(registry) != [1, 2, 3] or registry.usernames().count("user1") != 1:
+        print("❌ Registry out of date after changes")
+        return False
+    registry.add(4, {'username': "user1"})
+    if registry.sessions_of("user1") != {1, 4} or registry.remove(4)['username'] != "user1":
+        print("❌ Session index not maintained")
+        return False
+    print("✅ Snapshot iteration - OK")
+    return True
+
+def test_join_leave_churn():
+    """Broadcasts keep flowing while members join and leave concurrently"""
+    print("\n🌪️  Testing join/leave churn during broadcasts...")
+    server = start_server()
+    errors = []
+    original_remove = server.remove_one_client
+
+    def tracked_remove(client_socket):
+        try:
+            original_remove(client_socket)
+        except Exception as e:
+            errors.append(e)
+            raise
+    server.remove_one_client = tracked_remove
+
+    try:
+        listener, reader = join(server, "listener")
+        sender, _ = join(server, "sender")
+        stop = threading.Event()
+
+        def churn(worker):
+            while not stop.is_set():
+                sock = socket.create_connection(('127.0.0.1', server.port))
+                sock.sendall(encode_hello(f"churn{worker}"))
+                time.sleep(0.005)
+                sock.close()
+
+        def drain():
+            try:
+                while reader.read_frame():
+                    pass
+            except OSError:
+                pass
+
+        threads = [threading.Thread(target=churn, args=(i,)) for i in range(4)]
+        threads.append(threading.Thread(target=drain, daemon=True))
+        for thread in threads:
+            thread.start()
+        frame = server.encode_message("tick")
+        for _ in range(500):
+            sender.sendall(frame)
+            time.sleep(0.002)
+        stop.set()
+        for thread in threads[:-1]:
+            thread.join()
+        time.sleep(0.3)
+
+        if errors:
+            print(f"❌ Errors during churn: {errors[:3]}")
+            return False
+        if len(server.clients) != 2:
+            print(f"❌ Expected 2 members after churn, registry has {len(server.clients)}")
+            return False
+        print("✅ No errors and registry consistent after churn - OK")
+
+        listener.close()
+        sender.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        server.stop()
+
+def main():
+    print("🚀 Ghostwire Client Registry Test")
+    print("=" * 50)
+
+    tests = [
+        ("Multi-session Routing", test_multi_session_routing),
+        ("Registry Snapshot", test_registry_snapshot),
+        ("Join/Leave Churn", test_join_leave_churn)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire opaque relay mode (--opaque)
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import (FRAME_DATA, FRAME_RELAY, FrameReader, encode_hello,
+                                encode_relay_header, parse_relay_header)
+from ghostwire_crypto import SUITE_CHACHA, SUITE_GCM, RelayCodec, get_context
+
+KEY = pad(b"relayarelaybrelayc", 16)
+
+def start_server(opaque=True):
+    """Run a threaded GhostwireServer in the background"""
+    from ghostwire_simple import GhostwireServer
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = GhostwireServer(port, KEY, 'relay-test', 'tester', opaque=opaque)
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+    time.sleep(0.3)
+    return server
+
+def test_relay_codec():
+    """Relay frames carry an authenticated header in front of the sealed message"""
+    print("🔧 Testing relay codec...")
+    alice = RelayCodec(get_context(KEY, SUITE_CHACHA), "alice")
+    frame = alice.encode("@bob meet at noon")
+    payload = frame[5:]
+    if frame[4] != FRAME_RELAY or parse_relay_header(payload)[:2] != ("alice", "bob"):
+        print("❌ Relay header missing or wrong")
+        return False
+    if alice.decode(FRAME_RELAY, payload) != "[PRIVATE from alice]: meet at noon":
+        print("❌ Relay round trip failed")
+        return False
+    if alice.decode(FRAME_RELAY, alice.encode("hello all")[5:]) != "[alice]: hello all":
+        print("❌ Public relay round trip failed")
+        return False
+    print("✅ Relay round trip - OK")
+
+    # Swapping the header for another sender must break the tag
+    header_size = parse_relay_header(payload)[2]
+    forged = encode_relay_header("mallory", "bob") + payload[header_size:]
+    if alice.decode(FRAME_RELAY, forged) is not None:
+        print("❌ Rewritten header accepted")
+        return False
+    print("✅ Header is authenticated - OK")
+    return True
+
+def test_opaque_room():
+    """Relay members get the sender's bytes unchanged, others a translated copy"""
+    print("\n📡 Testing opaque relay room...")
+    from ghostwire_simple import connect_room
+    server = start_server()
+
+    try:
+        legacy = socket.create_connection(('127.0.0.1', server.port))
+        legacy.settimeout(3)
+        legacy.sendall(encode_hello("legacy"))
+        legacy_reader = FrameReader(legacy)
+        time.sleep(0.1)
+
+        gcm_socket, gcm_reader, gcm = connect_room('127.0.0.1', server.port, KEY, "gcm", ciphers=(SUITE_GCM,))
+        bob_socket, bob_reader, bob = connect_room('127.0.0.1', server.port, KEY, "bob")
+        alice_socket, alice_reader, alice = connect_room('127.0.0.1', server.port, KEY, "alice")
+        for sock in (gcm_socket, bob_socket, alice_socket):
+            sock.settimeout(3)
+        if not (alice.relay and bob.relay and gcm.relay):
+            print("❌ Relay not negotiated")
+            return False
+
+        for _ in range(3):
+            legacy_reader.read_frame()  # gcm, bob, alice joined
+        for _ in range(2):
+            gcm_reader.read_frame()     # bob, alice joined
+        bob_reader.read_frame()         # alice joined
+
+        frame = alice.encode("hello room")
+        alice_socket.sendall(frame)
+        if bob_reader.read_frame() != (FRAME_RELAY, frame[5:]):
+            print("❌ Same-suite member did not get the original bytes")
+            return False
+        frame_type, payload = gcm_reader.read_frame()
+        if gcm.decode(frame_type, payload) != "[alice]: hello room":
+            print("❌ Member on another suite did not get a translated copy")
+            return False
+        frame_type, payload = legacy_reader.read_frame()
+        if frame_type != FRAME_DATA or server.decrypt_message(payload) != "[alice]: hello room":
+            print("❌ Legacy member did not get an AES-CBC copy")
+            return False
+        print("✅ Forwarded unchanged to relay members, translated for the rest - OK")
+
+        alice_socket.sendall(alice.encode("@bob just you"))
+        frame_type, payload = bob_reader.read_frame()
+        if bob.decode(frame_type, payload) != "[PRIVATE from alice]: just you":
+            print("❌ Private relay not delivered")
+            return False
+        frame_type, payload = alice_reader.read_frame()
+        if alice.decode(frame_type, payload) != "[SYSTEM] Private message sent to bob":
+            print("❌ Private relay not confirmed")
+            return False
+        print("✅ Private relay and confirmation - OK")
+
+        # A member may not relay in someone else's name
+        mallory = RelayCodec(get_context(KEY, SUITE_CHACHA), "bob")
+        alice_socket.sendall(mallory.encode("spoofed"))
+        alice_socket.sendall(alice.encode("after spoof"))
+        frame_type, payload = bob_reader.read_frame()
+        if bob.decode(frame_type, payload) != "[alice]: after spoof":
+            print("❌ Spoofed sender was relayed")
+            return False
+        time.sleep(0.1)
+        stats = server.get_stats()
+        if stats['rejected'] != 1 or stats['relayed'] != 3:
+            print(f"❌ Unexpected counters: rejected={stats['rejected']} relayed={stats['relayed']}")
+            return False
+        print("✅ Spoofed sender rejected, relayed frames counted - OK")
+
+        for sock in (legacy, gcm_socket, bob_socket, alice_socket):
+            sock.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        server.stop()
+
+def test_relay_needs_opaque_server():
+    """Without --opaque the server does not offer relaying"""
+    print("\n🔒 Testing relay negotiation on a normal server...")
+    from ghostwire_simple import connect_room
+    server = start_server(opaque=False)
+    try:
+        client_socket, _, codec = connect_room('127.0.0.1', server.port, KEY, "plain")
+        client_socket.close()
+        if codec.relay:
+            print("❌ Relay negotiated without --opaque")
+            return False
+        print("✅ Plain AEAD without --opaque - OK")
+        return True
+    finally:
+        time.sleep(0.1)
+        server.stop()
+
+def main():
+    print("🚀 Ghostwire Opaque Relay Test")
+    print("=" * 50)
+
+    tests = [
+        ("Relay Codec", test_relay_codec),
+        ("Opaque Room", test_opaque_room),
+        ("Relay Negotiation", test_relay_needs_opaque_server)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
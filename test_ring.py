@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for the Ghostwire shared-memory ring used by --workers
+"""
+
+import sys
+import os
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from ghostwire_ring import SharedRing, create_doorbells
+
+def test_ring_order_and_wrap():
+    """Records come out in order, across many laps of a small ring"""
+    print("🔧 Testing ring order and wrap-around...")
+    ring = SharedRing(1024)
+    reader = ring.reader()
+    expected = []
+    received = []
+    for i in range(500):
+        record = os.urandom(i % 150)
+        if not ring.publish(record):
+            print(f"❌ {len(record)}-byte record refused")
+            return False
+        expected.append(record)
+        if i % 2 == 1:
+            received.extend(reader.read())
+    received.extend(reader.read())
+    if received != expected or reader.lost:
+        print(f"❌ Got {len(received)} of {len(expected)} records, {reader.lost} lost")
+        return False
+    if ring.publish(b"x" * ring.capacity):
+        print("❌ Oversized record accepted")
+        return False
+    print("✅ 500 records over many laps, in order - OK")
+    return True
+
+def test_lapped_reader():
+    """A reader that falls behind skips ahead and reports the loss"""
+    print("\n🐢 Testing a lapped reader...")
+    ring = SharedRing(1024)
+    reader = ring.reader()
+    for i in range(100):
+        ring.publish(b"%03d" % i + b"." * 60)
+    if reader.read() != [] or not reader.lost:
+        print("❌ Lapped reader did not report a loss")
+        return False
+    ring.publish(b"fresh")
+    if reader.read() != [b"fresh"]:
+        print("❌ Reader did not resume after skipping")
+        return False
+    print(f"✅ Skipped ahead after losing {reader.lost} lap(s) - OK")
+    return True
+
+def test_cross_process():
+    """A forked writer's records reach the parent, which sleeps on its doorbell"""
+    print("\n🔔 Testing cross-process publish and wakeup...")
+    ring = SharedRing()
+    doorbell, = create_doorbells(1)
+    reader = ring.reader()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            for i in range(1000):
+                ring.publish(b"message %d" % i)
+                if i % 100 == 99:
+                    doorbell.ring()
+                    time.sleep(0.01)
+        finally:
+            os._exit(0)
+
+    received = []
+    deadline = time.time() + 5
+    while len(received) < 1000 and time.time() < deadline:
+        records = reader.read()
+        if records:
+            received.extend(records)
+        else:
+            doorbell.wait(1.0, reader.pending)
+    os.waitpid(pid, 0)
+    if received != [b"message %d" % i for i in range(1000)]:
+        print(f"❌ Got {len(received)} records from the other process")
+        return False
+    print("✅ 1000 records read from another process - OK")
+    return True
+
+def test_broadcast_body():
+    """Broadcast bodies carry the text and the frames encrypted so far"""
+    print("\n📦 Testing broadcast bodies...")
+    from ghostwire_workers import pack_broadcast, unpack_broadcast
+    frames = {'aes-cbc': os.urandom(37), 'chacha20-poly1305': os.urandom(50)}
+    if unpack_broadcast(pack_broadcast("héllo", frames)) != ("héllo", frames):
+        print("❌ Broadcast body round trip failed")
+        return False
+    print("✅ Broadcast body round trip - OK")
+    return True
+
+def main():
+    print("🚀 Ghostwire Ring Test")
+    print("=" * 50)
+
+    tests = [
+        ("Order and Wrap", test_ring_order_and_wrap),
+        ("Lapped Reader", test_lapped_reader),
+        ("Cross Process", test_cross_process),
+        ("Broadcast Body", test_broadcast_body)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire multi-room hosting (--rooms)
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FrameReader, encode_hello
+
+LOBBY_KEY = pad(b"lobbyalobbyblobbyc", 16)
+OPS_KEY = pad(b"opsaopsbopsc", 16)
+
+def start_host(rooms=200):
+    """Host lobby (default), ops and many small rooms on one port"""
+    from ghostwire_rooms import RoomHost
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    host = RoomHost(port, default_room='lobby')
+    host.store = None  # Keep this run's users in memory, apart from other runs
+    host.add_room('lobby', LOBBY_KEY, 'tester')
+    host.add_room('ops', OPS_KEY, 'tester')
+    for i in range(rooms - 2):
+        host.add_room(f"room{i}", pad(f"room{i}key".encode(), 16), 'tester')
+    host_thread = threading.Thread(target=host.start)
+    host_thread.daemon = True
+    host_thread.start()
+    time.sleep(0.3)
+    return host
+
+def test_rooms_are_isolated():
+    """Each room keeps its own key, members and counters"""
+    print("🏠 Testing isolated rooms on one port...")
+    from ghostwire_simple import connect_room
+    threads_before = threading.active_count()
+    host = start_host()
+    try:
+        if threading.active_count() - threads_before != 1:
+            print(f"❌ 200 rooms started {threading.active_count() - threads_before} threads")
+            return False
+        print("✅ 200 rooms share one accept thread - OK")
+
+        alice_socket, alice_reader, alice = connect_room('127.0.0.1', host.port, LOBBY_KEY, "alice", room='lobby')
+        bob_socket, bob_reader, bob = connect_room('127.0.0.1', host.port, OPS_KEY, "bob", room='ops')
+        carol_socket, carol_reader, carol = connect_room('127.0.0.1', host.port, OPS_KEY, "carol", room='ops')
+        for sock in (alice_socket, bob_socket, carol_socket):
+            sock.settimeout(3)
+        bob_reader.read_frame()  # "[SYSTEM] carol joined the room"
+
+        carol_socket.sendall(carol.encode("ops only"))
+        if bob.decode(*bob_reader.read_frame()) != "[carol]: ops only":
+            print("❌ Message not delivered inside the room")
+            return False
+        alice_socket.settimeout(0.3)
+        try:
+            alice_reader.read_frame()
+            print("❌ Message leaked into another room")
+            return False
+        except socket.timeout:
+            pass
+        print("✅ Messages stay in their room - OK")
+
+        if host.rooms['ops'].connected_users() != ['bob', 'carol'] or \
+                host.rooms['lobby'].connected_users() != ['alice']:
+            print("❌ Registries are not per room")
+            return False
+        stats = host.get_stats()
+        if stats['ops']['enqueued'] < 2 or stats['lobby']['enqueued'] != 0:
+            print(f"❌ Counters are not per room: {stats['ops']['enqueued']}, {stats['lobby']['enqueued']}")
+            return False
+        print("✅ Separate registries and stats - OK")
+
+        for sock in (alice_socket, bob_socket, carol_socket):
+            sock.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        host.stop()
+
+def test_room_selection():
+    """Clients without ROOM join the default room, unknown rooms are refused"""
+    print("\n🚪 Testing room selection...")
+    from ghostwire_simple import GhostwireServer
+    host = start_host(rooms=2)
+    try:
+        legacy = socket.create_connection(('127.0.0.1', host.port))
+        legacy.settimeout(3)
+        legacy.sendall(encode_hello("legacy"))
+        time.sleep(0.2)
+        if host.rooms['lobby'].connected_users() != ['legacy']:
+            print("❌ Client without a room did not join the default room")
+            return False
+        print("✅ Legacy clients join the default room - OK")
+
+        lost = socket.create_connection(('127.0.0.1', host.port))
+        lost.settimeout(3)
+        lost.sendall(encode_hello("lost", room="nowhere"))
+        if lost.recv(1) != b"":
+            print("❌ Unknown room not refused")
+            return False
+        print("✅ Unknown room refused - OK")
+
+        # Commands answer for the room they name
+        command = socket.create_connection(('127.0.0.1', host.port))
+        command.settimeout(3)
+        command.sendall(encode_hello("LIST_USERS_CMD", room="ops"))
+        codec = GhostwireServer(host.port, OPS_KEY, 'codec', 'codec').codec
+        reply = codec.decode(*FrameReader(command).read_frame())
+        command.close()
+        if "legacy" in reply:
+            print(f"❌ User list of another room: {reply!r}")
+            return False
+        print("✅ Commands are per room - OK")
+
+        for sock in (legacy, lost):
+            sock.close()
+        time.sleep(0.2)
+        return True
+    finally:
+        host.stop()
+
+def main():
+    print("🚀 Ghostwire Multi-Room Test")
+    print("=" * 50)
+
+    tests = [
+        ("Room Isolation", test_rooms_are_isolated),
+        ("Room Selection", test_room_selection)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire batch sending over a single connection
+"""
+
+import sys
+import os
+import io
+import json
+import socket
+import tempfile
+import threading
+import time
+import contextlib
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FrameReader, encode_hello
+
+KEY = pad(b"batchabatchbbatchc", 16)
+
+def start_server():
+    """Run a threaded GhostwireServer in the background"""
+    from ghostwire_simple import GhostwireServer
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = GhostwireServer(port, KEY, 'batch-test', 'tester')
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+    time.sleep(0.3)
+    return server
+
+def test_read_batch():
+    """JSON lines are parsed, blank and invalid lines are skipped"""
+    print("🔧 Testing batch file parsing...")
+    from ghostwire_simple import read_batch
+
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+        f.write('{"message": "hello"}\n\nnot json\n{"message": "psst", "to": "bob"}\n{"to": "bob"}\n')
+        path = f.name
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            entries = list(read_batch(path))
+    finally:
+        os.remove(path)
+
+    if entries != [("hello", None), ("psst", "bob")]:
+        print(f"❌ Unexpected entries: {entries}")
+        return False
+    if output.getvalue().count("Skipping invalid batch line") != 2:
+        print("❌ Invalid lines were not reported")
+        return False
+    print("✅ Batch parsing - OK")
+    return True
+
+def test_private_reply():
+    """Only the server's exact answers count as private message confirmations"""
+    print("\n📬 Testing private message confirmations...")
+    from ghostwire_simple import private_reply
+    cases = {
+        "[SYSTEM] Private message sent to john": ('delivered', 'john'),
+        "[SYSTEM] User ghost not found": ('not_found', 'ghost'),
+        "[bob]: file not found": None,
+        "[PRIVATE from bob]: user not found": None,
+        "[SYSTEM] carol joined the room": None,
+    }
+    for text, expected in cases.items():
+        if private_reply(text) != expected:
+            print(f"❌ {text!r} parsed as {private_reply(text)}")
+            return False
+    print("✅ Broadcasts are not mistaken for confirmations - OK")
+    return True
+
+def test_batch_send():
+    """A whole batch goes out over one connection, in order"""
+    print("\n📦 Testing batch send...")
+    from ghostwire_simple import send_batch
+    server = start_server()
+
+    listener = socket.create_connection(('127.0.0.1', server.port))
+    listener.settimeout(5)
+    listener.sendall(encode_hello("listener"))
+    reader = FrameReader(listener)
+    time.sleep(0.1)
+
+    count = 1000
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f:
+        for i in range(count):
+            f.write(json.dumps({"message": f"line {i}"}) + "\n")
+        f.write(json.dumps({"message": "direct", "to": "listener"}) + "\n")
+        f.write(json.dumps({"message": "lost", "to": "ghost"}) + "\n")
+        path = f.name
+
+    received = []
+    def collect():
+        for _ in range(count + 3):
+            received.append(server.decrypt_message(reader.read_frame()[1]))
+    collector = threading.Thread(target=collect, daemon=True)
+    collector.start()
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            send_batch('127.0.0.1', server.port, KEY, "batcher", path)
+        summary = [line for line in output.getvalue().splitlines() if line.startswith("[INFO] ")]
+        print("\n".join(summary))
+
+        collector.join(5)
+        expected = (["[SYSTEM] batcher joined the room"] +
+                    [f"[batcher]: line {i}" for i in range(count)] +
+                    ["[PRIVATE from batcher]: direct", "[SYSTEM] batcher left the room"])
+        if received != expected:
+            print("❌ Batch messages missing, duplicated or out of order")
+            return False
+        print(f"✅ {count} messages delivered in order with a single join - OK")
+
+        if not any(f"Sent {count + 2} messages" in line for line in summary):
+            print("❌ Throughput summary missing")
+            return False
+        if not any("1 delivered, 1 to unknown users" in line for line in summary):
+            print("❌ Private message confirmations not collected")
+            return False
+        print("✅ Throughput and confirmations reported - OK")
+        return True
+    finally:
+        os.remove(path)
+        listener.close()
+        time.sleep(0.2)
+        server.stop()
+
+def main():
+    print("🚀 Ghostwire Batch Send Test")
+    print("=" * 50)
+
+    tests = [
+        ("Batch Parsing", test_read_batch),
+        ("Private Replies", test_private_reply),
+        ("Batch Send", test_batch_send)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire command line startup cost (python -X importtime)
+"""
+
+import sys
+import os
+import json
+import socket
+import subprocess
+import tempfile
+import threading
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+
+def import_profile(code):
+    """(modules imported, total import time in us) of running code in a fresh interpreter"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import sys; sys.path.insert(0, {SRC!r}); {code}"],
+                            capture_output=True, text=True, timeout=30)
+    modules, total = set(), 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        if not name.startswith('  '):  # Top-level imports include their children
+            total += int(cumulative)
+    return modules, total, result.stdout
+
+def fake_agent(path, requests):
+    """Answer agent requests on a Unix socket the way a running --agent does"""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+
+    def serve():
+        connection, _ = server.accept()
+        with connection, connection.makefile('rwb') as stream:
+            for line in stream:
+                requests.append(json.loads(line))
+                stream.write(b'{"ok": true}\n')
+                stream.flush()
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+def test_package_import_is_lazy():
+    """Importing the package loads neither pycryptodome nor PIL"""
+    print("📦 Testing the package import...")
+    root = os.path.dirname(SRC)
+    result = subprocess.run([sys.executable, '-c', "import sys, src; "
+                             "print('Crypto' in sys.modules, 'PIL' in sys.modules, src.GhostwireServer.__name__)"],
+                            cwd=root, capture_output=True, text=True, timeout=30)
+    if result.stdout.split() != ['False', 'False', 'GhostwireServer']:
+        print(f"❌ Package import: {result.stdout.strip()} {result.stderr.strip()}")
+        return False
+    print("✅ Package exports load on first use - OK")
+    return True
+
+def test_quick_send_startup():
+    """A scripted send through the agent imports a fraction of the full client"""
+    print("\n⏱️ Testing one-shot send startup...")
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = os.path.join(directory, 'config.json')
+        user_config = os.path.join(directory, 'user.json')
+        with open(config_file, 'w') as f:
+            json.dump({}, f)
+        with open(user_config, 'w') as f:
+            json.dump({'username': 'scripter', 'port': 2222, 'host': 'localhost', 'key': ''}, f)
+        requests = []
+        agent_socket = os.path.join(directory, 'agent_{port}_{username}.sock')
+        server = fake_agent(agent_socket.format(port=2222, username='scripter'), requests)
+        try:
+            modules, quick, output = import_profile(
+                "import ghostwire_quick, ghostwire_agent; "
+                f"ghostwire_quick.CONFIG_FILE = {config_file!r}; ghostwire_quick.USER_CONFIG = {user_config!r}; "
+                f"ghostwire_agent.AGENT_SOCKET = {agent_socket!r}; "
+                "print(ghostwire_quick.quick_send(['--send', 'hello', '--to', 'bob']))")
+        finally:
+            server.close()
+        if output.split('\n')[-2:] != ['True', ''] or requests != [{'message': 'hello', 'to': 'bob'}]:
+            print(f"❌ Quick send did not go through the agent: {output!r} {requests}")
+            return False
+        heavy = sorted(name for name in modules if name.split('.')[0] in ('Crypto', 'PIL', 'ghostwire_simple',
+                                                                        'sqlite3', 'argparse'))
+        if heavy:
+            print(f"❌ Quick send imported {heavy}")
+            return False
+        print("✅ Sent through the agent without the client or pycryptodome - OK")
+
+    # What the interpreter imports by itself is paid either way; the best of a few runs evens out noise
+    baseline = min(import_profile("pass")[1] for _ in range(3))
+    quick = min([quick] + [import_profile("import ghostwire_quick, ghostwire_agent")[1] for _ in range(2)])
+    full = min(import_profile("import ghostwire_simple")[1] for _ in range(3))
+    quick, full = max(quick - baseline, 1), full - baseline
+    print(f"   imports beyond the interpreter's own: quick send {quick / 1000:.1f} ms, "
+          f"full client {full / 1000:.1f} ms ({full / quick:.1f}x)")
+    if full < 2.5 * quick:
+        print("❌ Quick send startup is not much cheaper than the full client")
+        return False
+    print("✅ Quick send startup - OK")
+    return True
+
+def test_quick_send_falls_back():
+    """Anything but a plain send is left to the full parser"""
+    print("\n↩️ Testing fallback to the full command line...")
+    from ghostwire_quick import parse_send
+    cases = {
+        ('--send', 'hi', '--all'): {'--send': 'hi', '--all': True},
+        ('--send=hi', '--to', 'bob', '--room', 'ops'): {'--send': 'hi', '--to': 'bob', '--room': 'ops'},
+        ('--send', 'hi'): None,
+        ('--send', 'hi', '--all', '--port', '3333'): None,
+        ('--send', '--all'): None,
+        ('--sen', 'hi', '--all'): None,
+        ('--all=1', '--send', 'hi'): None,
+    }
+    for argv, expected in cases.items():
+        if parse_send(list(argv)) != expected:
+            print(f"❌ {argv} parsed as {parse_send(list(argv))}")
+            return False
+    print("✅ Only plain sends take the quick path - OK")
+    return True
+
+def main():
+    print("🚀 Ghostwire Startup Test")
+    print("=" * 50)
+
+    tests = [
+        ("Package Import", test_package_import_is_lazy),
+        ("Quick Send Startup", test_quick_send_startup),
+        ("Quick Send Fallback", test_quick_send_falls_back)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
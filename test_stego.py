@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Test script for the Ghostwire steganography engine
+"""
+
+import sys
+import os
+import io
+import json
+import subprocess
+import tempfile
+import zlib
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import numpy as np
+from PIL import Image
+
+def noise_image(path, width, height, mode='RGB', seed=7):
+    """Save a random image, so every LSB starts out as noise"""
+    shape = (height, width) if mode == 'L' else (height, width, len(mode))
+    pixels = np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+    Image.fromarray(pixels, mode).save(path)
+
+def per_pixel_hide(image_path, data, output_path):
+    """The original embedding loop: one bit string, one tuple per pixel"""
+    img = Image.open(image_path).convert('RGB')
+    binary_message = ''.join(format(byte, '08b') for byte in data)
+    binary_index = 0
+    modified_pixels = []
+    for pixel in list(img.getdata()):
+        channels = list(pixel)
+        for channel in range(3):
+            if binary_index < len(binary_message):
+                channels[channel] = (channels[channel] & 0xFE) | int(binary_message[binary_index])
+                binary_index += 1
+        modified_pixels.append(tuple(channels))
+    new_img = Image.new('RGB', img.size)
+    new_img.putdata(modified_pixels)
+    new_img.save(output_path)
+
+def container(message):
+    """The v2 container of an unencrypted message"""
+    from ghostwire_steganography import CONTAINER, MAGIC, VERSION
+    payload = message.encode('utf-8')
+    return CONTAINER.pack(MAGIC, VERSION, 0, len(payload), zlib.crc32(payload)) + payload
+
+def test_hide_matches_per_pixel():
+    """Vectorized embedding writes exactly the pixels the per-pixel loop did"""
+    print("🧮 Testing vectorized embedding...")
+    from ghostwire_steganography import GhostwireSteganography
+
+    stego = GhostwireSteganography()
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, message in (('RGB', "meet at the usual place"), ('RGBA', "x" * 400), ('L', "gray \xe9t\xe9")):
+            source = os.path.join(directory, f'source_{mode}.png')
+            noise_image(source, 97, 61, mode)
+            success, result = stego.hide_message_in_image(source, message, os.path.join(directory, 'new.png'))
+            if not success:
+                print(f"❌ {mode}: {result}")
+                return False
+            per_pixel_hide(source, container(message), os.path.join(directory, 'old.png'))
+            new = np.asarray(Image.open(os.path.join(directory, 'new.png')))
+            old = np.asarray(Image.open(os.path.join(directory, 'old.png')))
+            if new.shape != old.shape or not np.array_equal(new, old):
+                print(f"❌ {mode}: output differs from the per-pixel embedding")
+                return False
+            if stego.extract_message_from_image(os.path.join(directory, 'new.png')) != (True, message):
+                print(f"❌ {mode}: message did not come back out")
+                return False
+    print("✅ Same pixels as the per-pixel loop, for RGB, RGBA and grayscale sources - OK")
+    return True
+
+def test_hide_rejects_small_image():
+    """A message larger than the image's LSBs is refused"""
+    print("\n📏 Testing capacity check...")
+    from ghostwire_steganography import GhostwireSteganography
+
+    stego = GhostwireSteganography("k1", "k2", "k3")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'tiny.png')
+        noise_image(source, 8, 8)
+        output = os.path.join(directory, 'out.png')
+        success, result = stego.hide_message_in_image(source, "far too long for 64 pixels", output)
+        if success or "too small" not in result or os.path.exists(output):
+            print(f"❌ Oversized message accepted: {result}")
+            return False
+    print("✅ Oversized message refused - OK")
+    return True
+
+def test_extract_stops_early():
+    """Extraction reads only the strips the message is in"""
+    print("\n⏱️ Testing early-terminating extraction...")
+    from ghostwire_steganography import GhostwireSteganography
+
+    class CountingSteganography(GhostwireSteganography):
+        def lsb_chunks(self, image_path):
+            for chunk in super().lsb_chunks(image_path):
+                self.chunks += 1
+                yield chunk
+
+    stego = CountingSteganography()
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'large.png')
+        hidden = os.path.join(directory, 'hidden.png')
+        noise_image(source, 1500, 1200)
+        stego.hide_message_in_image(source, "short", hidden)
+        stego.chunks = 0
+        if stego.extract_message_from_image(hidden) != (True, "short") or stego.chunks != 1:
+            print(f"❌ Read {stego.chunks} strips for a short message")
+            return False
+
+        # Long enough to cross several strips of a narrow image
+        narrow = os.path.join(directory, 'narrow.png')
+        noise_image(narrow, 7, 2000)
+        message = "".join(chr(32 + i % 95) for i in range(3000))
+        stego.hide_message_in_image(narrow, message, hidden)
+        stego.chunks = 0
+        if stego.extract_message_from_image(hidden) != (True, message) or stego.chunks < 4:
+            print("❌ Message across strips not read back")
+            return False
+
+        # Filling the image up to its last whole byte
+        odd = os.path.join(directory, 'odd.png')
+        noise_image(odd, 13, 11)
+        message = "z" * stego.get_image_capacity(odd)
+        stego.hide_message_in_image(odd, message, hidden)
+        if stego.extract_message_from_image(hidden) != (True, message):
+            print("❌ Message ending at the image's last byte not read back")
+            return False
+
+        if stego.extract_message_from_image(source)[0]:
+            print("❌ Message found in an image without one")
+            return False
+    print("✅ One strip read for a short message, strip edges and image end handled - OK")
+    return True
+
+def test_container():
+    """v2 containers carry any text, encrypted or not, and v1 images still read"""
+    print("\n📦 Testing the v2 container...")
+    from ghostwire_steganography import GhostwireSteganography
+
+    class CountingSteganography(GhostwireSteganography):
+        def lsb_chunks(self, image_path):
+            for chunk in super().lsb_chunks(image_path):
+                self.chunks += 1
+                yield chunk
+
+    stego = CountingSteganography("k1", "k2", "k3")
+    stego.chunks = 0
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.png')
+        hidden = os.path.join(directory, 'hidden.png')
+        noise_image(source, 300, 200)
+
+        message = "Grüße aus Zürich — 東京で会いましょう 👻"
+        for encrypt in (False, True):
+            stego.hide_message_in_image(source, message, hidden, encrypt=encrypt)
+            if stego.extract_message_from_image(hidden) != (True, message):
+                print(f"❌ Non-ASCII text lost (encrypt={encrypt}): {stego.extract_message_from_image(hidden)}")
+                return False
+        success, result = GhostwireSteganography("x", "y", "z").extract_message_from_image(hidden)
+        if not success or not result.startswith("ENCRYPTED:"):
+            print(f"❌ Wrong keys not handled like before: {result}")
+            return False
+
+        # Images written before the container existed
+        per_pixel_hide(source, b"old style message<<<GHOSTWIRE_END>>>", hidden)
+        if stego.extract_message_from_image(hidden) != (True, "old style message"):
+            print("❌ v1 image no longer readable")
+            return False
+        legacy = stego.encrypt_message("old encrypted") + "<<<GHOSTWIRE_END>>>"
+        per_pixel_hide(source, legacy.encode('latin-1'), hidden)
+        if stego.extract_message_from_image(hidden) != (True, "old encrypted"):
+            print("❌ Encrypted v1 image no longer readable")
+            return False
+
+        # Flip one LSB inside the payload
+        stego.hide_message_in_image(source, "checksummed", hidden, encrypt=False)
+        pixels = np.array(Image.open(hidden))
+        pixels.reshape(-1)[8 * 16] ^= 1
+        Image.fromarray(pixels).save(hidden)
+        success, result = stego.extract_message_from_image(hidden)
+        if success or "checksum" not in result:
+            print(f"❌ Corrupted payload not detected: {result}")
+            return False
+
+        # Noise has no magic and soon shows a NUL byte
+        stego.chunks = 0
+        if stego.extract_message_from_image(source)[0] or stego.chunks != 1:
+            print(f"❌ Image without a message read for {stego.chunks} strips")
+            return False
+    print("✅ UTF-8 text, checksums, v1 images and early rejection - OK")
+    return True
+
+def test_memory_budget():
+    """Strips follow the memory budget, and extraction decodes only the rows it reads"""
+    print("\n🧠 Testing the memory budget...")
+    from ghostwire_steganography import GhostwireSteganography
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Many small strips give the same image and message as one large one
+        source = os.path.join(directory, 'source.png')
+        noise_image(source, 120, 900)
+        message = "".join(chr(0x400 + i % 200) for i in range(20000))
+        for budget in (64 * 1024 * 1024, 4096):
+            stego = GhostwireSteganography(memory_budget=budget)
+            success, result = stego.hide_message_in_image(source, message, os.path.join(directory, f'{budget}.png'))
+            if not success or stego.extract_message_from_image(os.path.join(directory, f'{budget}.png')) != \
+                    (True, message):
+                print(f"❌ Budget {budget}: {result}")
+                return False
+        if not np.array_equal(np.asarray(Image.open(os.path.join(directory, '4096.png'))),
+                              np.asarray(Image.open(os.path.join(directory, f'{64 * 1024 * 1024}.png')))):
+            print("❌ Strip size changed the hidden pixels")
+            return False
+
+        # Bottom-up BMP files can't be cut short and are decoded whole
+        stego.hide_message_in_image(source, "bottom-up", os.path.join(directory, 'hidden.bmp'))
+        if stego.extract_message_from_image(os.path.join(directory, 'hidden.bmp')) != (True, "bottom-up"):
+            print("❌ Message not read back from a BMP file")
+            return False
+
+        # A 64 MB (decoded) photo read within an 8 MB budget
+        large = os.path.join(directory, 'large.png')
+        hidden = os.path.join(directory, 'large_hidden.png')
+        Image.new('RGB', (4000, 4000), (90, 140, 200)).save(large)
+        GhostwireSteganography().hide_message_in_image(large, "needle", hidden)
+        script = ("import sys, resource; sys.path.insert(0, 'src'); "
+                  "from ghostwire_steganography import GhostwireSteganography; "
+                  "stego = GhostwireSteganography(memory_budget=8 * 1024 * 1024); "
+                  "before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; "
+                  f"print(stego.extract_message_from_image({hidden!r}), "
+                  "resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)")
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        output, _, grown = result.stdout.strip().rpartition(' ')
+        if output != "(True, 'needle')" or int(grown) > 16 * 1024:
+            print(f"❌ Extraction from a large image: {result.stdout.strip()} {result.stderr.strip()}")
+            return False
+    print(f"✅ Same output for any strip size, large image read in {int(grown) // 1024} MB more - OK")
+    return True
+
+def test_partial_decode():
+    """Decoding stops after the requested rows, with the same pixels as a full decode"""
+    print("\n✂️  Testing partial decoding...")
+    import PIL
+    from ghostwire_steganography import GhostwireSteganography, PARTIAL_DECODE_PILLOW
+    stego = GhostwireSteganography()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ('strip.png', 'strip.ppm'):
+            path = os.path.join(directory, name)
+            noise_image(path, 64, 400)
+            full = np.asarray(Image.open(path))
+            img = stego.open_rows(path, 48)
+            # Fails on a Pillow release the tile rewrite no longer works with (or was never
+            # checked against): verify limit_rows there, then adjust PARTIAL_DECODE_PILLOW
+            if img.size != (64, 48) or np.asarray(img).shape[0] != 48:
+                print(f"❌ {name}: Pillow {PIL.__version__} decoded {img.size[1]} rows instead of 48 "
+                      f"(partial decoding checked for {PARTIAL_DECODE_PILLOW})")
+                return False
+            if not np.array_equal(np.asarray(img), full[:48]):
+                print(f"❌ {name}: partially decoded rows differ from a full decode")
+                return False
+
+        # Formats that can't stop early, and a failing partial decode, load whole
+        bmp = os.path.join(directory, 'strip.bmp')
+        noise_image(bmp, 64, 400)
+        if stego.open_rows(bmp, 48).size != (64, 400):
+            print("❌ Bottom-up BMP was cut short")
+            return False
+        broken = GhostwireSteganography()
+        def failing_limit(img, rows):
+            img.tile = [('zip', (0, 0, 64, rows), 0, 'garbage')]
+            return True
+        broken.limit_rows = failing_limit
+        if not np.array_equal(np.asarray(broken.open_rows(os.path.join(directory, 'strip.png'), 48)),
+                              np.asarray(Image.open(os.path.join(directory, 'strip.png')))):
+            print("❌ Failed partial decode did not fall back to the whole image")
+            return False
+    print(f"✅ Partial decoding works with Pillow {PIL.__version__}, falls back otherwise - OK")
+    return True
+
+def test_batch():
+    """Batches hide and extract over a process pool and report each image as a JSON line"""
+    print("\n🗂️ Testing batch hide and extract...")
+    from ghostwire_steganography import run_batch, batch_jobs
+
+    keys = ("b1", "b2", "b3")
+    with tempfile.TemporaryDirectory() as directory:
+        sources = os.path.join(directory, 'sources')
+        hidden = os.path.join(directory, 'hidden')
+        os.makedirs(sources)
+        os.makedirs(hidden)
+        for i in range(6):
+            noise_image(os.path.join(sources, f'photo{i}.png'), 60 + i, 40, seed=i)
+        open(os.path.join(sources, 'notes.txt'), 'w').close()
+
+        out = io.StringIO()
+        images, failed, total_bytes, _ = run_batch('hide', batch_jobs(sources, "batch message", hidden), keys,
+                                                   workers=2, out=out)
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        if (images, failed) != (6, 0) or len(results) != 6 or not all(result['ok'] for result in results) or \
+                total_bytes != sum(os.path.getsize(os.path.join(sources, f'photo{i}.png')) for i in range(6)):
+            print(f"❌ Batch hide: {images} images, {failed} failed: {out.getvalue()}")
+            return False
+
+        # A manifest naming its own messages, and one image that does not exist
+        manifest = os.path.join(directory, 'manifest.jsonl')
+        with open(manifest, 'w') as f:
+            for i in range(3):
+                f.write(json.dumps({'image': os.path.join(sources, f'photo{i}.png'), 'message': f"only {i}",
+                                    'output': os.path.join(directory, f'only{i}.png')}) + "\n")
+            f.write(json.dumps({'image': os.path.join(sources, 'missing.png')}) + "\n")
+        out = io.StringIO()
+        images, failed, _, _ = run_batch('hide', batch_jobs(manifest), keys, workers=2, out=out)
+        missing = [json.loads(line) for line in out.getvalue().splitlines() if 'missing' in line]
+        if (images, failed) != (4, 1) or len(missing) != 1 or missing[0]['ok']:
+            print(f"❌ Batch manifest: {out.getvalue()}")
+            return False
+
+        # Through the command line, as a job would run it
+        root = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run([sys.executable, os.path.join(root, 'ghostwire'), '--extract-batch', hidden,
+                                 '--key1', keys[0], '--key2', keys[1], '--key3', keys[2], '--workers', '2'],
+                                capture_output=True, text=True, timeout=60)
+        results = [json.loads(line) for line in result.stdout.splitlines()]
+        if result.returncode != 0 or sorted(os.path.basename(r['image']) for r in results) != \
+                [f'photo{i}.png' for i in range(6)] or any(r['message'] != "batch message" for r in results) or \
+                "images/sec" not in result.stderr or "MB/sec" not in result.stderr:
+            print(f"❌ --extract-batch: {result.stdout} {result.stderr}")
+            return False
+        summary = result.stderr.strip()
+
+        # Writing into the directory being read would overwrite the images themselves
+        try:
+            batch_jobs(hidden, "batch message", os.path.join(hidden, '.'))
+            print("❌ Outputs allowed to overwrite their inputs")
+            return False
+        except ValueError as e:
+            if 'input' not in str(e):
+                print(f"❌ Unclear input overwrite error: {e}")
+                return False
+
+        # Two sources that map to the same output, or no message: refused before anything runs
+        noise_image(os.path.join(sources, 'photo0.bmp'), 60, 40)
+        try:
+            batch_jobs(sources, "batch message", os.path.join(directory, 'clash'))
+            print("❌ photo0.png and photo0.bmp both written to photo0.png")
+            return False
+        except ValueError as e:
+            if 'photo0.png' not in str(e):
+                print(f"❌ Unclear duplicate output error: {e}")
+                return False
+        result = subprocess.run([sys.executable, os.path.join(root, 'ghostwire'), '--stealth-batch', sources,
+                                 '--output', os.path.join(directory, 'nomessage')],
+                                capture_output=True, text=True, timeout=60)
+        if result.returncode != 1 or "--message" not in result.stdout or \
+                os.path.exists(os.path.join(directory, 'nomessage')):
+            print(f"❌ --stealth-batch without --message: {result.returncode} {result.stdout}")
+            return False
+    print(f"✅ {summary} - OK")
+    return True
+
+def main():
+    print("🚀 Ghostwire Steganography Engine Test")
+    print("=" * 50)
+
+    tests = [
+        ("Vectorized Embedding", test_hide_matches_per_pixel),
+        ("Capacity Check", test_hide_rejects_small_image),
+        ("Early Extraction", test_extract_stops_early),
+        ("Container Format", test_container),
+        ("Memory Budget", test_memory_budget),
+        ("Partial Decode", test_partial_decode),
+        ("Batch", test_batch)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for the Ghostwire user store
+"""
+
+import sys
+import os
+import json
+import socket
+import tempfile
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+
+KEY = pad(b"storeastorebstorec", 16)
+
+def test_store_basics():
+    """Users are kept per room, added once and still there after reopening"""
+    print("🗄️ Testing the user store...")
+    from ghostwire_store import UserStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'users.db')
+        store = UserStore(path)
+        store.add("alice", {'created': True})
+        store.add("alice", {'created': False})
+        store.put("bob", {'created': True, 'note': 1})
+        store.put("bob", {'created': True, 'note': 2})
+        store.add("carol", {'created': True}, room='ops')
+        store.close()
+
+        store = UserStore(path)
+        if store.load() != {'alice': {'created': True}, 'bob': {'created': True, 'note': 2}}:
+            print(f"❌ Unexpected users: {store.load()}")
+            return False
+        if store.load('ops') != {'carol': {'created': True}} or store.load('nowhere'):
+            print("❌ Rooms not kept apart")
+            return False
+        store.close()
+        print("✅ Add, replace, rooms and reopening - OK")
+    return True
+
+def test_json_migration():
+    """Old JSON data files are imported once and set aside"""
+    print("\n📦 Testing migration from the JSON files...")
+    from ghostwire_store import UserStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = UserStore(os.path.join(directory, 'users.db'))
+        data_file = os.path.join(directory, 'data.json')
+        with open(data_file, 'w') as f:
+            json.dump({'users': {'alice': {'created': True}, 'bob': {'created': True}}, 'creator': 'alice'}, f)
+        rooms_file = os.path.join(directory, 'rooms.json')
+        with open(rooms_file, 'w') as f:
+            json.dump({'rooms': {'ops': {'users': {'carol': {'created': True}}, 'creator': 'carol'}}}, f)
+
+        if store.import_json(data_file) != 2 or store.import_json(rooms_file, rooms=True) != 1:
+            print("❌ Wrong number of users imported")
+            return False
+        if os.path.exists(data_file) or not os.path.exists(data_file + '.migrated'):
+            print("❌ Imported file not set aside")
+            return False
+        if store.import_json(data_file) != 0 or sorted(store.load()) != ['alice', 'bob'] or \
+                list(store.load('ops')) != ['carol']:
+            print("❌ Migrated users not in the store")
+            return False
+        store.close()
+        print("✅ Single-room and --rooms files imported - OK")
+    return True
+
+def test_users_saved_on_join():
+    """A server saves each new user as it joins, not only when it stops"""
+    print("\n⚡ Testing users saved as they join...")
+    import ghostwire_simple
+    from ghostwire_simple import GhostwireServer, connect_room
+    from ghostwire_store import UserStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        saved = ghostwire_simple.USERS_DB, ghostwire_simple.DATA_FILE
+        ghostwire_simple.USERS_DB = os.path.join(directory, 'users.db')
+        ghostwire_simple.DATA_FILE = os.path.join(directory, 'data.json')
+        try:
+            with open(ghostwire_simple.DATA_FILE, 'w') as f:
+                json.dump({'users': {'old-timer': {'created': True}}}, f)
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.bind(('127.0.0.1', 0))
+                port = s.getsockname()[1]
+            server = GhostwireServer(port, KEY, 'store-test', 'tester')
+            if 'old-timer' not in server.users:
+                print("❌ Users of the old data file not loaded")
+                return False
+            threading.Thread(target=server.start, daemon=True).start()
+            time.sleep(0.3)
+            sockets = [connect_room('127.0.0.1', port, KEY, name)[0] for name in ("alice", "bob")]
+            time.sleep(0.3)
+
+            # Read the database from outside while the server still runs, as after a crash
+            users = UserStore(ghostwire_simple.USERS_DB).load()
+            for sock in sockets:
+                sock.close()
+            server.stop()
+            if sorted(users) != ['alice', 'bob', 'old-timer']:
+                print(f"❌ Users on disk while running: {sorted(users)}")
+                return False
+            print("✅ Joins saved immediately - OK")
+            return True
+        finally:
+            ghostwire_simple.USERS_DB, ghostwire_simple.DATA_FILE = saved
+
+def main():
+    print("🚀 Ghostwire Store Test")
+    print("=" * 50)
+
+    tests = [
+        ("Store Basics", test_store_basics),
+        ("JSON Migration", test_json_migration),
+        ("Users Saved on Join", test_users_saved_on_join)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
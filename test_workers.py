@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test script for Ghostwire pre-forked workers (--workers)
+"""
+
+import sys
+import os
+import socket
+import threading
+import multiprocessing
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from Crypto.Util.Padding import pad
+from ghostwire_protocol import FRAME_RELAY, FrameReader, encode_hello
+
+KEY = pad(b"workerawokerbworkerc", 16)
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_worker_pair():
+    """Two WorkerServers in this process, on separate ports, joined by a bus socketpair and rings"""
+    from ghostwire_workers import WorkerServer
+    from ghostwire_ring import SharedRing, create_doorbells
+    first, second = socket.socketpair()
+    rings = [SharedRing(64 * 1024), SharedRing(64 * 1024)]
+    doorbells = create_doorbells(2)
+    servers = [WorkerServer(free_port(), KEY, 'workers-test', 'tester', 0, {1: first}, rings, doorbells,
+                            opaque=True),
+               WorkerServer(free_port(), KEY, 'workers-test', 'tester', 1, {0: second}, rings, doorbells,
+                            opaque=True)]
+    for server in servers:
+        server_thread = threading.Thread(target=server.start)
+        server_thread.daemon = True
+        server_thread.start()
+    time.sleep(0.3)
+    return servers
+
+def join(server, username):
+    """Connect a legacy (AES-CBC) member and wait until every worker knows it"""
+    client = socket.create_connection(('127.0.0.1', server.port))
+    client.settimeout(3)
+    client.sendall(encode_hello(username))
+    time.sleep(0.1)
+    return client, FrameReader(client)
+
+def test_bus_between_workers():
+    """Members on different workers see each other as one room"""
+    print("🔧 Testing the worker bus...")
+    from ghostwire_simple import connect_room
+    first, second = start_worker_pair()
+    try:
+        alice, alice_reader = join(first, "alice")
+        bob, bob_reader = join(second, "bob")
+        if alice_reader.read_frame() is None:  # "[SYSTEM] bob joined the room" from the other worker
+            print("❌ Join on the other worker not announced")
+            return False
+
+        alice.sendall(first.encode_message("hello from worker 0"))
+        if first.decrypt_message(bob_reader.read_frame()[1]) != "[alice]: hello from worker 0":
+            print("❌ Broadcast did not cross workers")
+            return False
+        print("✅ Broadcast crosses workers - OK")
+
+        bob.sendall(second.encode_message("@alice psst"))
+        if first.decrypt_message(alice_reader.read_frame()[1]) != "[PRIVATE from bob]: psst":
+            print("❌ Private message did not cross workers")
+            return False
+        if second.decrypt_message(bob_reader.read_frame()[1]) != "[SYSTEM] Private message sent to alice":
+            print("❌ Private message to another worker not confirmed")
+            return False
+        print("✅ Private message and confirmation across workers - OK")
+
+        if sorted(first.connected_users()) != ["alice", "bob"]:
+            print(f"❌ Worker 0 sees {first.connected_users()}")
+            return False
+        print("✅ Membership shared - OK")
+
+        carol_socket, carol_reader, carol = connect_room('127.0.0.1', first.port, KEY, "carol")
+        time.sleep(0.1)  # Let "carol joined" reach worker 1 before dave is there to see it
+        dave_socket, dave_reader, dave = connect_room('127.0.0.1', second.port, KEY, "dave")
+        carol_socket.settimeout(3)
+        dave_socket.settimeout(3)
+        time.sleep(0.1)
+        carol_reader.read_frame()  # "[SYSTEM] dave joined the room"
+        frame = carol.encode("@dave sealed")
+        carol_socket.sendall(frame)
+        if dave_reader.read_frame() != (FRAME_RELAY, frame[5:]):
+            print("❌ Relay frame changed on its way across workers")
+            return False
+        print("✅ Relay frames cross workers unchanged - OK")
+
+        for sock in (carol_socket, dave_socket, bob):
+            sock.close()
+        time.sleep(0.2)
+        if first.connected_users() != ["alice"]:
+            print(f"❌ Departures not shared: {first.connected_users()}")
+            return False
+        print("✅ Departures shared - OK")
+        alice.close()
+        return True
+    finally:
+        for server in (first, second):
+            server.stop()
+
+def test_reuseport_workers():
+    """Forked workers share one port and one room"""
+    print("\n🧵 Testing pre-forked workers on one port...")
+    from ghostwire_simple import GhostwireServer
+    from ghostwire_workers import run_workers
+    port = free_port()
+    supervisor = multiprocessing.get_context('fork').Process(
+        target=run_workers, args=(port, KEY, 'workers-test', 'tester', 3))
+    supervisor.start()
+    time.sleep(1.0)
+
+    clients = []
+    try:
+        for i in range(8):
+            client = socket.create_connection(('127.0.0.1', port))
+            client.settimeout(3)
+            client.sendall(encode_hello(f"member{i}"))
+            clients.append((client, FrameReader(client)))
+        time.sleep(0.5)
+
+        codec = GhostwireServer(port, KEY, 'codec', 'codec').codec
+        clients[0][0].sendall(codec.encode("anyone there?"))
+        for client, reader in clients[1:]:
+            while True:
+                message = codec.decode(*reader.read_frame())
+                if not message.startswith("[SYSTEM]"):
+                    break
+            if message != "[member0]: anyone there?":
+                print(f"❌ Member got {message!r}")
+                return False
+        print(f"✅ Broadcast reached all {len(clients) - 1} members across 3 workers - OK")
+        return True
+    except (OSError, TypeError) as e:
+        print(f"❌ Worker room failed: {e}")
+        return False
+    finally:
+        for client, _ in clients:
+            client.close()
+        supervisor.terminate()
+        supervisor.join(5)
+
+def main():
+    print("🚀 Ghostwire Workers Test")
+    print("=" * 50)
+
+    tests = [
+        ("Worker Bus", test_bus_between_workers),
+        ("SO_REUSEPORT Workers", test_reuseport_workers)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        if test_func():
+            passed += 1
+        else:
+            print(f"\n❌ {test_name} test failed!")
+
+    print("\n" + "=" * 50)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+    return passed == total
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)